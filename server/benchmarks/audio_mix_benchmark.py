@@ -0,0 +1,102 @@
+"""Compare the old N-input adelay/amix graph with the pre-mixed voiceover track.
+
+Usage: python benchmarks/audio_mix_benchmark.py [--cues 10 100 1000] [--cue-seconds 1.5]
+
+Both strategies produce the same AAC audio; video is left out since the mux
+stream-copies it either way. Peak RSS is the largest child process (ffmpeg)
+and, for the new track, the Python process doing the mixing.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.voiceover import build_voiceover_track, pcm_input_args
+
+AAC_ARGS = ["-c:a", "aac", "-b:a", "192k"]
+
+
+def amix_command(audio_paths, audio_delays, output_path):
+    """The mux audio graph used before the voiceover track, one input per cue"""
+    cmd = ["ffmpeg", "-y"]
+    filters, labels = [], []
+    for i, (audio_path, delay) in enumerate(zip(audio_paths, audio_delays)):
+        cmd.extend(["-i", audio_path])
+        delay_ms = int(delay * 1000)
+        filters.append(f"[{i}:a]volume=1.0,adelay={delay_ms}|{delay_ms}[a{i}]")
+        labels.append(f"[a{i}]")
+    graph = ";".join(filters + [f"{''.join(labels)}amix=inputs={len(filters)}:dropout_transition=0:normalize=0[aout]"])
+    return cmd + ["-filter_complex", graph, "-map", "[aout]", *AAC_ARGS, output_path]
+
+
+def run_amix(audio_paths, audio_delays, work_dir):
+    subprocess.run(amix_command(audio_paths, audio_delays, os.path.join(work_dir, "amix.m4a")),
+                   check=True, capture_output=True)
+
+
+def run_track(audio_paths, audio_delays, work_dir):
+    track_path = os.path.join(work_dir, "voiceover.pcm")
+    build_voiceover_track(audio_paths, audio_delays, track_path)
+    subprocess.run(["ffmpeg", "-y", *pcm_input_args(), "-i", track_path, *AAC_ARGS,
+                    os.path.join(work_dir, "track.m4a")], check=True, capture_output=True)
+    os.remove(track_path)
+
+
+def measure(strategy, audio_paths, audio_delays, work_dir, results):
+    # Runs in its own process so the rusage maxima belong to this strategy alone
+    started = time.perf_counter()
+    try:
+        strategy(audio_paths, audio_delays, work_dir)
+        error = None
+    except subprocess.CalledProcessError as e:
+        error = e.stderr.decode(errors="replace").strip().splitlines()[-1]
+    elapsed = time.perf_counter() - started
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((elapsed, children, own, error))
+
+
+def make_cues(count, cue_seconds, work_dir):
+    template = os.path.join(work_dir, "cue.mp3")
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={cue_seconds}",
+                    "-ar", "44100", "-b:a", "192k", template], check=True, capture_output=True)
+    audio_paths, audio_delays = [], []
+    for i in range(count):
+        # Separate files, as the real update has one MP3 per cue
+        path = os.path.join(work_dir, f"cue_{i}.mp3")
+        os.link(template, path)
+        audio_paths.append(path)
+        audio_delays.append(i * (cue_seconds + 0.5))
+    return audio_paths, audio_delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cues", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cue-seconds", type=float, default=1.5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{'cues':>6} {'strategy':<8} {'time':>9} {'ffmpeg RSS':>11} {'python RSS':>11}")
+    for count in args.cues:
+        with tempfile.TemporaryDirectory() as work_dir:
+            audio_paths, audio_delays = make_cues(count, args.cue_seconds, work_dir)
+            for name, strategy in (("amix", run_amix), ("track", run_track)):
+                results = context.Queue()
+                process = context.Process(target=measure, args=(strategy, audio_paths, audio_delays, work_dir, results))
+                process.start()
+                elapsed, children, own, error = results.get()
+                process.join()
+                line = f"{count:>6} {name:<8} {elapsed:>8.2f}s {children / 1024:>8.0f} MiB {own / 1024:>8.0f} MiB"
+                print(line + (f"   FAILED: {error}" if error else ""))
+
+
+if __name__ == "__main__":
+    main()
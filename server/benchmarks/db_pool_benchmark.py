@@ -0,0 +1,112 @@
+"""Compare connect-per-query, pooled and async database access against a local Postgres.
+
+Usage: python benchmarks/db_pool_benchmark.py [--queries 2000] [--concurrency 8]
+
+Uses the same POSTGRES_* / DB_POOL_* environment variables as the server and
+expects the migrations to have been applied.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories import video_repository  # noqa: F401  registers the prepared statements
+from utils.db import close_async_pool, execute_prepared, get_async_db_connection, get_db_config, get_db_cursor
+
+VIDEO_ID = "benchmark-video"
+SELECT_SQL = "SELECT video_id FROM videos WHERE video_id = %s"
+
+
+def connect_per_query():
+    conn = psycopg2.connect(**get_db_config(), cursor_factory=RealDictCursor)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SELECT_SQL, (VIDEO_ID,))
+            cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def pooled():
+    with get_db_cursor() as cursor:
+        cursor.execute(SELECT_SQL, (VIDEO_ID,))
+        cursor.fetchone()
+
+
+def pooled_prepared():
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_video", (VIDEO_ID,))
+        cursor.fetchone()
+
+
+def run_sync(fn, queries, concurrency):
+    def timed(_):
+        started = time.perf_counter()
+        fn()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, range(queries)))
+    return time.perf_counter() - started, latencies
+
+
+async def run_async(queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            started = time.perf_counter()
+            async with get_async_db_connection() as conn:
+                await conn.fetchrow("SELECT video_id FROM videos WHERE video_id = $1", VIDEO_ID)
+            return time.perf_counter() - started
+
+    # Warm the pool so its creation is not counted
+    async with get_async_db_connection():
+        pass
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(timed() for _ in range(queries)))
+    elapsed = time.perf_counter() - started
+    await close_async_pool()
+    return elapsed, latencies
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<20} {len(latencies) / elapsed:>10.0f} q/s   "
+          f"p50 {statistics.median(latencies) * 1000:>7.2f} ms   p99 {p99 * 1000:>7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with get_db_cursor() as cursor:
+        cursor.execute("INSERT INTO videos (video_id) VALUES (%s) ON CONFLICT (video_id) DO NOTHING", (VIDEO_ID,))
+    pooled()
+
+    print(f"{args.queries} queries, concurrency {args.concurrency}")
+    report("connect-per-query", *run_sync(connect_per_query, args.queries, args.concurrency))
+    report("pooled", *run_sync(pooled, args.queries, args.concurrency))
+    report("pooled+prepared", *run_sync(pooled_prepared, args.queries, args.concurrency))
+    report("asyncpg", *asyncio.run(run_async(args.queries, args.concurrency)))
+
+    with get_db_cursor() as cursor:
+        cursor.execute("DELETE FROM videos WHERE video_id = %s", (VIDEO_ID,))
+
+
+if __name__ == "__main__":
+    main()
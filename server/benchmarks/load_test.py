@@ -0,0 +1,288 @@
+"""Offline load test: throughput and p50/p95/p99 per endpoint at N concurrent users, with fake Gemini/ElevenLabs.
+
+Unless --url points at a running server, starts ``uvicorn main:app`` with
+VIDEO_PROCESSOR_BACKEND=fake and TTS_BACKEND=fake, and with storage, caches
+and metrics in a temporary directory. The fakes' latency comes from the
+FAKE_* variables (see the README). Postgres must be reachable as configured
+by the POSTGRES_* variables, with migrations applied.
+
+Each user loops through a scenario --iterations times:
+  full  POST /process-video -> GET detail -> POST update -> GET video -> POST /text-to-speech
+  tts   POST /text-to-speech
+  read  GET detail -> GET video, of one video processed up front
+
+Prompts and texts are unique per run and iteration so nothing is served from the
+analysis or TTS caches; pass --warm-caches to measure cache hits instead.
+
+Usage: python benchmarks/load_test.py [--users 8] [--iterations 3] [--scenario full] [--video-seconds 20]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+# Add parent directory to Python path to make benchmarks.synthetic_media importable
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(SERVER_DIR)
+
+from benchmarks.synthetic_media import make_test_video
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear interpolation between closest ranks, like numpy's default"""
+    if not sorted_values:
+        return float("nan")
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.last_error: Dict[str, str] = {}
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str,
+                      **kwargs) -> Optional[httpx.Response]:
+        """Send a request and record its latency under ``endpoint``; None if it failed"""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self._fail(endpoint, f"{type(e).__name__}: {e}")
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - started)
+        error = None
+        if response.status_code >= 400:
+            error = f"HTTP {response.status_code}"
+        elif response.headers.get("content-type", "").startswith("application/json"):
+            body = response.json()
+            if isinstance(body, dict) and body.get("success") is False:
+                error = body.get("error")
+        if error is not None:
+            self._fail(endpoint, error)
+            return None
+        return response
+
+    def _fail(self, endpoint: str, error: str):
+        self.errors[endpoint] += 1
+        self.last_error[endpoint] = str(error)[:200]
+
+
+async def process_video(client, recorder, video_bytes: bytes, prompt: str) -> Optional[Dict]:
+    response = await recorder.request(
+        client, "POST /process-video", "POST", "/process-video",
+        files={"video": ("video.mp4", video_bytes, "video/mp4")}, data={"prompt": prompt}
+    )
+    return response.json()["result"] if response is not None else None
+
+
+async def read_video(client, recorder, video_id: str):
+    await recorder.request(client, "GET /video/{id}/detail", "GET", f"/video/{video_id}/detail")
+    await recorder.request(client, "GET /videos/{id}", "GET", f"/videos/{video_id}")
+
+
+async def full_scenario(client, recorder, args, video_bytes, user, iteration, shared):
+    tag = "" if args.warm_caches else f" (run {args.run_id}, user {user}, take {iteration})"
+    result = await process_video(client, recorder, video_bytes, f"a product demo{tag}")
+    if result is None:
+        return
+    video_id = result["video_id"].replace("files/", "")
+    await recorder.request(client, "GET /video/{id}/detail", "GET", f"/video/{video_id}/detail")
+    transcripts = [
+        {"start": cue["start"], "end": cue["end"], "text": f"{cue['text']}, revised{tag}"}
+        for cue in result["subtitles"]
+    ]
+    await recorder.request(
+        client, "POST /video/{id}/update", "POST", f"/video/{video_id}/update",
+        json={"video_id": video_id, "transcripts": transcripts, "render_profile": args.render_profile}
+    )
+    await recorder.request(client, "GET /videos/{id}", "GET", f"/videos/{video_id}")
+    await tts_scenario(client, recorder, args, video_bytes, user, iteration, shared)
+
+
+async def tts_scenario(client, recorder, args, video_bytes, user, iteration, shared):
+    tag = "" if args.warm_caches else f" Run {args.run_id}, user {user}, take {iteration}."
+    await recorder.request(
+        client, "POST /text-to-speech", "POST", "/text-to-speech",
+        data={"text": f"Welcome back to the channel, today we look at something new.{tag}"}
+    )
+
+
+async def read_scenario(client, recorder, args, video_bytes, user, iteration, shared):
+    await read_video(client, recorder, shared["video_id"])
+
+
+SCENARIOS = {"full": full_scenario, "tts": tts_scenario, "read": read_scenario}
+
+
+async def drive(args, base_url: str, video_bytes: bytes) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    scenario = SCENARIOS[args.scenario]
+    limits = httpx.Limits(max_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        shared = {}
+        if args.scenario == "read":
+            result = await process_video(client, Recorder(), video_bytes, "a product demo")
+            if result is None:
+                raise SystemExit("Could not process the video read by the 'read' scenario")
+            shared["video_id"] = result["video_id"].replace("files/", "")
+
+        async def user_loop(user):
+            for iteration in range(args.iterations):
+                await scenario(client, recorder, args, video_bytes, user, iteration, shared)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop(user) for user in range(args.users)))
+        elapsed = time.perf_counter() - started
+    return recorder, elapsed
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict]:
+    summary = {}
+    for endpoint in sorted(set(recorder.latencies) | set(recorder.errors)):
+        latencies = sorted(recorder.latencies[endpoint])
+        summary[endpoint] = {
+            "requests": len(latencies),
+            "errors": recorder.errors[endpoint],
+            "throughput": (len(latencies) - recorder.errors[endpoint]) / elapsed,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else float("nan"),
+        }
+    return summary
+
+
+def stage_means(metrics_text: str) -> Dict[str, Dict[str, float]]:
+    """Count and mean seconds per stage from the server's voicecanvas_stage_seconds histogram"""
+    totals = defaultdict(dict)
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name not in ("voicecanvas_stage_seconds", "voicecanvas_ffmpeg_wall_seconds"):
+            continue
+        for sample in family.samples:
+            label = sample.labels.get("stage") or f"ffmpeg.{sample.labels.get('operation')}"
+            if sample.name.endswith("_count"):
+                totals[label]["count"] = sample.value
+            elif sample.name.endswith("_sum"):
+                totals[label]["sum"] = sample.value
+    return {
+        label: {"count": int(values["count"]), "mean": values["sum"] / values["count"]}
+        for label, values in sorted(totals.items()) if values.get("count")
+    }
+
+
+def start_server(port: int, workers: int, work_dir: str) -> subprocess.Popen:
+    metrics_dir = os.path.join(work_dir, "metrics")
+    os.makedirs(metrics_dir)
+    env = {
+        **os.environ,
+        "VIDEO_PROCESSOR_BACKEND": "fake",
+        "TTS_BACKEND": "fake",
+        "STORAGE_BACKEND": "local",
+        "STORAGE_LOCAL_ROOT": os.path.join(work_dir, "storage") + "/",
+        "STORAGE_SCRATCH_DIR": os.path.join(work_dir, "scratch") + "/",
+        "TTS_CACHE_DIR": os.path.join(work_dir, "tts_cache") + "/",
+        "SEGMENT_CACHE_DIR": os.path.join(work_dir, "segments") + "/",
+        "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+    }
+    log = open(os.path.join(work_dir, "server.log"), "wb")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/tts-models", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    with open(log.name, "rb") as server_log:
+        sys.stderr.write(server_log.read().decode(errors="replace")[-4000:])
+    raise SystemExit("The server did not start")
+
+
+def report(args, summary: Dict[str, Dict], elapsed: float, stages: Dict[str, Dict]):
+    print(f"scenario {args.scenario}, {args.users} user(s) x {args.iterations} iteration(s), "
+          f"{args.video_seconds:g}s video, {elapsed:.1f}s wall")
+    print(f"{'endpoint':<26} {'requests':>8} {'errors':>6} {'req/s':>7} {'p50 s':>8} {'p95 s':>8} "
+          f"{'p99 s':>8} {'max s':>8}")
+    for endpoint, row in summary.items():
+        print(f"{endpoint:<26} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>7.2f} "
+              f"{row['p50']:>8.3f} {row['p95']:>8.3f} {row['p99']:>8.3f} {row['max']:>8.3f}")
+    scenarios = args.users * args.iterations
+    print(f"{'scenarios':<26} {scenarios:>8} {'':>6} {scenarios / elapsed:>7.2f}")
+    if stages:
+        print("\nserver stages (count, mean s):")
+        for label, row in stages.items():
+            print(f"  {label:<32} {row['count']:>6} {row['mean']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8, help="concurrent users")
+    parser.add_argument("--iterations", type=int, default=3, help="scenario runs per user")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="full")
+    parser.add_argument("--video-seconds", type=float, default=20.0, help="length of the synthetic upload")
+    parser.add_argument("--video-size", default="640x360")
+    parser.add_argument("--render-profile", default="preview", help="profile requested by the update step")
+    parser.add_argument("--warm-caches", action="store_true", help="repeat prompts and texts across iterations")
+    parser.add_argument("--url", help="base URL of a running server instead of starting one with fakes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started server")
+    parser.add_argument("--timeout", type=float, default=600.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    # Keeps prompts and texts unique across runs too, as the analysis cache lives in Postgres
+    args.run_id = uuid.uuid4().hex[:8]
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as work_dir:
+        width, height = (int(value) for value in args.video_size.split("x"))
+        video_path = make_test_video(os.path.join(work_dir, "upload.mp4"), args.video_seconds, width, height)
+        with open(video_path, "rb") as video_file:
+            video_bytes = video_file.read()
+
+        server = None if args.url else start_server(args.port, args.workers, work_dir)
+        base_url = args.url or f"http://127.0.0.1:{args.port}"
+        try:
+            recorder, elapsed = asyncio.run(drive(args, base_url, video_bytes))
+            try:
+                stages = stage_means(httpx.get(f"{base_url}/metrics", timeout=30).text)
+            except (httpx.HTTPError, ValueError):
+                stages = {}
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    summary = summarize(recorder, elapsed)
+    report(args, summary, elapsed, stages)
+    for endpoint, error in recorder.last_error.items():
+        print(f"last error of {endpoint}: {error}")
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"args": vars(args), "elapsed": elapsed, "endpoints": summary, "stages": stages},
+                      json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Throughput of concurrent Range reads and 304 revalidations served by cached_file_response.
+
+Usage: python benchmarks/range_benchmark.py [--size-mb 512] [--chunk-kb 1024] [--requests 400] [--concurrency 16]
+
+Starts uvicorn on a local port with a one-route app and drives it with httpx,
+like a video player seeking through a long render.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_cache import cached_file_response
+
+
+def make_app(path):
+    app = FastAPI()
+
+    @app.get("/video")
+    async def get_video(request: Request):
+        return cached_file_response(request, path, "video/mp4")
+
+    return app
+
+
+async def drive(url, requests, concurrency, headers_for):
+    semaphore = asyncio.Semaphore(concurrency)
+    received = 0
+
+    async def one(client, i):
+        nonlocal received
+        async with semaphore:
+            response = await client.get(url, headers=headers_for(i))
+            received += len(response.content)
+            return response.status_code
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(one(client, i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+    return elapsed, received, set(statuses)
+
+
+def report(name, requests, elapsed, received, statuses):
+    print(f"{name:<22} {requests / elapsed:>8.1f} req/s {received / elapsed / 1024 ** 2:>9.1f} MiB/s   "
+          f"status {sorted(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--chunk-kb", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "video.mp4")
+        with open(path, "wb") as f:
+            for _ in range(args.size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        server = uvicorn.Server(uvicorn.Config(make_app(path), port=args.port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        url = f"http://127.0.0.1:{args.port}/video"
+        size = args.size_mb * 1024 * 1024
+        chunk = args.chunk_kb * 1024
+        rng = random.Random(0)
+        offsets = [rng.randrange(0, size - chunk) for _ in range(args.requests)]
+        etag = httpx.get(url, headers={"Range": "bytes=0-0"}).headers["etag"]
+
+        print(f"{args.size_mb} MiB file, {args.requests} requests, concurrency {args.concurrency}")
+        report(f"range {args.chunk_kb} KiB", args.requests, *asyncio.run(drive(
+            url, args.requests, args.concurrency,
+            lambda i: {"Range": f"bytes={offsets[i]}-{offsets[i] + chunk - 1}"}
+        )))
+        report("304 revalidation", args.requests, *asyncio.run(drive(
+            url, args.requests, args.concurrency, lambda i: {"If-None-Match": etag}
+        )))
+        full_requests = max(1, args.requests // 50)
+        report("full download", full_requests, *asyncio.run(drive(
+            url, full_requests, min(args.concurrency, full_requests), lambda i: {}
+        )))
+
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Encode the same segment with every render profile and compare time and size.
+
+Usage: python benchmarks/render_profiles_benchmark.py [--input clip.mp4] [--start 0] [--duration 10] [--factor 1.2]
+
+Without --input a 1080p testsrc2 clip is generated with ffmpeg. Thread counts
+come from FFMPEG_THREADS / FFMPEG_FILTER_THREADS like the server.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.profiles import RENDER_PROFILES
+from render.segment_renderer import build_chunk_command
+
+
+def make_sample(path, duration):
+    subprocess.run([
+        "ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "18", path
+    ], check=True, capture_output=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input")
+    parser.add_argument("--start", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--factor", type=float, default=1.2, help="speed factor applied to the segment")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        source = args.input
+        if source is None:
+            source = os.path.join(work_dir, "sample.mp4")
+            make_sample(source, args.start + args.duration)
+
+        segment = {
+            "type": "transcript",
+            "start": args.start,
+            "end": args.start + args.duration,
+            "new_duration": args.duration * args.factor,
+            "factor": args.factor,
+        }
+        print(f"{args.duration:.1f}s segment of {source}, factor {args.factor}")
+        for name, profile in RENDER_PROFILES.items():
+            output = os.path.join(work_dir, f"{name}.mp4")
+            started = time.perf_counter()
+            subprocess.run(build_chunk_command(source, segment, output, profile), check=True, capture_output=True)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<10} {elapsed:>7.2f} s   {os.path.getsize(output) / 1024:>9.0f} KiB   "
+                  f"{args.duration * args.factor / elapsed:>6.1f}x realtime")
+
+
+if __name__ == "__main__":
+    main()
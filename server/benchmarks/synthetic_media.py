@@ -0,0 +1,23 @@
+"""Synthetic test videos from ffmpeg's testsrc and sine sources, so benchmarks need no sample files."""
+import subprocess
+from typing import List
+
+
+def build_test_video_command(path: str, seconds: float, width: int = 640, height: int = 360, rate: int = 25,
+                             audio: bool = True) -> List[str]:
+    cmd = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={rate}:duration={seconds}"]
+    if audio:
+        cmd.extend(["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}"])
+    # A keyframe every two seconds, like a typical camera or screen recording
+    cmd.extend(["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", str(rate * 2)])
+    if audio:
+        cmd.extend(["-c:a", "aac", "-shortest"])
+    cmd.append(path)
+    return cmd
+
+
+def make_test_video(path: str, seconds: float = 20.0, width: int = 640, height: int = 360, rate: int = 25,
+                    audio: bool = True) -> str:
+    subprocess.run(build_test_video_command(path, seconds, width, height, rate, audio), check=True,
+                   capture_output=True)
+    return path
@@ -0,0 +1,86 @@
+"""Time the timeline planner against the per-cue loop it replaced.
+
+Usage: python benchmarks/timeline_benchmark.py [--cues 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.timeline import parse_timestamps, plan_timeline
+
+
+def legacy_plan(starts, ends, audio_lengths, video_duration):
+    """The loop previously inlined in update_video (sorted "MM:SS" cues only)"""
+    segments, audio_delays = [], []
+    current_orig, new_time = 0, 0
+    for idx, (start, end, audio_length) in enumerate(zip(starts, ends, audio_lengths)):
+        orig_start = sum(x * int(t) for x, t in zip([60, 1], start.split(":")))
+        orig_end = sum(x * int(t) for x, t in zip([60, 1], end.split(":")))
+        if orig_start > current_orig:
+            segments.append({"type": "non", "start": current_orig, "end": orig_start,
+                             "new_duration": orig_start - current_orig})
+            new_time += orig_start - current_orig
+            current_orig = orig_start
+        seg_orig_duration = orig_end - orig_start
+        factor = audio_length / seg_orig_duration if seg_orig_duration > 0 else 1
+        segments.append({"type": "transcript", "start": orig_start, "end": orig_end, "new_duration": audio_length,
+                         "factor": factor, "audio_index": idx})
+        audio_delays.append(new_time)
+        new_time += audio_length
+        current_orig = orig_end
+    if current_orig < video_duration:
+        segments.append({"type": "non", "start": current_orig, "end": video_duration,
+                         "new_duration": video_duration - current_orig})
+    return segments, audio_delays
+
+
+def make_cues(count, rng):
+    starts, ends, lengths = [], [], []
+    position = 0
+    for _ in range(count):
+        position += rng.randint(0, 2)
+        length = rng.randint(1, 4)
+        starts.append(f"{position // 60:02d}:{position % 60:02d}")
+        ends.append(f"{(position + length) // 60:02d}:{(position + length) % 60:02d}")
+        lengths.append(length * rng.uniform(0.7, 1.6))
+        position += length
+    return starts, ends, lengths, float(position + 5)
+
+
+def best_of(repeat, fn, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cues", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    starts, ends, lengths, duration = make_cues(args.cues, random.Random(0))
+    # Both plans must agree on the inputs the old loop supported
+    new = plan_timeline(starts, ends, lengths, duration)
+    old_segments, old_delays = legacy_plan(starts, ends, lengths, duration)
+    assert len(new.segments) == len(old_segments)
+    assert max(abs(a - b) for a, b in zip(new.audio_delays, old_delays)) < 1e-6
+
+    print(f"{args.cues} cues, best of {args.repeat}")
+    print(f"legacy loop                {best_of(args.repeat, legacy_plan, starts, ends, lengths, duration) * 1000:>8.2f} ms")
+    print(f"plan_timeline, MM:SS in    {best_of(args.repeat, plan_timeline, starts, ends, lengths, duration) * 1000:>8.2f} ms")
+    seconds_starts, seconds_ends = parse_timestamps(starts), parse_timestamps(ends)
+    print(f"plan_timeline, seconds in  "
+          f"{best_of(args.repeat, plan_timeline, seconds_starts, seconds_ends, lengths, duration) * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
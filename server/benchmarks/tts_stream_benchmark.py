@@ -0,0 +1,88 @@
+"""Compare buffered and streamed TTS caching: time to first byte and duration counting.
+
+A fake synthesis yields an MP3 in chunks with a fixed delay per chunk, standing
+in for ElevenLabs' streaming endpoint. "buffered" joins all chunks, writes the
+file and reads it back with mutagen (the previous code path); "streamed" passes
+chunks through ``TTSAudioCache.stream_into`` as they arrive.
+
+Usage: python benchmarks/tts_stream_benchmark.py [--seconds 20] [--chunk-delay 0.02] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to Python path to make tts module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.audio_cache import TTSAudioCache
+from tts.mp3_duration import MP3DurationCounter
+
+# Silent MPEG-1 Layer III frame: 192 kbps, 44.1 kHz, 626 bytes, 1152 samples
+MP3_FRAME = b"\xff\xfb\xb0\x64" + b"\x00" * 622
+CHUNK_BYTES = 4096
+
+
+def synthesize(audio, delay):
+    for start in range(0, len(audio), CHUNK_BYTES):
+        time.sleep(delay)
+        yield audio[start:start + CHUNK_BYTES]
+
+
+def buffered(cache_dir, audio, delay):
+    from mutagen.mp3 import MP3
+
+    started = time.perf_counter()
+    data = b"".join(synthesize(audio, delay))
+    path = os.path.join(cache_dir, "buffered.mp3")
+    with open(path, "wb") as audio_file:
+        audio_file.write(data)
+    measured = time.perf_counter()
+    duration = MP3(path).info.length
+    finished = time.perf_counter()
+    # The whole synthesis had to finish before the first byte could be sent
+    return finished - started, finished - started, finished - measured, duration
+
+
+def streamed(cache_dir, audio, delay):
+    cache = TTSAudioCache(cache_dir=cache_dir)
+    started = time.perf_counter()
+    stream = cache.stream_into(f"k{started}", synthesize(audio, delay))
+    next(stream)
+    first_byte = time.perf_counter() - started
+    for _ in stream:
+        pass
+    entry = cache.get(f"k{started}")
+    return first_byte, time.perf_counter() - started, None, entry.duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of the synthesized audio")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    audio = MP3_FRAME * int(args.seconds * 44100 / 1152)
+    counter = MP3DurationCounter()
+    started = time.perf_counter()
+    for start in range(0, len(audio), CHUNK_BYTES):
+        counter.feed(audio[start:start + CHUNK_BYTES])
+    count_seconds = time.perf_counter() - started
+
+    print(f"{len(audio)} byte MP3 ({counter.duration:.2f} s) in {CHUNK_BYTES} byte chunks, "
+          f"{args.chunk_delay * 1000:.0f} ms apart, best of {args.repeat}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name, run in (("buffered + mutagen", buffered), ("streamed", streamed)):
+            results = [run(cache_dir, audio, args.chunk_delay) for _ in range(args.repeat)]
+            first_byte = min(result[0] for result in results)
+            total = min(result[1] for result in results)
+            print(f"{name:<20} first byte {first_byte * 1000:>9.1f} ms   complete {total * 1000:>9.1f} ms   "
+                  f"duration {results[0][3]:.3f} s")
+        reread = min(buffered(cache_dir, audio, 0)[2] for _ in range(args.repeat))
+    print(f"duration: mutagen re-read {reread * 1000:.2f} ms, counted while streaming {count_seconds * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
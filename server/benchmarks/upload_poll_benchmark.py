@@ -0,0 +1,94 @@
+"""Compare the old per-upload sleep loop with the shared backoff poller for Gemini file states.
+
+Each fake file becomes ACTIVE a random 0.5 s to --max-processing seconds after
+upload. The old loop holds one thread per upload and calls files.get every
+second; the shared poller waits on the event loop and backs off from
+GEMINI_POLL_INITIAL_SECONDS up to GEMINI_POLL_MAX_SECONDS.
+
+Usage: python benchmarks/upload_poll_benchmark.py [--uploads 50] [--max-processing 6] [--seed 0]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Add parent directory to Python path to make video_processor module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from video_processor.file_state_poller import FileStatePoller
+
+
+class FakeFiles:
+    def __init__(self, ready_after):
+        self.ready_at = {}
+        self.ready_after = ready_after
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def upload(self, name):
+        self.ready_at[name] = time.monotonic() + self.ready_after[name]
+        return self.get(name, count=False)
+
+    def get(self, name, count=True):
+        if count:
+            with self._lock:
+                self.calls += 1
+        state = "ACTIVE" if time.monotonic() >= self.ready_at[name] else "PROCESSING"
+        return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+
+def legacy_wait(files, name):
+    uploaded_file = files.upload(name)
+    while uploaded_file.state.name == "PROCESSING":
+        time.sleep(1)
+        uploaded_file = files.get(name)
+    return time.monotonic() - files.ready_at[name]
+
+
+def run_legacy(ready_after):
+    files = FakeFiles(ready_after)
+    with ThreadPoolExecutor(max_workers=len(ready_after)) as pool:
+        lags = list(pool.map(lambda name: legacy_wait(files, name), ready_after))
+    return files.calls, lags, len(ready_after)
+
+
+def run_shared(ready_after):
+    files = FakeFiles(ready_after)
+    poller = FileStatePoller(files.get)
+
+    async def wait(name):
+        await poller.wait_until_active(files.upload(name))
+        return time.monotonic() - files.ready_at[name]
+
+    async def wait_all():
+        return await asyncio.gather(*(wait(name) for name in ready_after))
+
+    lags = asyncio.run(wait_all())
+    return files.calls, lags, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--max-processing", type=float, default=6.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ready_after = {f"files/{i}": rng.uniform(0.5, args.max_processing) for i in range(args.uploads)}
+
+    print(f"{args.uploads} concurrent uploads, processing 0.5-{args.max_processing:g} s each")
+    for name, run in (("sleep(1) loop per upload", run_legacy), ("shared backoff poller", run_shared)):
+        calls, lags, threads = run(ready_after)
+        lags = sorted(lags)
+        print(f"{name:<26} files.get calls {calls:>4}   blocked threads {threads:>3}   "
+              f"detection lag median {lags[len(lags) // 2]:.2f} s, max {lags[-1]:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import logging
+from typing import Dict, Optional, Set
+
+import cuid
+
+from utils.db import get_db_cursor
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SUPERSEDED = "superseded"  # A newer update of the same video made the job's render stale
+TERMINAL_STATUSES = {SUCCEEDED, FAILED, SUPERSEDED}
+
+
+@timed("db.create_job")
+def create_job(kind: str, params: Dict, runner_id: Optional[str] = None) -> str:
+    job_id = cuid.cuid()
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO jobs (id, kind, status, params, runner_id) VALUES (%s, %s, %s, %s, %s)",
+            (job_id, kind, QUEUED, json.dumps(params), runner_id)
+        )
+    logger.info(f"Created {kind} job {job_id}")
+    return job_id
+
+
+@timed("db.get_job")
+def get_job(job_id: str) -> Optional[Dict]:
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, kind, status, stage, progress, result, error, stage_timings,
+                   created_at, started_at, updated_at, finished_at
+            FROM jobs WHERE id = %s
+            """,
+            (job_id,)
+        )
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+@timed("db.mark_running")
+def mark_running(job_id: str):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE jobs SET status = %s, started_at = now(), updated_at = now() WHERE id = %s",
+            (RUNNING, job_id)
+        )
+
+
+@timed("db.update_progress")
+def update_progress(job_id: str, stage: str, progress: float, stage_timings: Dict[str, float]):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE jobs SET stage = %s, progress = %s, stage_timings = %s, updated_at = now()
+            WHERE id = %s AND status = %s
+            """,
+            (stage, progress, json.dumps(stage_timings), job_id, RUNNING)
+        )
+
+
+@timed("db.mark_succeeded")
+def mark_succeeded(job_id: str, result: Dict, stage_timings: Dict[str, float]):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE jobs SET status = %s, stage = 'done', progress = 1, result = %s, stage_timings = %s,
+                            updated_at = now(), finished_at = now()
+            WHERE id = %s
+            """,
+            (SUCCEEDED, json.dumps(result), json.dumps(stage_timings), job_id)
+        )
+
+
+@timed("db.mark_failed")
+def mark_failed(job_id: str, error: str, stage_timings: Optional[Dict[str, float]] = None):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE jobs SET status = %s, error = %s, stage_timings = COALESCE(%s, stage_timings),
+                            updated_at = now(), finished_at = now()
+            WHERE id = %s
+            """,
+            (FAILED, error, json.dumps(stage_timings) if stage_timings is not None else None, job_id)
+        )
+
+
+@timed("db.mark_superseded")
+def mark_superseded(job_id: str, reason: str, stage_timings: Dict[str, float]):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE jobs SET status = %s, error = %s, stage_timings = %s, updated_at = now(), finished_at = now()
+            WHERE id = %s
+            """,
+            (SUPERSEDED, reason, json.dumps(stage_timings), job_id)
+        )
+
+
+@timed("db.unfinished_job_runners")
+def unfinished_job_runners() -> Set[Optional[str]]:
+    """Runners owning queued or running jobs; None stands for jobs created before runners were recorded"""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT DISTINCT runner_id FROM jobs WHERE status NOT IN %s", (tuple(TERMINAL_STATUSES),))
+        return {row["runner_id"] for row in cursor.fetchall()}
+
+
+@timed("db.fail_runner_jobs")
+def fail_runner_jobs(runner_id: Optional[str], error: str) -> int:
+    """Mark every queued or running job of ``runner_id`` failed; returns how many there were"""
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE jobs SET status = %s, error = %s, updated_at = now(), finished_at = now()
+            WHERE runner_id IS NOT DISTINCT FROM %s AND status NOT IN %s
+            """,
+            (FAILED, error, runner_id, tuple(TERMINAL_STATUSES))
+        )
+        return cursor.rowcount
+
+
+@timed("db.active_job_files")
+def active_job_files() -> Set[str]:
+    """Local files that queued or running jobs will still read (their upload or voiceover audio)"""
+    with get_db_cursor() as cursor:
+        cursor.execute("SELECT params FROM jobs WHERE status NOT IN %s", (tuple(TERMINAL_STATUSES),))
+        rows = cursor.fetchall()
+    paths = set()
+    for row in rows:
+        params = row["params"] or {}
+        if params.get("upload_path"):
+            paths.add(params["upload_path"])
+        paths.update(params.get("audio_paths", []))
+    return paths
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from typing import Dict, List, Optional
+
+import cuid
+
+from jobs import job_store
+from utils.db import advisory_lock, try_advisory_lock
+
+logger = logging.getLogger(__name__)
+
+PROCESS_VIDEO_JOB = "process_video"
+RENDER_VIDEO_JOB = "render_video"
+RUNNER_LOCK_PREFIX = "job-runner:"
+ABANDONED_ERROR = "Abandoned: the server running the job stopped"
+
+# Built lazily in each worker process so API keys and clients never cross the process boundary
+_pipeline = None
+
+
+def _get_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        from pipeline.process_video import ProcessVideoPipeline
+        from tts.audio_cache import TTSAudioCache
+        from tts.batch import BatchTTSSynthesizer
+        from tts.tts_processor import create_tts_processor
+        from video_processor.video_processor import create_video_processor
+
+        _pipeline = ProcessVideoPipeline(
+            create_video_processor(), create_tts_processor(), TTSAudioCache(), BatchTTSSynthesizer()
+        )
+    return _pipeline
+
+
+class JobReporter:
+    """Persists stage, progress and per-stage wall time for a running job.
+
+    Progress inside a stage is written at most every ``min_interval`` seconds;
+    stage changes are always written.
+    """
+
+    def __init__(self, job_id: str, min_interval: float = 0.5):
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.stage_timings: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stage: Optional[str] = None
+        self._stage_started = time.monotonic()
+        self._last_write = 0.0
+
+    def report(self, stage: str, progress: float):
+        with self._lock:
+            now = time.monotonic()
+            stage_changed = stage != self._stage
+            if stage_changed:
+                self._close_stage(now)
+                self._stage = stage
+                self._stage_started = now
+            elif now - self._last_write < self.min_interval:
+                return
+            self._last_write = now
+            timings = dict(self.stage_timings)
+        job_store.update_progress(self.job_id, stage, round(progress, 4), timings)
+
+    def finish(self) -> Dict[str, float]:
+        with self._lock:
+            self._close_stage(time.monotonic())
+            self._stage = None
+            return dict(self.stage_timings)
+
+    def _close_stage(self, now: float):
+        if self._stage is not None:
+            elapsed = now - self._stage_started
+            self.stage_timings[self._stage] = round(self.stage_timings.get(self._stage, 0.0) + elapsed, 3)
+
+
+def run_process_video_job(job_id: str, upload_path: str, prompt: str, content_sha256: Optional[str] = None,
+                          use_analysis_cache: bool = True):
+    """Entry point executed inside a worker process"""
+    reporter = JobReporter(job_id)
+    try:
+        job_store.mark_running(job_id)
+        result = asyncio.run(_get_pipeline().run(
+            upload_path, prompt, report=reporter.report,
+            content_sha256=content_sha256, use_analysis_cache=use_analysis_cache
+        ))
+        job_store.mark_succeeded(job_id, result.model_dump(), reporter.finish())
+        logger.info(f"Job {job_id} finished")
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}")
+        job_store.mark_failed(job_id, str(e), reporter.finish())
+    finally:
+        if os.path.exists(upload_path):
+            os.remove(upload_path)
+
+
+def run_render_job(job_id: str, video_id: str, segments: List[Dict], audio_paths: List[str],
+                   audio_delays: List[float], profile_name: str, generation: int):
+    """Entry point for the full-quality render that follows an update's preview.
+
+    Runs under the video's render lock and gives up, marking the job
+    superseded, once a newer update than ``generation`` is requested.
+    """
+    from pipeline.update_video import run_full_render
+    from render.profiles import get_render_profile
+    from render.render_scheduler import RenderSuperseded, RenderTicket, exclusive_render
+    from render.segment_renderer import SegmentRenderer
+    from storage.media_storage import create_media_storage, video_key
+
+    reporter = JobReporter(job_id)
+    try:
+        job_store.mark_running(job_id)
+        reporter.report("rendering", 0.0)
+        storage = create_media_storage()
+        with exclusive_render(video_id):
+            stats = run_full_render(
+                SegmentRenderer(), storage, video_id, segments, audio_paths, audio_delays,
+                get_render_profile(profile_name), RenderTicket(video_id, generation),
+                report=lambda fraction: reporter.report("rendering", fraction)
+            )
+        job_store.mark_succeeded(job_id, {
+            "video_id": video_id,
+            "render_profile": profile_name,
+            "video_version": storage.version(video_key(video_id)),
+            "rendered_segments": len(stats.rendered),
+            "reused_segments": len(stats.reused)
+        }, reporter.finish())
+        logger.info(f"Render job {job_id} for {video_id} finished")
+    except RenderSuperseded as e:
+        logger.info(f"Render job {job_id}: {e}")
+        job_store.mark_superseded(job_id, str(e), reporter.finish())
+    except Exception as e:
+        logger.error(f"Render job {job_id} for {video_id} failed: {e}")
+        job_store.mark_failed(job_id, str(e), reporter.finish())
+
+
+class JobRunner:
+    """Process pool that runs queued jobs off the API event loop.
+
+    Each runner records its id on the jobs it creates and, once started,
+    holds an advisory lock named after it until the process exits. A free
+    lock therefore means the runner is gone: :meth:`start` fails the jobs
+    such runners left queued or running, since nothing would ever finish them.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or int(os.environ.get("JOB_WORKERS", "2"))
+        self.runner_id = cuid.cuid()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._registration = ExitStack()
+        self._executor = self._create_executor()
+
+    def start(self):
+        self._registration.enter_context(advisory_lock(RUNNER_LOCK_PREFIX + self.runner_id))
+        self.fail_abandoned_jobs()
+
+    def fail_abandoned_jobs(self) -> int:
+        failed = 0
+        for runner_id in job_store.unfinished_job_runners():
+            if runner_id is None:
+                failed += job_store.fail_runner_jobs(None, ABANDONED_ERROR)
+            elif runner_id != self.runner_id:
+                with try_advisory_lock(RUNNER_LOCK_PREFIX + runner_id) as gone:
+                    if gone:
+                        failed += job_store.fail_runner_jobs(runner_id, ABANDONED_ERROR)
+        if failed:
+            logger.warning(f"Marked {failed} job(s) of stopped servers failed")
+        return failed
+
+    def submit_process_video(self, upload_path: str, prompt: str, content_sha256: Optional[str] = None,
+                             use_analysis_cache: bool = True) -> str:
+        job_id = job_store.create_job(PROCESS_VIDEO_JOB, {
+            "prompt": prompt,
+            "upload_path": upload_path,
+            "content_sha256": content_sha256,
+            "use_analysis_cache": use_analysis_cache
+        }, self.runner_id)
+        self._submit(job_id, run_process_video_job, upload_path, prompt, content_sha256, use_analysis_cache)
+        return job_id
+
+    def submit_render(self, video_id: str, segments: List[Dict], audio_paths: List[str],
+                      audio_delays: List[float], profile_name: str, generation: int) -> str:
+        job_id = job_store.create_job(RENDER_VIDEO_JOB, {
+            "video_id": video_id,
+            "profile": profile_name,
+            "segments": len(segments),
+            "render_generation": generation,
+            "audio_paths": audio_paths
+        }, self.runner_id)
+        self._submit(job_id, run_render_job, video_id, segments, audio_paths, audio_delays, profile_name, generation)
+        return job_id
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _submit(self, job_id: str, fn, *args):
+        with self._lock:
+            executor = self._executor
+        try:
+            try:
+                future = executor.submit(fn, job_id, *args)
+            except BrokenProcessPool:
+                executor = self._replace_broken(executor)
+                future = executor.submit(fn, job_id, *args)
+        except Exception as e:
+            job_store.mark_failed(job_id, f"Could not start the job: {e}")
+            raise
+        future.add_done_callback(lambda f: self._on_done(job_id, executor, f))
+
+    def _replace_broken(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        # Every future of a broken pool fails at once; only the first of them swaps in a new pool
+        with self._lock:
+            if self._executor is broken and not self._closed:
+                logger.warning("Job worker pool broke, starting a new one")
+                broken.shutdown(wait=False)
+                self._executor = self._create_executor()
+            return self._executor
+
+    def _on_done(self, job_id: str, executor: ProcessPoolExecutor, future: Future):
+        # Errors inside the job are recorded by the worker; this only catches jobs that never got to run it
+        if future.cancelled():
+            logger.warning(f"Job {job_id} was cancelled before it started")
+            job_store.mark_failed(job_id, "Cancelled: the server shut down before the job started")
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Worker for job {job_id} crashed: {error}")
+            job_store.mark_failed(job_id, f"Worker crashed: {error}")
+            if isinstance(error, BrokenProcessPool):
+                self._replace_broken(executor)
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._registration.close()
@@ -1,30 +1,68 @@
+import asyncio
 import logging
 import os
 import cuid
 import json
 import subprocess
-from mutagen.mp3 import MP3
 import urllib
-from typing import List, Dict
+from dataclasses import asdict
+from functools import partial
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, TypeVar
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, Form, UploadFile, Response
+from fastapi import FastAPI, File, Form, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
-from tts.elevenlabs_tts_processor import ElevenLabsTTSProcessor
-from utils.db import get_db_cursor
-from video_processor.gemini_video_processor import GeminiVideoProcessor
+from jobs import job_store
+from jobs.worker import JobRunner
+from pipeline import update_video as update_pipeline
+from pipeline.process_video import ProcessVideoPipeline
+from render.profiles import get_render_profile
+from render.render_scheduler import RenderScheduler, RenderSuperseded, RenderTicket
+from render.segment_renderer import SegmentRenderer
+from render.timeline import parse_timestamp, plan_audio_fit, plan_timeline
+from repositories import video_repository
+from storage.media_lifecycle import MediaLifecycleManager
+from storage.media_storage import audio_key, create_media_storage, preview_key, source_key, video_key
+from tts.audio_cache import TTSAudioCache
+from tts.batch import BatchTTSSynthesizer
+from tts.elevenlabs_tts_processor import DEFAULT_VOICE_ID
+from tts.tts_processor import create_tts_processor
+from utils.db import close_async_pool, close_pool
+from utils.ffmpeg_executor import PRIORITY_INTERACTIVE, Cancellation, FFmpegCancelled, ffmpeg_context, get_executor
+from utils.http_cache import REVALIDATE_CACHE_CONTROL, etag_matches, versioned_url
+from utils.metrics import CONTENT_TYPE_LATEST, latest_metrics, timed
+from utils.uploads import UploadTooLargeError, save_upload
+from video_processor.video_processor import create_video_processor
 
 load_dotenv()
 app = FastAPI()
-gemini_processor = GeminiVideoProcessor()
-elevenlabs_processor = ElevenLabsTTSProcessor()
+# Gemini and ElevenLabs unless VIDEO_PROCESSOR_BACKEND / TTS_BACKEND select the offline fakes
+video_processor = create_video_processor()
+tts_processor = create_tts_processor()
+tts_synthesizer = BatchTTSSynthesizer()
+tts_cache = TTSAudioCache()
+segment_renderer = SegmentRenderer()
+render_scheduler = RenderScheduler()
+media_storage = create_media_storage()
+process_video_pipeline = ProcessVideoPipeline(
+    video_processor, tts_processor, tts_cache, tts_synthesizer, media_storage
+)
+job_runner = JobRunner()
+media_lifecycle = MediaLifecycleManager(media_storage, segment_renderer.cache_root, [tts_cache.cache_dir])
+
+JOB_EVENTS_POLL_INTERVAL = 1.0
+DISCONNECT_POLL_INTERVAL = 0.5
+AUDIO_CHUNK_SIZE = 64 * 1024
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +75,23 @@ app.add_middleware(
 # Mount the static directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+
+@app.on_event("startup")
+async def startup():
+    job_runner.start()
+    media_lifecycle.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    media_lifecycle.shutdown()
+    job_runner.shutdown()
+    tts_synthesizer.shutdown()
+    get_executor().shutdown()
+    await close_async_pool()
+    close_pool()
+
+
 @app.get("/")
 async def root():
     return FileResponse('static/index.html')
@@ -52,112 +107,218 @@ async def get_tts_models():
 @app.post("/process-video")
 async def process_video(
         video: UploadFile = File(...),
-        prompt: str = Form(...)
+        prompt: str = Form(...),
+        skip_analysis_cache: bool = Form(False)
 ):
+    upload = None
     try:
-        os.makedirs("static/videos/", exist_ok=True)
-        # Save the uploaded video temporarily
-        temp_video_path = f"temp_{video.filename}"
-        video_content = await video.read()
-        with open(temp_video_path, "wb") as temp_file:
-            temp_file.write(video_content)
-
-        # Process the video using GeminiVideoProcessor
-        result = gemini_processor.process(temp_video_path, prompt)
-        video_id = result.video_id.replace("files/", "")
-        logger.info(f"Generated video_id: {video_id}")
-        
-        # Save video file
-        video_path = os.path.join("static/videos/", f"{video_id}.mp4")
-        logger.info(f"Saving video to path: {video_path}")
-        with open(video_path, "wb") as video_file:
-            video_file.write(video_content)
-        subtitles = result.subtitles
-        logger.info(f"Generated subtitles: {subtitles}")
-        
-        # Create audio directory if it doesn't exist
-        os.makedirs("static/audio/", exist_ok=True)
-        
-        for subtitle in subtitles:
-            text = subtitle['text']
-            audio = elevenlabs_processor.process(text)
-            subtitle_id = cuid.cuid()
-            audio_filename = f"audio_{subtitle_id}.mp3"
-            audio_path = os.path.join("static/audio/", audio_filename)
-            
-            with open(audio_path, "wb") as audio_file:
-                audio_file.write(audio)
-            
-            # Get audio duration
-            audio_file = MP3(audio_path)
-            audio_length = audio_file.info.length
-            
-            # Store the audio ID and length that can be used with get_audio endpoint
-            subtitle['audio_id'] = f"audio_{subtitle_id}"
-            subtitle['audio_length'] = audio_length
-        os.remove(temp_video_path)
+        # Stream the upload to disk; the pipeline moves it into media storage
+        upload = await save_upload(video)
+        logger.info(f"Received {upload.size} byte upload with sha256 {upload.sha256}")
+
+        result = await process_video_pipeline.run(
+            upload.path, prompt,
+            content_sha256=upload.sha256, use_analysis_cache=not skip_analysis_cache
+        )
         return {"success": True, "result": result}
+    except UploadTooLargeError as e:
+        logger.error(f"Rejected upload: {str(e)}")
+        return {"success": False, "error": str(e)}
     except Exception as e:
         logger.error(f"Error processing video: {str(e)}")
         return {"success": False, "error": str(e)}
+    finally:
+        if upload is not None and os.path.exists(upload.path):
+            os.remove(upload.path)
+
+
+@app.post("/jobs/process-video")
+async def submit_process_video_job(
+        video: UploadFile = File(...),
+        prompt: str = Form(...),
+        skip_analysis_cache: bool = Form(False)
+):
+    try:
+        upload = await save_upload(video)
+        job_id = await run_in_threadpool(
+            job_runner.submit_process_video, upload.path, prompt, upload.sha256, not skip_analysis_cache
+        )
+        return {"success": True, "job_id": job_id}
+    except Exception as e:
+        logger.error(f"Error submitting video job: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    try:
+        job = await run_in_threadpool(job_store.get_job, job_id)
+        if job is None:
+            return {"success": False, "error": "Job not found"}
+        return {"success": True, "job": job}
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events with the job state whenever it changes, until the job finishes"""
+    async def events():
+        last_payload = None
+        while True:
+            job = await run_in_threadpool(job_store.get_job, job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            payload = json.dumps(job, default=str)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+            if job["status"] in job_store.TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint: per-stage latency, ffmpeg cost and TTS usage"""
+    return Response(await run_in_threadpool(latest_metrics), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/tts-cache/stats")
+async def get_tts_cache_stats():
+    return {"success": True, "stats": tts_cache.stats()}
+
+
+@app.get("/media/stats")
+async def get_media_stats():
+    return {"success": True, "stats": media_lifecycle.stats()}
+
+
+@app.post("/media/sweep")
+async def sweep_media():
+    """Run a lifecycle sweep now instead of waiting for the next interval"""
+    try:
+        report = await run_in_threadpool(media_lifecycle.sweep)
+        return {"success": True, "sweep": asdict(report)}
+    except Exception as e:
+        logger.error(f"Error sweeping media: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+async def _stream_audio(first_chunk: bytes, chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    yield first_chunk
+    async for chunk in iterate_in_threadpool(chunks):
+        yield chunk
+
+
+async def _stream_file(audio_file: BinaryIO) -> AsyncIterator[bytes]:
+    with audio_file:
+        async for chunk in iterate_in_threadpool(iter(partial(audio_file.read, AUDIO_CHUNK_SIZE), b"")):
+            yield chunk
 
 
 @app.post("/text-to-speech")
 async def text_to_speech(text: str = Form(...)):
     try:
-        audio = elevenlabs_processor.process(text)
-        return Response(content=audio, media_type="audio/mpeg")
+        key = tts_processor.cache_key(text)
+        cached_file = await run_in_threadpool(tts_cache.open_audio, key)
+        if cached_file is not None:
+            # Served from the open file, which stays readable even if the entry is evicted meanwhile
+            return StreamingResponse(
+                _stream_file(cached_file), media_type="audio/mpeg",
+                headers={"content-length": str(os.fstat(cached_file.fileno()).st_size)}
+            )
+        # Sent to the client as ElevenLabs produces it, and cached once the last chunk is through
+        chunks = tts_cache.stream_into(key, tts_processor.stream(text))
+        # Wait for the first chunk here, so a failed synthesis still gets an error response
+        first_chunk = await run_in_threadpool(next, chunks, b"")
+        return StreamingResponse(_stream_audio(first_chunk, chunks), media_type="audio/mpeg")
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 @app.get("/videos/{video_id}")
-async def get_video_only(video_id: str):
+async def get_video_only(video_id: str, request: Request):
     try:
         video_id = urllib.parse.unquote(video_id).replace("files/", "")
         logger.info(f"Getting video with ID: {video_id}")
-        video_path = os.path.join("static/videos/", f"{video_id}.mp4")
-        logger.info(f"Looking for video at path: {video_path}")
-        if not os.path.exists(video_path):
-            logger.error(f"Video file not found at path: {video_path}")
+        key = video_key(video_id)
+        logger.info(f"Looking for video {key}")
+        if not await run_in_threadpool(media_storage.exists, key):
+            logger.error(f"Video file not found: {key}")
             return {"success": False, "error": "Video file not found"}
-        return FileResponse(video_path, media_type="video/mp4")
+        # Re-rendered in place: revalidated by ETag, or cached for good under a ?v= versioned URL
+        return await run_in_threadpool(media_storage.serve, request, key, "video/mp4")
     except Exception as e:
         logger.error(f"Error serving video: {str(e)}")
         return {"success": False, "error": str(e)}
 
+@app.get("/videos/{video_id}/preview")
+async def get_video_preview(video_id: str, request: Request):
+    try:
+        video_id = urllib.parse.unquote(video_id).replace("files/", "")
+        key = preview_key(video_id)
+        if not await run_in_threadpool(media_storage.exists, key):
+            return {"success": False, "error": "No preview available for this video"}
+        return await run_in_threadpool(media_storage.serve, request, key, "video/mp4")
+    except Exception as e:
+        logger.error(f"Error serving video preview: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+def detail_etag(transcript_version: int, video_version: Optional[str]) -> str:
+    # The transcripts and the rendered file are all a detail response depends on
+    return f'"{transcript_version}-{video_version or "none"}"'
+
+
 @app.get("/video/{video_id}/detail")
-async def get_video(video_id: str):
+async def get_video(video_id: str, request: Request):
     try:
         video_id = urllib.parse.unquote(video_id).replace("files/", "")
         logger.info(f"Getting video details with ID: {video_id}")
-        
-        # Get video transcripts from database
-        with get_db_cursor() as cursor:
-            # First check if video exists
-            cursor.execute(
-                "SELECT video_id, transcripts FROM videos WHERE video_id = %s",
-                (video_id,)
-            )
-            result = cursor.fetchone()
-            logger.info(f"Database query result: {result}")
-            result = dict(result)
-            if not result:
-                logger.error(f"No video found for video_id: {video_id}")
-                return {"success": False, "error": "Video not found in database"}
-            
-            if result["transcripts"] is None:
-                logger.error(f"No transcripts found for video_id: {video_id}")
-                return {"success": False, "error": "No transcripts available for this video"}
-            
-            transcripts = result["transcripts"]  # Get transcripts from the second column
-            logger.info(f"Found transcripts for video_id: {video_id}")
-            logger.info(f"Transcripts content: {transcripts}")
-            
-            return {
-                "success": True,
-                "video_url": f"http://localhost:8000/videos/{video_id}",
-                "transcripts": transcripts
-            }
+
+        try:
+            video_version = await run_in_threadpool(media_storage.version, video_key(video_id))
+        except FileNotFoundError:
+            video_version = None
+        if request.headers.get("if-none-match"):
+            # Revalidation only needs the version numbers, not the transcripts
+            transcript_version = await video_repository.get_transcript_version_async(video_id)
+            if transcript_version is not None:
+                etag = detail_etag(transcript_version, video_version)
+                if etag_matches(request.headers.get("if-none-match"), etag):
+                    return Response(status_code=304, headers={"etag": etag, "cache-control": REVALIDATE_CACHE_CONTROL})
+
+        # Get video transcripts from database without blocking the event loop
+        result = await video_repository.get_video_async(video_id)
+        logger.info(f"Database query result: {result}")
+        if not result:
+            logger.error(f"No video found for video_id: {video_id}")
+            return {"success": False, "error": "Video not found in database"}
+
+        if result["transcripts"] is None:
+            logger.error(f"No transcripts found for video_id: {video_id}")
+            return {"success": False, "error": "No transcripts available for this video"}
+
+        transcripts = result["transcripts"]  # Get transcripts from the second column
+        logger.info(f"Found transcripts for video_id: {video_id}")
+        logger.info(f"Transcripts content: {transcripts}")
+
+        video_url = f"http://localhost:8000/videos/{video_id}"
+        if video_version is not None:
+            video_url = versioned_url(video_url, video_version)
+        return JSONResponse({
+            "success": True,
+            "video_url": video_url,
+            "transcripts": transcripts,
+            "transcript_version": result["transcript_version"],
+            "media_info": result["media_info"]
+        }, headers={
+            "etag": detail_etag(result["transcript_version"], video_version),
+            "cache-control": REVALIDATE_CACHE_CONTROL
+        })
     except Exception as e:
         logger.error(f"Error getting video details: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -165,238 +326,224 @@ async def get_video(video_id: str):
 
 
 @app.get("/audio/{audio_id}")
-async def get_audio(audio_id: str):
+async def get_audio(audio_id: str, request: Request):
     try:
-        audio_filename = f"{audio_id}.mp3"
-        audio_path = os.path.join("static/audio/", audio_filename)
-        
-        if not os.path.exists(audio_path):
+        key = audio_key(audio_id)
+        if not await run_in_threadpool(media_storage.exists, key):
             return {"success": False, "error": "Audio file not found"}
-            
-        return FileResponse(audio_path, media_type="audio/mpeg")
+
+        # Every synthesis gets a new audio_id, so an audio URL never changes content
+        return await run_in_threadpool(media_storage.serve, request, key, "audio/mpeg", True)
     except Exception as e:
         logger.error(f"Error serving audio: {str(e)}")
         return {"success": False, "error": str(e)}
 
+class TranscriptPatch(BaseModel):
+    cues: Dict[int, Dict]  # Cue index -> fields to merge into that cue, e.g. {"3": {"text": "..."}}
+    version: Optional[int] = None  # Only apply the patch if the transcript is still at this version
+
+
+@app.patch("/video/{video_id}/transcripts")
+async def patch_video_transcripts(video_id: str, patch: TranscriptPatch):
+    """Edit single cues in place; the video itself is re-rendered by the next update"""
+    try:
+        video_id = urllib.parse.unquote(video_id).replace("files/", "")
+        result = await run_in_threadpool(video_repository.patch_transcripts, video_id, patch.cues, patch.version)
+        return {"success": True, **result}
+    except video_repository.TranscriptVersionConflict as e:
+        return {"success": False, "error": str(e), "version": e.current}
+    except Exception as e:
+        logger.error(f"Error patching transcripts: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
+@app.get("/video/{video_id}/transcripts/changes")
+async def get_transcript_changes(video_id: str, since: int, until: Optional[int] = None):
+    """Indexes of the cues that differ between two transcript versions (``until`` defaults to the current one)"""
+    try:
+        video_id = urllib.parse.unquote(video_id).replace("files/", "")
+        changed = await run_in_threadpool(video_repository.changed_cues, video_id, since, until)
+        if changed is None:
+            return {"success": False, "error": "Unknown transcript version"}
+        return {"success": True, "changed_indexes": changed}
+    except Exception as e:
+        logger.error(f"Error diffing transcripts: {str(e)}")
+        return {"success": False, "error": str(e)}
+
+
 class TranscriptUpdate(BaseModel):
     video_id: str
     transcripts: List[Dict[str, str]]
-    voice_id: str = "AZnzlk1XvdvUeBnXmlld"  # Default voice ID
+    voice_id: str = DEFAULT_VOICE_ID
+    render_profile: Optional[str] = None  # "preview", "standard" or "archival"; defaults to DEFAULT_RENDER_PROFILE
+    fit_mode: Optional[str] = None  # "video" (retime the footage) or "audio" (fit the voiceover); see FIT_MODES
+
+
+async def cancel_on_disconnect(request: Request, cancellation: Cancellation):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    logger.info(f"Client of {request.url.path} disconnected, stopping its ffmpeg runs")
+    cancellation.cancel()
+
+
+async def render_for_client(request: Request, ticket: RenderTicket, render: Callable[[], T]) -> T:
+    """Run an update's render ahead of background work, and kill its ffmpeg runs if the client goes away"""
+    cancellation = Cancellation()
+    watcher = asyncio.ensure_future(cancel_on_disconnect(request, cancellation))
+    try:
+        with ffmpeg_context(PRIORITY_INTERACTIVE, cancellation):
+            return await render_scheduler.run(ticket, render)
+    finally:
+        watcher.cancel()
 
 
 @app.post("/video/{video_id}/update")
-async def update_video(video_id: str, update: TranscriptUpdate):
+@timed("update_video")
+async def update_video(video_id: str, update: TranscriptUpdate, request: Request):
     try:
         # Decode video_id and log
         video_id = urllib.parse.unquote(video_id).replace("files/", "")
         logger.info(f"Updating video with ID: {video_id}")
+        try:
+            render_profile = get_render_profile(update.render_profile)
+            fit_mode = update_pipeline.get_fit_mode(update.fit_mode)
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
 
-        # Create temporary audio directory
-        logger.info("Creating temporary audio directory")
-        os.makedirs("static/temp_audio/", exist_ok=True)
-        audio_files = []  # Will store dicts with keys: path, start, end, audio_length, orig_start, orig_end
+        audio_files = []  # Will store dicts with keys: path, audio_length, orig_start, orig_end
 
-        logger.info("Generating audio for each transcript")
-        # (Assume update.transcripts is sorted by start time, e.g. "MM:SS")
-        for transcript in update.transcripts:
-            text = transcript['text']
-            logger.debug(f"Processing text: {text}")
-            audio = elevenlabs_processor.process(text, voice_id=update.voice_id)
-            subtitle_id = cuid.cuid()
-            audio_filename = f"temp_audio_{subtitle_id}.mp3"
-            audio_path = os.path.join("static/temp_audio/", audio_filename)
-
-            logger.debug(f"Saving audio to {audio_path}")
-            with open(audio_path, "wb") as audio_file:
-                audio_file.write(audio)
-
-            # Get audio duration
-            logger.debug("Getting audio duration and updating transcript timing")
-            mp3_audio = MP3(audio_path)
-            audio_length = mp3_audio.info.length
-
-            # Convert transcript start and end (format "MM:SS") to seconds
-            start_sec = sum(x * int(t) for x, t in zip([60, 1], transcript['start'].split(":")))
-            end_sec = sum(x * int(t) for x, t in zip([60, 1], transcript['end'].split(":")))
-            video_duration = end_sec - start_sec
+        try:
+            cue_starts = [parse_timestamp(transcript['start']) for transcript in update.transcripts]
+            cue_ends = [parse_timestamp(transcript['end']) for transcript in update.transcripts]
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
 
+        logger.info("Generating audio for each transcript")
+        # Only this node's renderer reads the voiceover files, so they stay in local scratch space. Each is linked
+        # out of the cache as soon as it is ready: later cues of a long update may evict the cached copy.
+        syntheses = await tts_synthesizer.synthesize_all(
+            lambda text: process_video_pipeline.synthesize_cached(
+                text, voice_id=update.voice_id,
+                dest_path=media_storage.scratch_path(f"temp_audio_{cuid.cuid()}.mp3")
+            ),
+            [transcript['text'] for transcript in update.transcripts]
+        )
+        failed_indexes = [synthesis.index for synthesis in syntheses if not synthesis.ok]
+        if update.transcripts and len(failed_indexes) == len(update.transcripts):
+            return {"success": False, "error": f"Failed to generate audio: {syntheses[0].error}"}
+
+        # Lines whose audio failed are left out, so their range plays at normal speed without voiceover.
+        for synthesis, start_sec, end_sec in zip(syntheses, cue_starts, cue_ends):
+            if not synthesis.ok:
+                logger.error(f"Skipping audio for transcript {synthesis.index}: {synthesis.error}")
+                continue
+            cached_audio = synthesis.value
             audio_files.append({
-                'path': audio_path,
-                'start': transcript['start'],
-                'end': transcript['end'],
-                'audio_length': audio_length,
-                'video_duration': video_duration,
+                'path': cached_audio.path,
+                'audio_length': cached_audio.duration,
                 'orig_start': start_sec,
                 'orig_end': end_sec
             })
 
-        logger.info("Preparing video paths")
-        video_path = os.path.join("static/videos/", f"{video_id}.mp4")
-        output_path = os.path.join("static/videos/", f"{video_id}_with_audio.mp4")
-        temp_path = os.path.join("static/videos/", f"{video_id}_temp.mp4")
+        audio_paths = [af['path'] for af in audio_files]
+        render_job_id = None  # Set once the full render (and the temporary audio) is handed to a worker
+        # From here on, renders of earlier updates of this video are stale and stop at their next check
+        ticket = await run_in_threadpool(render_scheduler.request, video_id)
+
+        # Segments are always cut from the original upload, so cached chunks stay valid across updates
+        if not await run_in_threadpool(media_storage.exists, source_key(video_id)):
+            logger.info(f"Preserving original video as {source_key(video_id)}")
+            await run_in_threadpool(media_storage.copy, video_key(video_id), source_key(video_id))
 
-        # First, extract the video without audio (we will re-encode the video)
         try:
-            logger.info("Step 1: Extracting video without audio")
-            extract_cmd = [
-                "ffmpeg", "-y",
-                "-i", video_path,
-                "-c:v", "copy",
-                "-an",
-                temp_path
-            ]
-            logger.info(f"Running FFmpeg extract command: {' '.join(extract_cmd)}")
-            subprocess.run(extract_cmd, check=True, capture_output=True, text=True)
-
-            # Get total video duration using ffprobe
-            ffprobe_cmd = [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                temp_path
-            ]
-            result = subprocess.run(ffprobe_cmd, capture_output=True, text=True)
-            video_total_duration = float(result.stdout.strip())
+            # Duration was probed at upload and stored with the video
+            media_info = await run_in_threadpool(update_pipeline.get_media_info, media_storage, video_id)
+            video_total_duration = media_info["duration"]
             logger.info(f"Total video duration: {video_total_duration} seconds")
 
-            # Build segments for video processing.
-            # We want to create segments for:
-            #   • Non-transcript parts (which remain at normal speed)
-            #   • Transcript segments (which will be slowed down so that their new duration equals the corresponding MP3 length)
-            segments = []
-            audio_delays = []  # new timeline start for each transcript segment audio
-
-            current_orig = 0  # current position in the original video timeline
-            new_time = 0  # accumulator for new (stretched) timeline time
-
-            # Process each transcript segment (assumed in order)
-            for idx, af in enumerate(audio_files):
-                orig_start = af['orig_start']
-                orig_end = af['orig_end']
-
-                # If there is a gap before this transcript segment, add it as a non-transcript segment
-                if orig_start > current_orig:
-                    seg_duration = orig_start - current_orig
-                    segments.append({
-                        "type": "non",
-                        "start": current_orig,
-                        "end": orig_start,
-                        "new_duration": seg_duration
-                    })
-                    new_time += seg_duration
-                    current_orig = orig_start
-
-                # Transcript segment – calculate slowdown factor so new duration equals MP3 duration
-                seg_orig_duration = orig_end - orig_start
-                factor = af['audio_length'] / seg_orig_duration if seg_orig_duration > 0 else 1
-                segments.append({
-                    "type": "transcript",
-                    "start": orig_start,
-                    "end": orig_end,
-                    "new_duration": af['audio_length'],
-                    "factor": factor,
-                    "audio_index": idx
-                })
-                # Record the new timeline start for this transcript audio
-                audio_delays.append(new_time)
-                new_time += af['audio_length']
-                current_orig = orig_end
-
-            # Add any remaining video after the last transcript
-            if current_orig < video_total_duration:
-                segments.append({
-                    "type": "non",
-                    "start": current_orig,
-                    "end": video_total_duration,
-                    "new_duration": video_total_duration - current_orig
-                })
-
-            # Build the filter_complex for video.
-            # For each segment, we trim from the video input and (if a transcript segment) apply setpts to slow it down.
-            vf_parts = []
-            seg_labels = []
-            for i, seg in enumerate(segments):
-                if seg["type"] == "non":
-                    # Normal segment – just trim and reset pts
-                    vf_parts.append(
-                        f"[0:v]trim=start={seg['start']}:end={seg['end']},setpts=PTS-STARTPTS[seg{i}]".replace("{i}",
-                                                                                                               str(i)))
-                else:
-                    # Transcript segment – slow down by factor so that new duration = original duration * factor
-                    vf_parts.append(
-                        f"[0:v]trim=start={seg['start']}:end={seg['end']},setpts=PTS-STARTPTS,setpts=PTS*{seg['factor']:.4f}[seg{i}]".replace(
-                            "{i}", str(i)))
-                seg_labels.append(f"[seg{i}]".replace("{i}", str(i)))
-            # Concatenate all video segments together
-            concat_filter = "".join(seg_labels) + f"concat=n={len(segments)}:v=1:a=0[v]"
-            video_filter_complex = ";".join(vf_parts + [concat_filter])
-            logger.debug(f"Video filter_complex: {video_filter_complex}")
-
-            # Build filter_complex for audio.
-            # For each transcript’s MP3 we delay its start by the new timeline offset computed above.
-            audio_filters = []
-            for i, delay in enumerate(audio_delays, start=1):
-                delay_ms = int(delay * 1000)
-                audio_filters.append(f"[{i}:a]volume=1.0,adelay={delay_ms}|{delay_ms}[a{i}]")
-            if audio_filters:
-                amix_input = "".join(f"[a{i}]" for i in range(1, len(audio_filters) + 1))
-                audio_filter_complex = ";".join(audio_filters + [
-                    f"{amix_input}amix=inputs={len(audio_filters)}:dropout_transition=0:normalize=0[aout]"])
+            if fit_mode == "video":
+                # Non-transcript parts keep their speed; transcript parts are retimed to their MP3 length
+                plan = plan_timeline(
+                    [af['orig_start'] for af in audio_files], [af['orig_end'] for af in audio_files],
+                    [af['audio_length'] for af in audio_files], video_total_duration
+                )
+                segments, audio_delays = plan.segments, plan.audio_delays
+                logger.info(f"Planned {len(segments)} segments, new duration {plan.duration:.2f} seconds")
             else:
-                # If no transcript audio exists, we won’t add any audio
-                audio_filter_complex = ""
-
-            # Combine video and audio filter_complex strings.
-            if audio_filter_complex:
-                filter_complex = video_filter_complex + ";" + audio_filter_complex
+                # The timeline stays as it is: each voiceover is sped up, padded or cut to fit its cue
+                fit = plan_audio_fit(
+                    [af['orig_start'] for af in audio_files], [af['orig_end'] for af in audio_files],
+                    [af['audio_length'] for af in audio_files], video_total_duration
+                )
+
+            # Only segments whose range or speed changed since the last render are re-encoded.
+            # A fast low-res preview is returned right away; the requested profile renders in the
+            # background and replaces the stored video when it finishes. Renders of one video run one
+            # at a time, and one overtaken by a newer update while it waits is dropped.
+            if fit_mode == "audio":
+                # The new track is muxed under the original video stream, which is not re-encoded
+                render_stats = await render_for_client(request, ticket, lambda: update_pipeline.run_audio_fit_render(
+                    segment_renderer, media_storage, video_id, audio_paths, fit, render_profile, ticket
+                ))
+            elif render_profile.name == update_pipeline.PREVIEW_PROFILE:
+                render_stats = await render_for_client(request, ticket, lambda: update_pipeline.run_full_render(
+                    segment_renderer, media_storage, video_id, segments, audio_paths, audio_delays, render_profile,
+                    ticket
+                ))
             else:
-                filter_complex = video_filter_complex
-
-            # Build the final FFmpeg command.
-            mix_cmd = ["ffmpeg", "-y", "-i", temp_path]
-            # Append each audio file input
-            for af in audio_files:
-                mix_cmd.extend(["-i", af['path']])
-            mix_cmd.extend([
-                "-filter_complex", filter_complex,
-                "-map", "[v]",
-                "-map", "[aout]",
-                "-c:v", "libx264",
-                "-preset", "slow",  # Ensure high quality encoding
-                "-crf", "18",  # Lower CRF for higher quality output
-                "-c:a", "aac",
-                "-b:a", "256k",
-                output_path
-            ])
-
-            logger.info(f"Running FFmpeg mix command: {' '.join(mix_cmd)}")
-            process = subprocess.run(mix_cmd, check=True, capture_output=True, text=True)
-            logger.info(f"FFmpeg stdout: {process.stdout}")
-            logger.error(f"FFmpeg stderr: {process.stderr}")
-
-            logger.info("Replacing original video with the new one")
-            os.replace(output_path, video_path)
-
+                render_stats = await render_for_client(request, ticket, lambda: update_pipeline.render_and_replace(
+                    segment_renderer, media_storage, video_id, segments, audio_paths, audio_delays,
+                    preview_key(video_id), get_render_profile(update_pipeline.PREVIEW_PROFILE), ticket
+                ))
+                # Versioned before the job starts, as the job deletes the preview when it finishes
+                preview_url = versioned_url(
+                    f"http://localhost:8000/videos/{video_id}/preview",
+                    await run_in_threadpool(media_storage.version, preview_key(video_id))
+                )
+                render_job_id = await run_in_threadpool(
+                    job_runner.submit_render, video_id, segments, audio_paths, audio_delays, render_profile.name,
+                    ticket.generation
+                )
+
+        except RenderSuperseded as e:
+            logger.info(str(e))
+            return {"success": False, "superseded": True, "error": str(e)}
+        except FFmpegCancelled as e:
+            logger.info(f"Update of {video_id} abandoned: {e}")
+            return {"success": False, "error": str(e)}
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg error: {e.stderr}")
             return {"success": False, "error": f"Failed to merge audio: {e.stderr}"}
         finally:
-            logger.info("Cleaning up temporary files")
-            # Remove temporary video and audio files
-            for path in [temp_path] + [af['path'] for af in audio_files]:
-                if os.path.exists(path):
-                    os.remove(path)
-                    logger.debug(f"Removed temporary file: {path}")
+            if render_job_id is None:
+                logger.info("Cleaning up temporary files")
+                # Remove temporary audio files
+                for path in audio_paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+                        logger.debug(f"Removed temporary file: {path}")
 
         logger.info("Updating transcripts in database")
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                "UPDATE videos SET transcripts = %s WHERE video_id = %s",
-                (json.dumps(update.transcripts), video_id)
-            )
+        transcript_version = await run_in_threadpool(video_repository.upsert_transcripts, video_id, update.transcripts)
 
         logger.info("Video update completed successfully")
-        return {"success": True, "message": "Video updated successfully"}
+        response = {
+            "success": True,
+            "message": "Video updated successfully",
+            "render_profile": render_profile.name,
+            "fit_mode": fit_mode,
+            "transcript_version": transcript_version,
+            "failed_indexes": failed_indexes,
+            "rendered_segments": len(render_stats.rendered),
+            "reused_segments": len(render_stats.reused)
+        }
+        if render_job_id is not None:
+            response["preview_url"] = preview_url
+            response["render_job_id"] = render_job_id
+        else:
+            video_version = await run_in_threadpool(media_storage.version, video_key(video_id))
+            response["video_url"] = versioned_url(f"http://localhost:8000/videos/{video_id}", video_version)
+        return response
 
     except Exception as e:
         logger.error(f"Error updating video: {str(e)}")
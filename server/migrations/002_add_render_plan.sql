@@ -0,0 +1 @@
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS render_plan JSONB;
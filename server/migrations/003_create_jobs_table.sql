@@ -0,0 +1,17 @@
+CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR(64) PRIMARY KEY,
+    kind VARCHAR(64) NOT NULL,
+    status VARCHAR(32) NOT NULL DEFAULT 'queued',
+    stage VARCHAR(64),
+    progress REAL NOT NULL DEFAULT 0,
+    params JSONB,
+    result JSONB,
+    error TEXT,
+    stage_timings JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status);
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS video_analyses (
+    analysis_key CHAR(64) PRIMARY KEY,
+    content_sha256 CHAR(64) NOT NULL,
+    video_id VARCHAR(255) NOT NULL REFERENCES videos (video_id) ON DELETE CASCADE,
+    subtitles JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS video_analyses_content_sha256_idx ON video_analyses (content_sha256);
@@ -0,0 +1 @@
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS media_info JSONB;
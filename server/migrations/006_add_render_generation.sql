@@ -0,0 +1 @@
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS render_generation BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,10 @@
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS transcript_version BIGINT NOT NULL DEFAULT 0;
+
+-- One row per saved transcript version: the md5 of every cue's JSON, in cue order
+CREATE TABLE IF NOT EXISTS transcript_versions (
+    video_id VARCHAR(255) NOT NULL REFERENCES videos (video_id) ON DELETE CASCADE,
+    version BIGINT NOT NULL,
+    cue_hashes TEXT[] NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (video_id, version)
+);
@@ -0,0 +1,20 @@
+-- Stored files whose owner is not in their key (voiceover audio), and the transcript version they were made for.
+-- No foreign key: the rows must outlive a deleted video so its files can still be found and removed.
+CREATE TABLE IF NOT EXISTS media_objects (
+    key TEXT PRIMARY KEY,
+    video_id VARCHAR(255) NOT NULL,
+    kind VARCHAR(32) NOT NULL,
+    transcript_version BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS media_objects_video_id_idx ON media_objects (video_id);
+
+-- Audio ids that saved transcripts already refer to belong to that video's current version
+INSERT INTO media_objects (key, video_id, kind, transcript_version)
+SELECT 'audio/' || (cue ->> 'audio_id') || '.mp3', videos.video_id, 'audio', videos.transcript_version
+FROM videos, jsonb_array_elements(
+    CASE WHEN jsonb_typeof(videos.transcripts) = 'array' THEN videos.transcripts ELSE '[]'::jsonb END
+) AS cue
+WHERE jsonb_typeof(cue) = 'object' AND COALESCE(cue ->> 'audio_id', '') <> ''
+ON CONFLICT (key) DO NOTHING;
@@ -0,0 +1 @@
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS runner_id VARCHAR(64);
@@ -0,0 +1,188 @@
+import asyncio
+import copy
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+import cuid
+
+from models.video_processor import ProcessedVideoResponse
+from repositories import media_repository, video_repository
+from storage.media_storage import MediaStorage, audio_key, create_media_storage, source_key, video_key
+from tts.audio_cache import CachedAudio, TTSAudioCache
+from tts.batch import BatchTTSSynthesizer
+from tts.elevenlabs_tts_processor import DEFAULT_VOICE_ID
+from tts.tts_processor import TTSProcessor
+from utils.media import probe_media
+from utils.metrics import timed
+from video_processor import analysis_cache
+from video_processor.video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+# Overall progress reported when each stage starts
+STAGE_PROGRESS = {
+    "uploading": 0.0,
+    "analyzing": 0.3,
+    "saving_video": 0.5,
+    "synthesizing": 0.55,
+    "done": 1.0,
+}
+
+
+def _no_report(stage: str, progress: float):
+    pass
+
+
+class ProcessVideoPipeline:
+    """Upload -> Gemini subtitles -> per-line TTS, shared by /process-video and the job workers"""
+
+    def __init__(self, video_processor: VideoProcessor, tts_processor: TTSProcessor,
+                 tts_cache: TTSAudioCache, tts_synthesizer: BatchTTSSynthesizer,
+                 storage: Optional[MediaStorage] = None):
+        self.video_processor = video_processor
+        self.tts_processor = tts_processor
+        self.tts_cache = tts_cache
+        self.tts_synthesizer = tts_synthesizer
+        self.storage = storage or create_media_storage()
+
+    def synthesize_cached(self, text: str, voice_id: str = DEFAULT_VOICE_ID,
+                          dest_path: Optional[str] = None) -> CachedAudio:
+        """Return cached audio for the text/voice, calling ElevenLabs only on a miss.
+
+        With ``dest_path`` the audio is linked there straight away, out of reach of cache eviction.
+        """
+        key = self.tts_processor.cache_key(text, voice_id=voice_id)
+        # Chunks go to the cache file as they arrive instead of being buffered whole
+        return self.tts_cache.get_or_create(
+            key, lambda: self.tts_processor.stream(text, voice_id=voice_id), dest_path=dest_path
+        )
+
+    @timed("process_video")
+    async def run(self, upload_path: str, prompt: str,
+                  report: Optional[Callable[[str, float], None]] = None,
+                  content_sha256: Optional[str] = None, use_analysis_cache: bool = True) -> ProcessedVideoResponse:
+        """Process an upload; the file at ``upload_path`` is moved into media storage.
+
+        When ``content_sha256`` is given, a byte-identical video analyzed with the
+        same prompt within the TTL reuses the stored video_id and subtitles
+        without calling the video processor.
+        """
+        report = report or _no_report
+
+        analysis_key = None
+        cached_analysis = None
+        if content_sha256:
+            analysis_key = self.video_processor.analysis_key(content_sha256, prompt)
+            if use_analysis_cache:
+                cached_analysis = await asyncio.to_thread(analysis_cache.find_analysis, analysis_key)
+
+        if cached_analysis is not None:
+            logger.info(f"Reusing analysis of video_id {cached_analysis['video_id']} for sha256 {content_sha256}")
+            result = ProcessedVideoResponse(
+                video_id=cached_analysis["video_id"], subtitles=cached_analysis["subtitles"]
+            )
+        else:
+            # Process the video using the video processor
+            result = await self.video_processor.process_async(
+                upload_path, prompt,
+                on_stage=lambda stage: report(stage, STAGE_PROGRESS[stage])
+            )
+            if analysis_key is not None:
+                await asyncio.to_thread(
+                    analysis_cache.store_analysis, analysis_key, content_sha256, result.video_id.replace("files/", ""),
+                    copy.deepcopy(result.subtitles)
+                )
+        video_id = result.video_id.replace("files/", "")
+        logger.info(f"Generated video_id: {video_id}")
+
+        report("saving_video", STAGE_PROGRESS["saving_video"])
+        # Storage may be remote, so the transfer runs off the event loop
+        await asyncio.to_thread(self._save_video, upload_path, video_id, cached_analysis is not None)
+        await asyncio.to_thread(self._store_media_info, video_id)
+        subtitles = result.subtitles
+        logger.info(f"Generated subtitles: {subtitles}")
+
+        report("synthesizing", STAGE_PROGRESS["synthesizing"])
+        # Each line is linked out of the cache as soon as it is ready; later lines may evict the cached copy
+        synthesize = self._with_line_progress(
+            lambda text: self.synthesize_cached(
+                text, dest_path=self.storage.scratch_path(f"temp_audio_{cuid.cuid()}.mp3")
+            ),
+            len(subtitles), report
+        )
+        syntheses = await self.tts_synthesizer.synthesize_all(
+            synthesize,
+            [subtitle['text'] for subtitle in subtitles]
+        )
+        audio_uploads = []
+        for subtitle, synthesis in zip(subtitles, syntheses):
+            if not synthesis.ok:
+                logger.error(f"Skipping audio for subtitle {synthesis.index}: {synthesis.error}")
+                subtitle['audio_error'] = str(synthesis.error)
+                continue
+            cached_audio = synthesis.value
+            subtitle_id = cuid.cuid()
+            audio_uploads.append(
+                asyncio.to_thread(self._store_audio, audio_key(f"audio_{subtitle_id}"), cached_audio.path)
+            )
+
+            # Store the audio ID and length that can be used with get_audio endpoint
+            subtitle['audio_id'] = f"audio_{subtitle_id}"
+            subtitle['audio_length'] = cached_audio.duration
+        await asyncio.gather(*audio_uploads)
+        # Audio keys do not name their video, so the lifecycle sweeper learns who owns them from the index
+        await asyncio.to_thread(
+            media_repository.register_media, video_id, media_repository.AUDIO_MEDIA,
+            [audio_key(subtitle['audio_id']) for subtitle in subtitles if 'audio_id' in subtitle]
+        )
+
+        report("done", STAGE_PROGRESS["done"])
+        return result
+
+    def _store_audio(self, key: str, path: str):
+        # Local storage hard-links the scratch MP3; remote storage uploads it
+        try:
+            self.storage.put_file(key, path)
+        finally:
+            os.remove(path)
+
+    def _save_video(self, upload_path: str, video_id: str, keep_existing: bool):
+        if keep_existing and self.storage.exists(video_key(video_id)):
+            # The bytes are identical to what we already have, possibly with edits applied since
+            logger.info(f"Keeping existing video {video_key(video_id)}")
+            return
+        logger.info(f"Saving video as {video_key(video_id)}")
+        # Move the upload in instead of writing it a second time. The original is kept for segment
+        # rendering and the served video starts as a copy of it (a hard link when stored locally).
+        self.storage.put_file(source_key(video_id), upload_path, move=True)
+        self.storage.copy(source_key(video_id), video_key(video_id))
+
+    def _store_media_info(self, video_id: str):
+        # Probed once here so updates can plan their timeline without touching the file
+        try:
+            with self.storage.local_file(source_key(video_id)) as source_path:
+                video_repository.save_media_info(video_id, probe_media(source_path))
+        except Exception as e:
+            # Not fatal: the first update probes the file instead
+            logger.warning(f"Could not record media info for {video_id}: {e}")
+
+    @staticmethod
+    def _with_line_progress(synthesize: Callable, total: int, report: Callable) -> Callable:
+        if report is _no_report or total == 0:
+            return synthesize
+        lock = threading.Lock()
+        finished = [0]
+        start = STAGE_PROGRESS["synthesizing"]
+
+        def synthesize_and_report(text):
+            try:
+                return synthesize(text)
+            finally:
+                with lock:
+                    finished[0] += 1
+                    progress = start + (STAGE_PROGRESS["done"] - start) * finished[0] / total
+                report("synthesizing", min(progress, 0.99))
+
+        return synthesize_and_report
@@ -0,0 +1,134 @@
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+from render.profiles import RenderProfile
+from render.render_scheduler import RenderTicket
+from render.segment_renderer import RenderStats, SegmentRenderer
+from render.timeline import AudioFitPlan
+from repositories import video_repository
+from storage.media_storage import MediaStorage, preview_key, source_key, video_key
+from utils.media import probe_media
+from utils.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_PROFILE = "preview"
+
+# "video" retimes the footage to each voiceover and re-encodes it; "audio" fits each voiceover to its cue
+# and stream-copies the video
+FIT_MODES = ("video", "audio")
+DEFAULT_FIT_MODE = os.environ.get("DEFAULT_FIT_MODE", "video")
+
+
+def get_fit_mode(name: Optional[str] = None) -> str:
+    name = name or DEFAULT_FIT_MODE
+    if name not in FIT_MODES:
+        raise ValueError(f"Unknown fit mode '{name}', expected one of {', '.join(FIT_MODES)}")
+    return name
+
+
+def get_media_info(storage: MediaStorage, video_id: str) -> Dict:
+    """Media metadata recorded at upload; probed and stored once for videos uploaded before that"""
+    video = video_repository.get_video(video_id)
+    if video is not None and video.get("media_info"):
+        return video["media_info"]
+    logger.info(f"No stored media info for {video_id}, probing the source")
+    with storage.local_file(source_key(video_id)) as source_path:
+        media_info = probe_media(source_path)
+    video_repository.save_media_info(video_id, media_info)
+    return media_info
+
+
+def render_and_replace(renderer: SegmentRenderer, storage: MediaStorage, video_id: str, segments: List[Dict],
+                       audio_paths: Sequence[str], audio_delays: Sequence[float], target_key: str,
+                       profile: RenderProfile, ticket: Optional[RenderTicket] = None,
+                       report: Optional[Callable[[float], None]] = None) -> RenderStats:
+    """Render to a staging file and store it under ``target_key``, so readers never see a partial file.
+
+    With a ``ticket`` the render is abandoned (RenderSuperseded) as soon as a
+    newer update of the video is requested, and a stale result is never stored.
+    ``report`` receives the render's progress (see :meth:`SegmentRenderer.render`).
+    """
+    check = ticket.check if ticket is not None else None
+
+    def render(tmp_path: str) -> RenderStats:
+        with timed_stage(f"render.{profile.name}", video_id=video_id, segments=len(segments)), \
+                storage.local_file(source_key(video_id)) as source_path:
+            return renderer.render(
+                video_id, source_path, segments, audio_paths, audio_delays, tmp_path, profile, check, report
+            )
+
+    return _stage_and_store(storage, target_key, render, check)
+
+
+def _stage_and_store(storage: MediaStorage, target_key: str, render: Callable[[str], RenderStats],
+                     check: Optional[Callable[[], None]]) -> RenderStats:
+    tmp_path = storage.staging_path(target_key)
+    try:
+        stats = render(tmp_path)
+        if check is not None:
+            check()
+        storage.put_file(target_key, tmp_path, move=True)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return stats
+
+
+def _remove_audio(audio_paths: Sequence[str]):
+    for path in audio_paths:
+        if os.path.exists(path):
+            os.remove(path)
+            logger.debug(f"Removed temporary file: {path}")
+
+
+def run_full_render(renderer: SegmentRenderer, storage: MediaStorage, video_id: str, segments: List[Dict],
+                    audio_paths: Sequence[str], audio_delays: Sequence[float], profile: RenderProfile,
+                    ticket: Optional[RenderTicket] = None,
+                    report: Optional[Callable[[float], None]] = None) -> RenderStats:
+    """Render the final video over the stored video and retire the preview.
+
+    Owns ``audio_paths``: the temporary voiceover files are removed once the
+    render is done, whether it succeeded or not.
+    """
+    try:
+        logger.info(f"Rendering {profile.name} video for {video_id}")
+        stats = render_and_replace(
+            renderer, storage, video_id, segments, audio_paths, audio_delays, video_key(video_id), profile, ticket,
+            report
+        )
+        video_repository.save_render_plan(video_id, {
+            "fit_mode": "video", "segments": stats.plan, "audio_delays": list(audio_delays), "profile": profile.name
+        })
+        storage.delete(preview_key(video_id))
+        return stats
+    finally:
+        _remove_audio(audio_paths)
+
+
+def run_audio_fit_render(renderer: SegmentRenderer, storage: MediaStorage, video_id: str,
+                         audio_paths: Sequence[str], fit: AudioFitPlan, profile: RenderProfile,
+                         ticket: Optional[RenderTicket] = None) -> RenderStats:
+    """Replace the stored video's voiceover in place: the "audio" fit mode of :func:`run_full_render`.
+
+    The original upload's video stream is copied, so this takes about as long
+    as decoding the voiceovers and needs no preview. Owns ``audio_paths``.
+    """
+    check = ticket.check if ticket is not None else None
+
+    def render(tmp_path: str) -> RenderStats:
+        with timed_stage("render.remux", video_id=video_id, cues=len(audio_paths)), \
+                storage.local_file(source_key(video_id)) as source_path:
+            return renderer.remux(video_id, source_path, audio_paths, fit, tmp_path, profile, check)
+
+    try:
+        logger.info(f"Remuxing {video_id} with {len(audio_paths)} fitted voiceover(s)")
+        stats = _stage_and_store(storage, video_key(video_id), render, check)
+        video_repository.save_render_plan(video_id, {
+            "fit_mode": "audio", "audio_delays": fit.audio_delays, "tempos": fit.tempos, "profile": profile.name
+        })
+        storage.delete(preview_key(video_id))
+        return stats
+    finally:
+        _remove_audio(audio_paths)
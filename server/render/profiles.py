@@ -0,0 +1,68 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """Encoder settings for the update render, selectable per request"""
+    name: str
+    preset: str
+    crf: int
+    audio_bitrate: str
+    max_height: Optional[int] = None  # Downscale for draft renders; None keeps the source resolution
+    threads: int = 0  # 0 lets ffmpeg pick based on the core count
+    filter_threads: int = 0
+
+    def video_encode_args(self) -> List[str]:
+        return [
+            "-c:v", "libx264",
+            "-preset", self.preset,
+            "-crf", str(self.crf),
+            "-pix_fmt", "yuv420p",
+        ]
+
+    def audio_encode_args(self) -> List[str]:
+        return ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
+    def thread_args(self) -> List[str]:
+        return ["-threads", str(self.threads), "-filter_threads", str(self.filter_threads)]
+
+    def scale_filter(self) -> Optional[str]:
+        if self.max_height is None:
+            return None
+        # Never upscale, and keep the width even as libx264 requires
+        return f"scale=-2:'min({self.max_height},ih)'"
+
+    def cache_identity(self) -> List[str]:
+        """Everything that changes the encoded pixels; thread counts do not"""
+        return self.video_encode_args() + [self.scale_filter() or ""]
+
+
+def _env_threads(name: str) -> int:
+    return int(os.environ.get(name, "0"))
+
+
+RENDER_PROFILES: Dict[str, RenderProfile] = {
+    "preview": RenderProfile(
+        "preview", preset="ultrafast", crf=28, audio_bitrate="128k", max_height=480,
+        threads=_env_threads("FFMPEG_THREADS"), filter_threads=_env_threads("FFMPEG_FILTER_THREADS")
+    ),
+    "standard": RenderProfile(
+        "standard", preset="veryfast", crf=21, audio_bitrate="192k",
+        threads=_env_threads("FFMPEG_THREADS"), filter_threads=_env_threads("FFMPEG_FILTER_THREADS")
+    ),
+    "archival": RenderProfile(
+        "archival", preset="slow", crf=18, audio_bitrate="256k",
+        threads=_env_threads("FFMPEG_THREADS"), filter_threads=_env_threads("FFMPEG_FILTER_THREADS")
+    ),
+}
+
+DEFAULT_RENDER_PROFILE = os.environ.get("DEFAULT_RENDER_PROFILE", "archival")
+
+
+def get_render_profile(name: Optional[str] = None) -> RenderProfile:
+    name = name or DEFAULT_RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile '{name}', expected one of {', '.join(RENDER_PROFILES)}")
+    return RENDER_PROFILES[name]
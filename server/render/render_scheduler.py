@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, TypeVar
+
+from repositories import video_repository
+from utils.db import advisory_lock
+from utils.metrics import RENDERS_SUPERSEDED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RenderSuperseded(Exception):
+    pass
+
+
+def render_lock_name(video_id: str) -> str:
+    return f"render:{video_id}"
+
+
+class RenderTicket:
+    """One update's claim on rendering a video, identified by the render generation it was given.
+
+    ``latest`` returns the newest generation requested for the video; by
+    default it is read from the database, which every process and node shares.
+    """
+
+    def __init__(self, video_id: str, generation: int, latest: Optional[Callable[[], int]] = None):
+        self.video_id = video_id
+        self.generation = generation
+        self._latest = latest or (lambda: video_repository.get_render_generation(video_id))
+
+    def superseded(self) -> bool:
+        return self._latest() > self.generation
+
+    def check(self):
+        """Raise RenderSuperseded once a newer update of the video has been requested"""
+        if self.superseded():
+            RENDERS_SUPERSEDED.labels(state="running").inc()
+            raise RenderSuperseded(f"Render {self.generation} of {self.video_id} was superseded by a newer update")
+
+
+@contextmanager
+def exclusive_render(video_id: str):
+    """Hold the video's render lock across processes: renders of one video share its segment cache and outputs"""
+    with advisory_lock(render_lock_name(video_id)):
+        yield
+
+
+class RenderScheduler:
+    """Runs the renders of each video one at a time, and only the latest of those waiting.
+
+    Every update claims a new render generation first (:meth:`request`).
+    Renders of the same video then queue on an asyncio lock in this process,
+    so waiting costs neither a thread nor a database connection, and a render
+    that reaches the front of the queue after a newer update was requested is
+    dropped without running. The render itself holds the video's advisory lock
+    and checks its ticket between segments, so job workers and other nodes
+    coalesce the same way.
+
+    :meth:`run` must only be awaited from one event loop (the API's): the
+    per-video queues are asyncio locks, and the dicts holding them are only
+    changed by coroutines on that loop, without a thread lock. :meth:`request`
+    and :meth:`latest_known` may be called from any thread.
+    """
+
+    def __init__(self):
+        self.dropped = 0
+        self._latest: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiting: Dict[str, int] = {}
+        self._state_lock = threading.Lock()
+
+    def request(self, video_id: str) -> RenderTicket:
+        """Register a new update of ``video_id``; earlier updates' renders are superseded from now on"""
+        generation = video_repository.next_render_generation(video_id)
+        with self._state_lock:
+            self._latest[video_id] = max(self._latest.get(video_id, 0), generation)
+        return RenderTicket(video_id, generation)
+
+    def latest_known(self, video_id: str) -> int:
+        with self._state_lock:
+            return self._latest.get(video_id, 0)
+
+    async def run(self, ticket: RenderTicket, render: Callable[[], T]) -> T:
+        """Run ``render`` on a worker thread after the earlier renders of the same video.
+
+        Raises RenderSuperseded, without rendering, if a newer update of the
+        video was requested while this one waited.
+        """
+        video_id = ticket.video_id
+        lock = self._locks.get(video_id)
+        if lock is None:
+            # Created inside the running loop; asyncio primitives bind to a loop on Python 3.9
+            lock = self._locks[video_id] = asyncio.Lock()
+        self._waiting[video_id] = self._waiting.get(video_id, 0) + 1
+        try:
+            async with lock:
+                if self.latest_known(video_id) > ticket.generation:
+                    self.dropped += 1
+                    RENDERS_SUPERSEDED.labels(state="queued").inc()
+                    logger.info(f"Dropped queued render {ticket.generation} of {video_id}: a newer update arrived")
+                    raise RenderSuperseded(f"Render {ticket.generation} of {video_id} was superseded while queued")
+                return await asyncio.to_thread(self._run_exclusive, video_id, render)
+        finally:
+            self._waiting[video_id] -= 1
+            if not self._waiting[video_id]:
+                del self._waiting[video_id]
+                del self._locks[video_id]
+                # Forgotten once the latest update has rendered; a newer one that has not reached run() yet stays
+                with self._state_lock:
+                    if self._latest.get(video_id, 0) <= ticket.generation:
+                        del self._latest[video_id]
+
+    @staticmethod
+    def _run_exclusive(video_id: str, render: Callable[[], T]) -> T:
+        with exclusive_render(video_id):
+            return render()
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from render.profiles import RenderProfile, get_render_profile
+from render.timeline import AudioFitPlan
+from render.voiceover import build_voiceover_track, pcm_input_args
+from utils.ffmpeg import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RenderStats:
+    plan: List[Dict] = field(default_factory=list)
+    rendered: List[str] = field(default_factory=list)
+    reused: List[str] = field(default_factory=list)
+
+
+def source_fingerprint(source_path: str) -> str:
+    stat = os.stat(source_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def segment_key(fingerprint: str, segment: Dict, encode_args: Sequence[str]) -> str:
+    """Cache key of a rendered video chunk.
+
+    Only what changes the encoded pixels goes in: the source, its range, the
+    speed factor and the encoder settings. Audio is muxed after the concat, so
+    a rewritten line whose TTS has the same length reuses its chunk.
+    """
+    payload = json.dumps({
+        "source": fingerprint,
+        "start": round(float(segment["start"]), 3),
+        "end": round(float(segment["end"]), 3),
+        "factor": round(float(segment.get("factor", 1)), 4),
+        "encode": list(encode_args),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def build_chunk_command(source_path: str, segment: Dict, chunk_path: str, profile: RenderProfile) -> List[str]:
+    video_filter = "setpts=PTS-STARTPTS"
+    if segment["type"] == "transcript":
+        # Slow down by factor so that new duration = original duration * factor
+        video_filter += f",setpts=PTS*{segment['factor']:.4f}"
+    if profile.scale_filter():
+        video_filter += f",{profile.scale_filter()}"
+    return [
+        "ffmpeg", "-y",
+        "-ss", f"{segment['start']:.3f}",
+        "-t", f"{segment['end'] - segment['start']:.3f}",
+        "-i", source_path,
+        "-map", "0:v:0",
+        "-vf", video_filter,
+        *profile.video_encode_args(),
+        *profile.thread_args(),
+        "-an",
+        chunk_path
+    ]
+
+
+def build_mux_command(concat_list_path: str, voiceover_path: Optional[str], output_path: str,
+                      profile: RenderProfile) -> List[str]:
+    """Join the chunks (stream copy) and add the voiceover track: never more than two inputs"""
+    cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", concat_list_path]
+    if voiceover_path:
+        cmd.extend([*pcm_input_args(), "-i", voiceover_path, "-map", "0:v", "-map", "1:a",
+                    *profile.audio_encode_args()])
+    else:
+        cmd.extend(["-map", "0:v"])
+    cmd.extend(["-c:v", "copy", "-movflags", "+faststart", output_path])
+    return cmd
+
+
+def build_remux_command(source_path: str, voiceover_path: Optional[str], output_path: str,
+                        profile: RenderProfile) -> List[str]:
+    """Put the voiceover track under the source's own video stream, which is copied, not encoded"""
+    cmd = ["ffmpeg", "-y", "-i", source_path]
+    if voiceover_path:
+        cmd.extend([*pcm_input_args(), "-i", voiceover_path, "-map", "0:v:0", "-map", "1:a",
+                    *profile.audio_encode_args()])
+    else:
+        cmd.extend(["-map", "0:v:0"])
+    cmd.extend(["-c:v", "copy", "-movflags", "+faststart", output_path])
+    return cmd
+
+
+class SegmentRenderer:
+    """Renders a segment plan as independently cached video chunks.
+
+    Chunks live in ``{cache_root}/{video_id}/{profile}/{key}.mp4``, so each
+    profile keeps (and prunes) its own chunks. A render only
+    encodes chunks whose key is missing, joins all chunks with the concat
+    demuxer (stream copy) and muxes a single pre-mixed voiceover track on top.
+    """
+
+    def __init__(self, cache_root: str = None, run: Callable = run_ffmpeg):
+        self.cache_root = cache_root or os.environ.get("SEGMENT_CACHE_DIR", "static/segments/")
+        self.run = run
+
+    def chunk_dir(self, video_id: str, profile: RenderProfile) -> str:
+        return os.path.join(self.cache_root, video_id, profile.name)
+
+    def plan_chunks(self, video_id: str, source_path: str, segments: List[Dict],
+                    profile: Optional[RenderProfile] = None) -> List[Dict]:
+        """Annotate each segment with its chunk key and cache path"""
+        profile = profile or get_render_profile()
+        fingerprint = source_fingerprint(source_path)
+        chunk_dir = self.chunk_dir(video_id, profile)
+        planned = []
+        for segment in segments:
+            key = segment_key(fingerprint, segment, profile.cache_identity())
+            planned.append({**segment, "chunk_key": key, "chunk_path": os.path.join(chunk_dir, f"{key}.mp4")})
+        return planned
+
+    def render(self, video_id: str, source_path: str, segments: List[Dict], audio_paths: Sequence[str],
+               audio_delays: Sequence[float], output_path: str, profile: Optional[RenderProfile] = None,
+               check: Optional[Callable[[], None]] = None,
+               report: Optional[Callable[[float], None]] = None) -> RenderStats:
+        """Render ``segments`` to ``output_path``.
+
+        ``check`` is called before each encode and may raise to abandon the
+        render, e.g. once a newer update has made it stale; finished chunks stay cached.
+        ``report`` receives the encoded fraction of the chunks that were missing, live from ffmpeg's progress.
+        """
+        profile = profile or get_render_profile()
+        check = check or (lambda: None)
+        chunk_dir = self.chunk_dir(video_id, profile)
+        os.makedirs(chunk_dir, exist_ok=True)
+        planned = self.plan_chunks(video_id, source_path, segments, profile)
+        stats = RenderStats(plan=[
+            {key: value for key, value in segment.items() if key != "chunk_path"} for segment in planned
+        ])
+
+        missing_seconds = sum(
+            segment["new_duration"] for segment in planned if not os.path.exists(segment["chunk_path"])
+        )
+        encoded_seconds = 0.0
+        for segment in planned:
+            if os.path.exists(segment["chunk_path"]):
+                # The mtime tracks last use, so quota eviction drops the chunks no render has needed longest
+                os.utime(segment["chunk_path"])
+                stats.reused.append(segment["chunk_key"])
+                continue
+            check()
+            progress_kwargs = {}
+            if report is not None and missing_seconds > 0:
+                progress_kwargs["on_progress"] = self._progress_reporter(report, encoded_seconds, missing_seconds)
+            tmp_path = f"{segment['chunk_path']}.{uuid.uuid4().hex}.tmp.mp4"
+            cmd = build_chunk_command(source_path, segment, tmp_path, profile)
+            logger.info(f"Rendering segment {segment['start']}-{segment['end']}: {' '.join(cmd)}")
+            try:
+                self.run(cmd, check=True, capture_output=True, text=True, operation="encode", **progress_kwargs)
+                os.replace(tmp_path, segment["chunk_path"])
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            stats.rendered.append(segment["chunk_key"])
+            encoded_seconds += segment["new_duration"]
+        logger.info(f"Rendered {len(stats.rendered)} segment(s), reused {len(stats.reused)} ({profile.name} profile)")
+
+        render_id = uuid.uuid4().hex
+        concat_list_path = os.path.join(chunk_dir, f"concat_{render_id}.txt")
+        voiceover_path = os.path.join(chunk_dir, f"voiceover_{render_id}.pcm") if audio_paths else None
+        with open(concat_list_path, "w") as concat_list:
+            for segment in planned:
+                concat_list.write(f"file '{os.path.abspath(segment['chunk_path'])}'\n")
+        try:
+            check()
+            if voiceover_path:
+                build_voiceover_track(audio_paths, audio_delays, voiceover_path, run=self.run)
+            mux_cmd = build_mux_command(concat_list_path, voiceover_path, output_path, profile)
+            logger.info(f"Running FFmpeg mux command: {' '.join(mux_cmd)}")
+            self.run(mux_cmd, check=True, capture_output=True, text=True, operation="mux")
+        finally:
+            for path in (concat_list_path, voiceover_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+        self.prune(chunk_dir, {segment["chunk_key"] for segment in planned})
+        return stats
+
+    def remux(self, video_id: str, source_path: str, audio_paths: Sequence[str], fit: AudioFitPlan,
+              output_path: str, profile: Optional[RenderProfile] = None,
+              check: Optional[Callable[[], None]] = None) -> RenderStats:
+        """Render for the audio fit mode: the voiceover is fitted to the cues and the video is stream-copied.
+
+        No chunk is encoded, so the cost is decoding the cues and one remux.
+        ``check`` works as in :meth:`render`.
+        """
+        profile = profile or get_render_profile()
+        check = check or (lambda: None)
+        chunk_dir = self.chunk_dir(video_id, profile)
+        os.makedirs(chunk_dir, exist_ok=True)
+        voiceover_path = os.path.join(chunk_dir, f"voiceover_{uuid.uuid4().hex}.pcm") if audio_paths else None
+        try:
+            check()
+            if voiceover_path:
+                build_voiceover_track(audio_paths, fit.audio_delays, voiceover_path, run=self.run,
+                                      tempos=fit.tempos, slot_lengths=fit.slot_lengths)
+            check()
+            remux_cmd = build_remux_command(source_path, voiceover_path, output_path, profile)
+            logger.info(f"Running FFmpeg remux command: {' '.join(remux_cmd)}")
+            self.run(remux_cmd, check=True, capture_output=True, text=True, operation="mux")
+        finally:
+            if voiceover_path and os.path.exists(voiceover_path):
+                os.remove(voiceover_path)
+        return RenderStats()
+
+    @staticmethod
+    def _progress_reporter(report: Callable[[float], None], done_seconds: float,
+                           total_seconds: float) -> Callable[[Dict[str, str]], None]:
+        def on_progress(event: Dict[str, str]):
+            out_time_us = event.get("out_time_us", "")
+            if out_time_us.isdigit():
+                report(min(1.0, (done_seconds + int(out_time_us) / 1e6) / total_seconds))
+        return on_progress
+
+    @staticmethod
+    def prune(chunk_dir: str, keep_keys: set):
+        """Delete chunks that the latest plan no longer references"""
+        for filename in os.listdir(chunk_dir):
+            key, ext = os.path.splitext(filename)
+            if ext == ".mp4" and "." not in key and key not in keep_keys:
+                os.remove(os.path.join(chunk_dir, filename))
+                logger.debug(f"Pruned stale segment chunk {filename}")
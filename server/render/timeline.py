@@ -0,0 +1,213 @@
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# "SS", "MM:SS" or "HH:MM:SS", with optional fractional seconds ("01:02.345" or SRT-style "01:02,345").
+# Multiline so a whole column of cues can be matched in one pass.
+_TIMESTAMP_RE = re.compile(r"^[ \t]*(?:(\d+):)??(?:(\d+):)?(\d+(?:[.,]\d*)?)[ \t]*$", re.MULTILINE)
+
+# Gaps shorter than this are rounding noise, not footage worth a segment
+_EPSILON = 1e-6
+
+
+def parse_timestamp(value: Union[str, int, float]) -> float:
+    """Convert a subtitle timestamp to seconds, rounded to the millisecond"""
+    if isinstance(value, (int, float)):
+        return round(float(value), 3)
+    match = _TIMESTAMP_RE.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Invalid timestamp '{value}', expected [HH:]MM:SS[.mmm]")
+    hours, minutes, seconds = match.groups()
+    return round(int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds.replace(",", ".")), 3)
+
+
+def format_timestamp(seconds: float) -> str:
+    """Inverse of :func:`parse_timestamp`: "MM:SS", with milliseconds only when there are any"""
+    millis = int(round(seconds * 1000))
+    minutes, millis = divmod(millis, 60000)
+    whole_seconds, millis = divmod(millis, 1000)
+    formatted = f"{minutes:02d}:{whole_seconds:02d}"
+    return f"{formatted}.{millis:03d}" if millis else formatted
+
+
+def parse_timestamps(values: Sequence[Union[str, int, float]]) -> np.ndarray:
+    """Vector form of :func:`parse_timestamp`, matching all string timestamps with one regex scan"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iuf":
+        return np.round(values.astype(float), 3)
+    if all(isinstance(value, (int, float)) for value in values):
+        return np.round(np.asarray(values, dtype=float), 3)
+    if not all(isinstance(value, str) and "\n" not in value for value in values):
+        return np.array([parse_timestamp(value) for value in values], dtype=float)
+
+    matches = _TIMESTAMP_RE.findall("\n".join(values))
+    if len(matches) != len(values):
+        # Some line did not match; parse one by one to report which
+        return np.array([parse_timestamp(value) for value in values], dtype=float)
+    if not matches:
+        return np.zeros(0)
+    hours, minutes, seconds = zip(*matches)
+    total = (
+        np.array([int(h) if h else 0 for h in hours], dtype=float) * 3600
+        + np.array([int(m) if m else 0 for m in minutes], dtype=float) * 60
+        + np.array([float(sec.replace(",", ".")) for sec in seconds])
+    )
+    return np.round(total, 3)
+
+
+def get_factor_limits() -> Tuple[float, float]:
+    """Bounds for the per-cue slow-down factor; audio that needs more simply overruns its segment"""
+    return (
+        float(os.environ.get("RETIME_MIN_FACTOR", "0.5")),
+        float(os.environ.get("RETIME_MAX_FACTOR", "4.0")),
+    )
+
+
+def get_tempo_limits() -> Tuple[float, float]:
+    """Bounds for the speed-up applied to a voiceover in the audio fit mode"""
+    return (
+        float(os.environ.get("AUDIO_FIT_MIN_TEMPO", "1.0")),
+        float(os.environ.get("AUDIO_FIT_MAX_TEMPO", "1.5")),
+    )
+
+
+@dataclass
+class TimelinePlan:
+    """Segment plan for the renderer plus, per input cue, where its audio starts in the new timeline"""
+    segments: List[Dict]
+    audio_delays: List[float]
+    duration: float
+
+
+def plan_timeline(starts: Sequence[Union[str, float]], ends: Sequence[Union[str, float]],
+                  audio_lengths: Sequence[float], video_duration: float,
+                  min_factor: float = None, max_factor: float = None) -> TimelinePlan:
+    """Retime a video so each cue's footage lasts as long as its voiceover.
+
+    Cue ``i`` covers ``starts[i]``-``ends[i]`` of the source and has a voiceover
+    of ``audio_lengths[i]`` seconds, which is ``audio_index`` ``i`` in the plan.
+    Footage between cues keeps its speed. Cues may be unsorted; a cue that
+    overlaps earlier ones only keeps the part of its range not already covered,
+    and a cue that is fully covered gets no footage of its own, so its audio
+    starts where the covering footage ends. Cues are clipped to the video.
+    Slow-down factors are clamped to ``[min_factor, max_factor]``.
+    """
+    if min_factor is None or max_factor is None:
+        default_min, default_max = get_factor_limits()
+        min_factor = default_min if min_factor is None else min_factor
+        max_factor = default_max if max_factor is None else max_factor
+
+    starts = parse_timestamps(starts)
+    ends = parse_timestamps(ends)
+    audio_lengths = np.asarray(audio_lengths, dtype=float)
+    if not len(starts) == len(ends) == len(audio_lengths):
+        raise ValueError("starts, ends and audio_lengths must have the same length")
+
+    order = np.argsort(starts, kind="stable")
+    start = np.clip(starts[order], 0, video_duration)
+    end = np.maximum(np.clip(ends[order], 0, video_duration), start)
+    audio = audio_lengths[order]
+
+    # Source time already used by earlier cues; each cue starts no earlier than that
+    covered = np.concatenate(([0.0], np.maximum.accumulate(end)[:-1]))
+    start = np.maximum(start, covered)
+    end = np.maximum(end, start)
+    gap = start - covered
+    gap[gap < _EPSILON] = 0.0
+
+    orig_duration = end - start
+    has_footage = orig_duration > _EPSILON
+    factor = np.ones_like(orig_duration)
+    np.divide(audio, orig_duration, out=factor, where=has_footage)
+    factor = np.clip(factor, min_factor, max_factor)
+    new_duration = np.where(has_footage, orig_duration * factor, 0.0)
+
+    timeline_end = np.cumsum(gap + new_duration)
+    delay = timeline_end - new_duration
+    audio_delays = np.empty_like(delay)
+    audio_delays[order] = delay
+
+    # The math above is vectorized; only building the output dicts walks the cues, on plain Python values
+    segments = []
+    for cue_index, gap_start, cue_start, cue_end, gap_length, cue_length, cue_factor, footage in zip(
+            order.tolist(), covered.tolist(), start.tolist(), end.tolist(), gap.tolist(),
+            new_duration.tolist(), factor.tolist(), has_footage.tolist()):
+        if gap_length > 0:
+            segments.append({"type": "non", "start": gap_start, "end": cue_start, "new_duration": gap_length})
+        if footage:
+            segments.append({
+                "type": "transcript",
+                "start": cue_start,
+                "end": cue_end,
+                "new_duration": cue_length,
+                "factor": cue_factor,
+                "audio_index": cue_index
+            })
+
+    source_used = float(end.max()) if len(end) else 0.0
+    duration = float(timeline_end[-1]) if len(timeline_end) else 0.0
+    if video_duration - source_used > _EPSILON:
+        segments.append({
+            "type": "non",
+            "start": source_used,
+            "end": float(video_duration),
+            "new_duration": float(video_duration) - source_used
+        })
+        duration += float(video_duration) - source_used
+
+    return TimelinePlan(segments=segments, audio_delays=audio_delays.tolist(), duration=duration)
+
+
+@dataclass
+class AudioFitPlan:
+    """Per input cue: where its audio starts, its tempo, and the slot it must end within"""
+    audio_delays: List[float]
+    tempos: List[float]
+    slot_lengths: List[float]
+    duration: float
+
+
+def plan_audio_fit(starts: Sequence[Union[str, float]], ends: Sequence[Union[str, float]],
+                   audio_lengths: Sequence[float], video_duration: float,
+                   min_tempo: float = None, max_tempo: float = None) -> AudioFitPlan:
+    """Fit each cue's voiceover into its ``starts[i]``-``ends[i]`` slot and keep the footage as is.
+
+    The counterpart of :func:`plan_timeline` for renders that stream-copy the
+    video. A slot ends where the next cue starts at the latest and is clipped
+    to the video. Audio is played ``audio_length / slot`` times faster,
+    clamped to ``[min_tempo, max_tempo]``; with the default minimum of 1 short
+    lines are padded with silence rather than slowed down, and whatever
+    still overruns its slot is trimmed.
+    """
+    if min_tempo is None or max_tempo is None:
+        default_min, default_max = get_tempo_limits()
+        min_tempo = default_min if min_tempo is None else min_tempo
+        max_tempo = default_max if max_tempo is None else max_tempo
+
+    starts = parse_timestamps(starts)
+    ends = parse_timestamps(ends)
+    audio_lengths = np.asarray(audio_lengths, dtype=float)
+    if not len(starts) == len(ends) == len(audio_lengths):
+        raise ValueError("starts, ends and audio_lengths must have the same length")
+
+    order = np.argsort(starts, kind="stable")
+    start = np.clip(starts[order], 0, video_duration)
+    end = np.clip(ends[order], 0, video_duration)
+    next_start = np.concatenate((start[1:], [video_duration]))
+    slot = np.maximum(np.minimum(end, next_start) - start, 0.0)
+    slot[slot < _EPSILON] = 0.0
+
+    tempo = np.ones_like(slot)
+    np.divide(audio_lengths[order], slot, out=tempo, where=slot > 0)
+    tempo = np.clip(tempo, min_tempo, max_tempo)
+
+    audio_delays, tempos, slot_lengths = (np.empty_like(slot) for _ in range(3))
+    audio_delays[order] = start
+    tempos[order] = tempo
+    slot_lengths[order] = slot
+    return AudioFitPlan(
+        audio_delays=audio_delays.tolist(), tempos=tempos.tolist(), slot_lengths=slot_lengths.tolist(),
+        duration=float(video_duration)
+    )
@@ -0,0 +1,111 @@
+import logging
+import os
+import uuid
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.ffmpeg import run_ffmpeg
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# The voiceover track is raw signed 16-bit little-endian PCM, matching ElevenLabs' 44.1 kHz output
+SAMPLE_RATE = 44100
+CHANNELS = 2
+FRAME_BYTES = CHANNELS * 2
+BLOCK_BYTES = 64 * 1024 * FRAME_BYTES
+# Ramp applied where a line that overruns its slot is cut, so it does not end in a click
+TRIM_FADE_SECONDS = 0.05
+# Range of a single atempo instance in older ffmpeg releases; larger changes are chained
+ATEMPO_MIN, ATEMPO_MAX = 0.5, 2.0
+
+
+def pcm_input_args() -> List[str]:
+    """ffmpeg options that describe a track written by :func:`build_voiceover_track`"""
+    return ["-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS)]
+
+
+def atempo_filter(tempo: float) -> str:
+    """``atempo`` chain that changes speed by ``tempo`` without changing pitch"""
+    stages = []
+    while tempo > ATEMPO_MAX or tempo < ATEMPO_MIN:
+        step = ATEMPO_MAX if tempo > ATEMPO_MAX else ATEMPO_MIN
+        stages.append(step)
+        tempo /= step
+    stages.append(tempo)
+    return ",".join(f"atempo={stage:.4f}" for stage in stages)
+
+
+def build_decode_command(audio_path: str, pcm_path: str, tempo: float = 1.0,
+                         max_seconds: Optional[float] = None) -> List[str]:
+    """Decode a cue to PCM, optionally sped up by ``tempo`` and cut (with a short fade) after ``max_seconds``"""
+    filters = []
+    if abs(tempo - 1.0) > 1e-4:
+        filters.append(atempo_filter(tempo))
+    limit = []
+    if max_seconds is not None:
+        filters.append(f"afade=t=out:st={max(0.0, max_seconds - TRIM_FADE_SECONDS):.3f}:d={TRIM_FADE_SECONDS}")
+        limit = ["-t", f"{max_seconds:.3f}"]
+    filter_args = ["-af", ",".join(filters)] if filters else []
+    return ["ffmpeg", "-y", "-i", audio_path, "-vn", *filter_args, *limit, *pcm_input_args(), pcm_path]
+
+
+def _mix_block(block: bytes, existing: bytes) -> bytes:
+    # Cues normally never overlap, but clamped retiming can let a long line run into the next one
+    mixed = np.frombuffer(block, dtype="<i2").astype(np.int32)
+    mixed[:len(existing) // 2] += np.frombuffer(existing, dtype="<i2")
+    return np.clip(mixed, -32768, 32767).astype("<i2").tobytes()
+
+
+def write_at(track_fd: int, pcm_path: str, offset_bytes: int):
+    """Copy a decoded cue into the track at ``offset_bytes`` one block at a time, summing any overlap"""
+    position = offset_bytes
+    with open(pcm_path, "rb") as pcm:
+        while True:
+            block = pcm.read(BLOCK_BYTES)
+            block = block[:len(block) - len(block) % FRAME_BYTES]
+            if not block:
+                break
+            existing = os.pread(track_fd, len(block), position)
+            if existing.strip(b"\0"):
+                block = _mix_block(block, existing)
+            os.pwrite(track_fd, block, position)
+            position += len(block)
+
+
+@timed("render.voiceover")
+def build_voiceover_track(audio_paths: Sequence[str], audio_delays: Sequence[float], track_path: str,
+                          run: Callable = run_ffmpeg, tempos: Optional[Sequence[float]] = None,
+                          slot_lengths: Optional[Sequence[float]] = None):
+    """Lay every cue's audio onto one PCM track at its delay.
+
+    Replaces an ``adelay``/``amix`` graph with one input per cue: each MP3 is
+    decoded on its own and written at its offset, and the gaps are left as
+    file holes, which read back as silence. Memory stays at one block however
+    many cues there are, and the final mux only ever has two inputs.
+
+    ``tempos`` and ``slot_lengths`` (see :func:`render.timeline.plan_audio_fit`)
+    speed each cue up and cut it at the end of its slot while decoding.
+    """
+    tempos = tempos or [1.0] * len(audio_paths)
+    slot_lengths = slot_lengths or [None] * len(audio_paths)
+    work_prefix = f"{track_path}.{uuid.uuid4().hex}"
+    track_fd = os.open(track_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for index, (audio_path, delay, tempo, slot_length) in enumerate(
+                zip(audio_paths, audio_delays, tempos, slot_lengths)):
+            if slot_length is not None and slot_length <= 0:
+                logger.warning(f"Cue {index} has no room before the next one, leaving out its audio")
+                continue
+            pcm_path = f"{work_prefix}.{index}.pcm"
+            try:
+                run(build_decode_command(audio_path, pcm_path, tempo, slot_length), check=True,
+                    capture_output=True, text=True, operation="decode")
+                write_at(track_fd, pcm_path, max(0, round(delay * SAMPLE_RATE)) * FRAME_BYTES)
+            finally:
+                if os.path.exists(pcm_path):
+                    os.remove(pcm_path)
+    finally:
+        os.close(track_fd)
+    logger.info(f"Built voiceover track from {len(audio_paths)} cue(s): {track_path}")
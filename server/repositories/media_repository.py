@@ -0,0 +1,85 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from utils.db import PREPARED_STATEMENTS, execute_prepared, get_db_cursor
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+AUDIO_MEDIA = "audio"
+INDEX_MIGRATION = "008_create_media_objects.sql"
+
+PREPARED_STATEMENTS.update({
+    # Tagged with the transcript version current at registration; a newer version makes the file stale
+    "register_media_objects": """
+        INSERT INTO media_objects (key, video_id, kind, transcript_version)
+        SELECT key, $1::varchar, $2, (SELECT transcript_version FROM videos WHERE video_id = $1::varchar)
+        FROM unnest($3::text[]) AS key
+        ON CONFLICT (key) DO UPDATE
+            SET video_id = EXCLUDED.video_id, kind = EXCLUDED.kind, transcript_version = EXCLUDED.transcript_version
+    """,
+    # superseded_at is when the version after the object's own was saved
+    "select_media_references": """
+        SELECT m.key, m.video_id, m.kind, m.transcript_version, v.video_id IS NOT NULL AS video_exists,
+               EXTRACT(EPOCH FROM now() - t.created_at) AS superseded_seconds
+        FROM media_objects m
+        LEFT JOIN videos v ON v.video_id = m.video_id
+        LEFT JOIN transcript_versions t ON t.video_id = m.video_id AND t.version = m.transcript_version + 1
+        WHERE m.key = ANY($1)
+    """,
+    "select_media_index_created_at": """
+        SELECT EXTRACT(EPOCH FROM applied_at) AS created_at FROM migrations WHERE filename = $1
+    """,
+    "select_existing_videos": "SELECT video_id FROM videos WHERE video_id = ANY($1)",
+    "delete_media_objects": "DELETE FROM media_objects WHERE key = ANY($1)",
+})
+
+
+@timed("db.register_media")
+def register_media(video_id: str, kind: str, keys: Sequence[str]):
+    """Record that the stored ``keys`` belong to ``video_id`` at its current transcript version"""
+    if not keys:
+        return
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "register_media_objects", (video_id, kind, list(keys)))
+
+
+@timed("db.get_media_references")
+def get_media_references(keys: Sequence[str]) -> Dict[str, Dict]:
+    """Index rows of the registered ``keys``.
+
+    Each row also says whether its video still exists, and in
+    ``superseded_seconds`` how long ago a newer transcript version replaced
+    the one the object was made for (None while that version is current).
+    """
+    if not keys:
+        return {}
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_media_references", (list(keys),))
+        return {row["key"]: dict(row) for row in cursor.fetchall()}
+
+
+@timed("db.media_index_created_at")
+def index_created_at() -> Optional[float]:
+    """Unix time the media_objects index was created, or None if that is not recorded"""
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_media_index_created_at", (INDEX_MIGRATION,))
+        row = cursor.fetchone()
+    return float(row["created_at"]) if row else None
+
+
+@timed("db.existing_videos")
+def existing_videos(video_ids: Sequence[str]) -> set:
+    if not video_ids:
+        return set()
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_existing_videos", (list(video_ids),))
+        return {row["video_id"] for row in cursor.fetchall()}
+
+
+@timed("db.forget_media")
+def forget_media(keys: List[str]):
+    if not keys:
+        return
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "delete_media_objects", (keys,))
@@ -0,0 +1,221 @@
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from utils.db import PREPARED_STATEMENTS, execute_prepared, get_async_db_connection, get_db_cursor
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Records the version a CTE named "video" just wrote, with the md5 of each cue's (normalized) jsonb text
+_RECORD_TRANSCRIPT_VERSION = """
+    INSERT INTO transcript_versions (video_id, version, cue_hashes)
+    SELECT video_id, transcript_version, ARRAY(
+        SELECT md5(cue::text) FROM jsonb_array_elements(COALESCE(transcripts, '[]'::jsonb))
+            WITH ORDINALITY AS cues (cue, position)
+        ORDER BY position
+    )
+    FROM video
+    RETURNING version
+"""
+
+
+class TranscriptVersionConflict(Exception):
+    """The transcript is no longer at the version a patch was based on"""
+
+    def __init__(self, video_id: str, expected: int, current: int):
+        super().__init__(f"Transcript of {video_id} is at version {current}, not {expected}")
+        self.current = current
+
+
+PREPARED_STATEMENTS.update({
+    "ensure_video": "INSERT INTO videos (video_id) VALUES ($1) ON CONFLICT (video_id) DO NOTHING",
+    # Saving identical transcripts changes nothing, so the version (and the detail ETag) stays put
+    "upsert_video_transcripts": """
+        WITH video AS (
+            INSERT INTO videos (video_id, transcripts, transcript_version) VALUES ($1, $2, 1)
+            ON CONFLICT (video_id) DO UPDATE
+                SET transcripts = EXCLUDED.transcripts, transcript_version = videos.transcript_version + 1
+                WHERE videos.transcripts IS DISTINCT FROM EXCLUDED.transcripts
+            RETURNING video_id, transcripts, transcript_version
+        )
+    """ + _RECORD_TRANSCRIPT_VERSION,
+    "select_video": """
+        SELECT video_id, transcripts, transcript_version, render_plan, media_info FROM videos WHERE video_id = $1
+    """,
+    "select_videos": """
+        SELECT video_id, transcripts, transcript_version, render_plan, media_info FROM videos
+        WHERE video_id = ANY($1)
+    """,
+    "select_transcript_version": "SELECT transcript_version FROM videos WHERE video_id = $1",
+    "lock_transcript_version": "SELECT transcript_version FROM videos WHERE video_id = $1 FOR UPDATE",
+    "bump_transcript_version": """
+        WITH video AS (
+            UPDATE videos SET transcript_version = transcript_version + 1 WHERE video_id = $1
+            RETURNING video_id, transcripts, transcript_version
+        )
+    """ + _RECORD_TRANSCRIPT_VERSION,
+    "select_cue_hashes": """
+        SELECT version, cue_hashes FROM transcript_versions WHERE video_id = $1 AND version = ANY($2)
+    """,
+    "save_video_render_plan": "UPDATE videos SET render_plan = $2 WHERE video_id = $1",
+    "save_video_media_info": """
+        INSERT INTO videos (video_id, media_info) VALUES ($1, $2)
+        ON CONFLICT (video_id) DO UPDATE SET media_info = EXCLUDED.media_info
+    """,
+    "next_render_generation": """
+        INSERT INTO videos (video_id, render_generation) VALUES ($1, 1)
+        ON CONFLICT (video_id) DO UPDATE SET render_generation = videos.render_generation + 1
+        RETURNING render_generation
+    """,
+    "select_render_generation": "SELECT render_generation FROM videos WHERE video_id = $1",
+    "patch_video_cue": """
+        UPDATE videos SET transcripts = jsonb_set(transcripts, ARRAY[$2::text], (transcripts -> $2::int) || $3)
+        WHERE video_id = $1 AND $2::int >= 0 AND $2::int < jsonb_array_length(transcripts)
+            AND (transcripts -> $2::int) || $3 IS DISTINCT FROM transcripts -> $2::int
+        RETURNING video_id
+    """,
+})
+
+
+@timed("db.ensure_video")
+def ensure_video(video_id: str):
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "ensure_video", (video_id,))
+
+
+@timed("db.upsert_transcripts")
+def upsert_transcripts(video_id: str, transcripts: List[Dict]) -> int:
+    """Create the video row or replace its transcripts in one atomic statement; returns the transcript version.
+
+    A new version (with its cue hashes) is recorded only if the transcripts changed.
+    """
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "upsert_video_transcripts", (video_id, json.dumps(transcripts)))
+        row = cursor.fetchone()
+        if row is None:
+            execute_prepared(cursor, "select_transcript_version", (video_id,))
+            row = {"version": cursor.fetchone()["transcript_version"]}
+    logger.info(f"Upserted transcripts for video_id: {video_id} (version {row['version']})")
+    return row["version"]
+
+
+@timed("db.get_video")
+def get_video(video_id: str) -> Optional[Dict]:
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_video", (video_id,))
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+@timed("db.get_videos")
+def get_videos(video_ids: Sequence[str]) -> Dict[str, Dict]:
+    """Fetch many videos in one round trip, keyed by video_id; missing ids are left out"""
+    if not video_ids:
+        return {}
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_videos", (list(video_ids),))
+        rows = cursor.fetchall()
+    return {row["video_id"]: dict(row) for row in rows}
+
+
+@timed("db.get_video_async")
+async def get_video_async(video_id: str) -> Optional[Dict]:
+    async with get_async_db_connection() as conn:
+        row = await conn.fetchrow(
+            "SELECT video_id, transcripts, transcript_version, render_plan, media_info FROM videos WHERE video_id = $1",
+            video_id
+        )
+    return dict(row) if row else None
+
+
+@timed("db.get_transcript_version_async")
+async def get_transcript_version_async(video_id: str) -> Optional[int]:
+    """Just the transcript version, for answering conditional requests without loading the transcripts"""
+    async with get_async_db_connection() as conn:
+        return await conn.fetchval("SELECT transcript_version FROM videos WHERE video_id = $1", video_id)
+
+
+@timed("db.save_render_plan")
+def save_render_plan(video_id: str, render_plan: Dict):
+    """Record the segment plan that static/videos/{id}.mp4 was rendered from"""
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "save_video_render_plan", (video_id, json.dumps(render_plan)))
+
+
+@timed("db.save_media_info")
+def save_media_info(video_id: str, media_info: Dict):
+    """Store probed duration, resolution, fps and codecs so updates never probe the file again"""
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "save_video_media_info", (video_id, json.dumps(media_info)))
+
+
+@timed("db.next_render_generation")
+def next_render_generation(video_id: str) -> int:
+    """Claim the next render generation of a video; renders of earlier generations are now stale"""
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "next_render_generation", (video_id,))
+        return cursor.fetchone()["render_generation"]
+
+
+@timed("db.get_render_generation")
+def get_render_generation(video_id: str) -> int:
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "select_render_generation", (video_id,))
+        row = cursor.fetchone()
+    return row["render_generation"] if row else 0
+
+
+@timed("db.patch_transcripts")
+def patch_transcripts(video_id: str, patches: Dict[int, Dict], expected_version: Optional[int] = None) -> Dict:
+    """Merge fields into individual cues with jsonb_set instead of rewriting the whole array.
+
+    All patches are applied in one transaction, which records one new version
+    if any cue changed. Negative indexes, indexes past the end of the
+    transcript, and patches that leave their cue as it was, are skipped. With
+    ``expected_version`` nothing is applied unless the transcript is still at
+    that version (TranscriptVersionConflict). Returns the changed ``applied``
+    indexes and the resulting ``version``.
+    """
+    applied = []
+    with get_db_cursor() as cursor:
+        execute_prepared(cursor, "lock_transcript_version", (video_id,))
+        row = cursor.fetchone()
+        version = row["transcript_version"] if row else 0
+        if expected_version is not None and expected_version != version:
+            raise TranscriptVersionConflict(video_id, expected_version, version)
+        for index, fields in sorted(patches.items()):
+            execute_prepared(cursor, "patch_video_cue", (video_id, index, json.dumps(fields)))
+            if cursor.fetchone() is not None:
+                applied.append(index)
+        if applied:
+            execute_prepared(cursor, "bump_transcript_version", (video_id,))
+            version = cursor.fetchone()["version"]
+    return {"applied": applied, "version": version}
+
+
+def diff_cue_hashes(old: Sequence[str], new: Sequence[str]) -> List[int]:
+    """Indexes whose cue differs between two versions, including cues added or removed at the end"""
+    return [
+        index for index in range(max(len(old), len(new)))
+        if index >= len(old) or index >= len(new) or old[index] != new[index]
+    ]
+
+
+@timed("db.changed_cues")
+def changed_cues(video_id: str, from_version: int, to_version: Optional[int] = None) -> Optional[List[int]]:
+    """Cue indexes that changed between two transcript versions (default: the current one).
+
+    Version 0 is the empty transcript. Returns None when either version is not recorded.
+    """
+    with get_db_cursor() as cursor:
+        if to_version is None:
+            execute_prepared(cursor, "select_transcript_version", (video_id,))
+            row = cursor.fetchone()
+            to_version = row["transcript_version"] if row else 0
+        execute_prepared(cursor, "select_cue_hashes", (video_id, [from_version, to_version]))
+        hashes = {row["version"]: row["cue_hashes"] for row in cursor.fetchall()}
+    hashes[0] = []
+    if from_version not in hashes or to_version not in hashes:
+        return None
+    return diff_cue_hashes(hashes[from_version], hashes[to_version])
@@ -0,0 +1,107 @@
+import errno
+import logging
+import os
+import shutil
+import uuid
+from typing import Iterator, List
+
+from fastapi import Request, Response
+
+from storage.media_storage import MediaStorage, StoredObject, is_temporary_name
+from utils.http_cache import cached_file_response, file_version
+
+logger = logging.getLogger(__name__)
+
+
+class LocalMediaStorage(MediaStorage):
+    """Objects are plain files under ``root``, served straight from disk"""
+
+    def __init__(self, root: str = None, scratch_dir: str = None):
+        super().__init__(scratch_dir)
+        self.root = root or os.environ.get("STORAGE_LOCAL_ROOT", "static/")
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def version(self, key: str) -> str:
+        return file_version(self.path(key))
+
+    def local_path(self, key: str) -> str:
+        path = self.path(key)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No stored object '{key}'")
+        return path
+
+    def put_file(self, key: str, path: str, move: bool = False):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if move:
+            try:
+                os.replace(path, target)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+            # Staged on another filesystem: copy next to the target, then rename into place
+            self._link_or_copy(path, target)
+            os.remove(path)
+        else:
+            self._link_or_copy(path, target)
+
+    def copy(self, src_key: str, dst_key: str):
+        target = self.path(dst_key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        self._link_or_copy(self.local_path(src_key), target)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        # Only the directory the prefix names is walked; the root may also hold caches and scratch space
+        top = self.path(prefix.rsplit("/", 1)[0]) if "/" in prefix else self.root
+        for directory, _, filenames in os.walk(top):
+            for filename in filenames:
+                if is_temporary_name(filename):
+                    continue
+                path = os.path.join(directory, filename)
+                key = "/".join(os.path.relpath(path, self.root).split(os.sep))
+                if not key.startswith(prefix):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield StoredObject(key=key, size=stat.st_size, modified=stat.st_mtime)
+
+    def work_dirs(self) -> List[str]:
+        # Only where objects live: the root may also hold the caches and scratch space
+        return [self.path("videos"), self.path("audio")]
+
+    def serve(self, request: Request, key: str, media_type: str, immutable: bool = False) -> Response:
+        return cached_file_response(request, self.path(key), media_type, immutable=immutable)
+
+    def staging_path(self, key: str) -> str:
+        # Next to the target, so put_file(move=True) is a single rename on the same filesystem
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        return f"{target}.{uuid.uuid4().hex}.tmp{os.path.splitext(target)[1]}"
+
+    @staticmethod
+    def _link_or_copy(path: str, target: str):
+        # A hard link costs no extra disk or I/O; the rename keeps readers from seeing a partial file
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
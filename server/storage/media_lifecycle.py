@@ -0,0 +1,334 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from jobs import job_store
+from render.render_scheduler import render_lock_name
+from repositories import media_repository
+from storage.media_storage import MediaStorage, StoredObject, is_temporary_name
+from utils.db import try_advisory_lock
+from utils.metrics import MEDIA_REMOVED_BYTES, MEDIA_REMOVED_FILES, MEDIA_USAGE_BYTES
+from utils.uploads import UPLOAD_DIR
+
+logger = logging.getLogger(__name__)
+
+# Why a file was removed
+ORPHAN = "orphan"  # Its video is gone, or nothing says which video it belongs to
+STALE_AUDIO = "stale_audio"  # Voiceover of a transcript version that was replaced a while ago
+TEMPORARY = "temporary"  # Scratch space or a half-written file left by a crashed request, job or render
+EVICTED = "evicted"  # Cached segment chunk dropped to get back under a quota; re-encoded when next needed
+
+VIDEO_KEY_PATTERN = re.compile(r"^videos/(?P<video_id>.+?)(?:_source|_preview)?\.mp4$")
+CHUNK_NAME_PATTERN = re.compile(r"^[0-9a-f]{32}\.mp4$")
+REFERENCE_BATCH = 1000
+
+
+def _setting(value: Optional[float], name: str, default: float) -> float:
+    return value if value is not None else float(os.environ.get(name, str(default)))
+
+
+def video_id_of_key(key: str) -> Optional[str]:
+    match = VIDEO_KEY_PATTERN.match(key)
+    return match.group("video_id") if match else None
+
+
+@dataclass
+class CachedChunk:
+    video_id: str
+    path: str
+    size: int
+    modified: float
+
+
+@dataclass
+class SweepReport:
+    removed_files: Dict[str, int] = field(default_factory=dict)
+    removed_bytes: Dict[str, int] = field(default_factory=dict)
+    usage_bytes: int = 0  # Stored objects plus cached chunks, after the sweep
+    videos_over_quota: int = 0
+    busy_videos_skipped: int = 0  # Over quota, but rendering: their chunks may be in use
+    seconds: float = 0.0
+
+    def count(self, reason: str, size: int):
+        self.removed_files[reason] = self.removed_files.get(reason, 0) + 1
+        self.removed_bytes[reason] = self.removed_bytes.get(reason, 0) + size
+        MEDIA_REMOVED_FILES.labels(reason=reason).inc()
+        MEDIA_REMOVED_BYTES.labels(reason=reason).inc(size)
+
+
+class MediaLifecycleManager:
+    """Removes media nothing needs any more and keeps disk use within quotas.
+
+    Each :meth:`sweep` (every ``MEDIA_SWEEP_INTERVAL_SECONDS`` once
+    :meth:`start` is called) does three things:
+
+    - Temporary files older than ``MEDIA_TEMP_MAX_AGE_SECONDS`` go: anything in
+      scratch space or the upload directory, and half-written ``.tmp`` files
+      and renderer leftovers in the storage and cache directories. Files that
+      queued or running jobs will still read are kept.
+    - Stored objects older than ``MEDIA_ORPHAN_GRACE_SECONDS`` go when their
+      video no longer exists. Audio is matched to its video through the
+      ``media_objects`` index, so audio left unindexed since the index was
+      created is an orphan too (older audio is kept), and audio
+      made for a transcript version that was replaced more than
+      ``MEDIA_STALE_AUDIO_SECONDS`` ago is stale. Segment chunks of deleted
+      videos go as well.
+    - Segment chunks, the only artifacts here that can be rebuilt
+      (from the source video), are evicted least recently used first while a
+      video holds more than ``MEDIA_VIDEO_QUOTA_BYTES``, all videos together
+      more than ``MEDIA_QUOTA_BYTES``, or the disk has less than
+      ``MEDIA_MIN_FREE_BYTES`` free. A video's usage counts its stored objects
+      and its chunks. Videos being rendered are skipped. A limit of 0 is off.
+
+    Every API process may run a sweeper; removals are idempotent.
+    """
+
+    def __init__(self, storage: MediaStorage, segment_cache_root: str, cache_dirs: Sequence[str] = (),
+                 upload_dir: str = UPLOAD_DIR, interval_seconds: Optional[float] = None,
+                 temp_max_age_seconds: Optional[float] = None, orphan_grace_seconds: Optional[float] = None,
+                 stale_audio_seconds: Optional[float] = None, quota_bytes: Optional[int] = None,
+                 video_quota_bytes: Optional[int] = None, min_free_bytes: Optional[int] = None):
+        self.storage = storage
+        self.segment_cache_root = segment_cache_root
+        # Every file in these is temporary; in the others only half-written ones are
+        self.temp_dirs = [storage.scratch_dir, upload_dir]
+        self.work_dirs = [*storage.work_dirs(), *cache_dirs]
+        self.interval_seconds = _setting(interval_seconds, "MEDIA_SWEEP_INTERVAL_SECONDS", 900)
+        self.temp_max_age_seconds = _setting(temp_max_age_seconds, "MEDIA_TEMP_MAX_AGE_SECONDS", 6 * 3600)
+        self.orphan_grace_seconds = _setting(orphan_grace_seconds, "MEDIA_ORPHAN_GRACE_SECONDS", 3600)
+        self.stale_audio_seconds = _setting(stale_audio_seconds, "MEDIA_STALE_AUDIO_SECONDS", 24 * 3600)
+        self.quota_bytes = int(_setting(quota_bytes, "MEDIA_QUOTA_BYTES", 0))
+        self.video_quota_bytes = int(_setting(video_quota_bytes, "MEDIA_VIDEO_QUOTA_BYTES", 0))
+        self.min_free_bytes = int(_setting(min_free_bytes, "MEDIA_MIN_FREE_BYTES", 0))
+        self.sweeps = 0
+        self.removed_files: Dict[str, int] = defaultdict(int)
+        self.removed_bytes: Dict[str, int] = defaultdict(int)
+        self.last_sweep: Optional[SweepReport] = None
+        self.last_sweep_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Sweep in a background thread every ``interval_seconds``, the first time one interval from now"""
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="media-sweeper", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stopped.set()
+
+    def sweep(self) -> SweepReport:
+        with self._sweep_lock:
+            started = time.monotonic()
+            now = time.time()
+            report = SweepReport()
+            self._sweep_temporary(now, report)
+            stored_bytes = self._sweep_stored_objects(now, report)
+            self._sweep_segment_cache(now, stored_bytes, report)
+            report.seconds = round(time.monotonic() - started, 3)
+        MEDIA_USAGE_BYTES.set(report.usage_bytes)
+        with self._lock:
+            self.sweeps += 1
+            for reason, files in report.removed_files.items():
+                self.removed_files[reason] += files
+                self.removed_bytes[reason] += report.removed_bytes[reason]
+            self.last_sweep = report
+            self.last_sweep_at = now
+        logger.info(
+            f"Media sweep removed {sum(report.removed_files.values())} file(s) "
+            f"({sum(report.removed_bytes.values())} bytes) in {report.seconds}s; {report.usage_bytes} bytes in use"
+        )
+        return report
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "sweeps": self.sweeps,
+                "interval_seconds": self.interval_seconds,
+                "quota_bytes": self.quota_bytes,
+                "video_quota_bytes": self.video_quota_bytes,
+                "min_free_bytes": self.min_free_bytes,
+                "removed_files": dict(self.removed_files),
+                "removed_bytes": dict(self.removed_bytes),
+                "last_sweep_at": self.last_sweep_at,
+                "last_sweep": asdict(self.last_sweep) if self.last_sweep is not None else None,
+            }
+
+    def _run(self):
+        while not self._stopped.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Media sweep failed: {e}")
+
+    def _sweep_temporary(self, now: float, report: SweepReport):
+        cutoff = now - self.temp_max_age_seconds
+        in_use = {os.path.abspath(path) for path in job_store.active_job_files()}
+        roots = [(directory, True) for directory in self.temp_dirs]
+        roots += [(directory, False) for directory in self.work_dirs]
+        for root, everything in roots:
+            for path, stat in self._walk(root):
+                if stat.st_mtime >= cutoff or os.path.abspath(path) in in_use:
+                    continue
+                if everything or is_temporary_name(os.path.basename(path)):
+                    self._remove_file(path, stat.st_size, TEMPORARY, report)
+
+    def _sweep_stored_objects(self, now: float, report: SweepReport) -> Dict[str, int]:
+        """Remove orphaned and stale objects; returns the bytes each remaining video holds in storage"""
+        cutoff = now - self.orphan_grace_seconds
+        stored_bytes: Dict[str, int] = defaultdict(int)
+
+        videos = list(self.storage.list_objects("videos/"))
+        video_ids = {video_id_of_key(obj.key) for obj in videos} - {None}
+        existing = media_repository.existing_videos(list(video_ids))
+        for obj in videos:
+            video_id = video_id_of_key(obj.key)
+            if video_id is None:
+                continue
+            if video_id not in existing and obj.modified < cutoff:
+                self._delete_object(obj, ORPHAN, report)
+            else:
+                stored_bytes[video_id] += obj.size
+
+        audio = list(self.storage.list_objects("audio/"))
+        # Audio stored before the index existed has no row; it is left alone rather than taken for an orphan
+        indexed_since = media_repository.index_created_at()
+        references = {}
+        for batch in _batches([obj.key for obj in audio], REFERENCE_BATCH):
+            references.update(media_repository.get_media_references(batch))
+        forgotten = []
+        for obj in audio:
+            reference = references.get(obj.key)
+            reason = None
+            if reference is None and (indexed_since is None or obj.modified < indexed_since):
+                continue
+            if reference is None or not reference["video_exists"]:
+                reason = ORPHAN if obj.modified < cutoff else None
+            elif (reference["superseded_seconds"] is not None
+                  and float(reference["superseded_seconds"]) > self.stale_audio_seconds):
+                reason = STALE_AUDIO
+            if reason is None:
+                if reference is not None:
+                    stored_bytes[reference["video_id"]] += obj.size
+                continue
+            self._delete_object(obj, reason, report)
+            if reference is not None:
+                forgotten.append(obj.key)
+        for batch in _batches(forgotten, REFERENCE_BATCH):
+            media_repository.forget_media(batch)
+        return stored_bytes
+
+    def _sweep_segment_cache(self, now: float, stored_bytes: Dict[str, int], report: SweepReport):
+        chunks_by_video: Dict[str, List[CachedChunk]] = defaultdict(list)
+        cutoff = now - self.temp_max_age_seconds
+        for video_id, path, stat in self._segment_cache_files():
+            if CHUNK_NAME_PATTERN.match(os.path.basename(path)):
+                chunks_by_video[video_id].append(CachedChunk(video_id, path, stat.st_size, stat.st_mtime))
+            elif stat.st_mtime < cutoff:
+                # A concat list or mixed voiceover left by a render that died before cleaning up
+                self._remove_file(path, stat.st_size, TEMPORARY, report)
+
+        existing = media_repository.existing_videos(list(chunks_by_video))
+        for video_id in [video_id for video_id in chunks_by_video if video_id not in existing]:
+            chunks = chunks_by_video[video_id]
+            if max(chunk.modified for chunk in chunks) < now - self.orphan_grace_seconds:
+                for chunk in chunks_by_video.pop(video_id):
+                    self._remove_file(chunk.path, chunk.size, ORPHAN, report)
+                shutil.rmtree(os.path.join(self.segment_cache_root, video_id), ignore_errors=True)
+
+        usage = dict(stored_bytes)
+        for video_id, chunks in chunks_by_video.items():
+            usage[video_id] = usage.get(video_id, 0) + sum(chunk.size for chunk in chunks)
+        victims = self._choose_evictions(chunks_by_video, usage, report)
+        for video_id, chunks in victims.items():
+            with try_advisory_lock(render_lock_name(video_id)) as acquired:
+                if not acquired:
+                    report.busy_videos_skipped += 1
+                    continue
+                for chunk in chunks:
+                    freed = self._remove_file(chunk.path, chunk.size, EVICTED, report)
+                    usage[video_id] -= freed
+        report.usage_bytes = sum(usage.values())
+
+    def _choose_evictions(self, chunks_by_video: Dict[str, List[CachedChunk]], usage: Dict[str, int],
+                          report: SweepReport) -> Dict[str, List[CachedChunk]]:
+        """Least recently used chunks to drop, by video: first each video's excess, then the global one"""
+        victims: Dict[str, List[CachedChunk]] = defaultdict(list)
+        chosen: Set[str] = set()
+        if self.video_quota_bytes:
+            for video_id, used in usage.items():
+                excess = used - self.video_quota_bytes
+                if excess <= 0:
+                    continue
+                report.videos_over_quota += 1
+                for chunk in sorted(chunks_by_video.get(video_id, []), key=lambda chunk: chunk.modified):
+                    if excess <= 0:
+                        break
+                    victims[video_id].append(chunk)
+                    chosen.add(chunk.path)
+                    excess -= chunk.size
+
+        excess = 0
+        if self.quota_bytes:
+            excess = sum(usage.values()) - self.quota_bytes
+        if self.min_free_bytes and os.path.isdir(self.segment_cache_root):
+            free = shutil.disk_usage(self.segment_cache_root).free
+            excess = max(excess, self.min_free_bytes - free)
+        excess -= sum(chunk.size for chunks in victims.values() for chunk in chunks)
+        if excess > 0:
+            remaining = [chunk for chunks in chunks_by_video.values() for chunk in chunks if chunk.path not in chosen]
+            for chunk in sorted(remaining, key=lambda chunk: chunk.modified):
+                if excess <= 0:
+                    break
+                victims[chunk.video_id].append(chunk)
+                excess -= chunk.size
+        return victims
+
+    def _segment_cache_files(self) -> Iterable:
+        """(video_id, path, stat) of each file under ``{segment_cache_root}/{video_id}/``"""
+        if not os.path.isdir(self.segment_cache_root):
+            return
+        for video_id in os.listdir(self.segment_cache_root):
+            video_dir = os.path.join(self.segment_cache_root, video_id)
+            if os.path.isdir(video_dir):
+                for path, stat in self._walk(video_dir):
+                    yield video_id, path, stat
+
+    @staticmethod
+    def _walk(root: str) -> Iterable:
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    @staticmethod
+    def _remove_file(path: str, size: int, reason: str, report: SweepReport) -> int:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return 0
+        logger.debug(f"Removed {reason} file {path}")
+        report.count(reason, size)
+        return size
+
+    def _delete_object(self, obj: StoredObject, reason: str, report: SweepReport):
+        self.storage.delete(obj.key)
+        logger.debug(f"Removed {reason} object {obj.key}")
+        report.count(reason, obj.size)
+
+
+def _batches(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,125 @@
+import os
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List
+
+from fastapi import Request, Response
+
+
+# Keys are "/"-separated and mirror the old static/ layout, so existing local deployments keep their files
+def video_key(video_id: str) -> str:
+    return f"videos/{video_id}.mp4"
+
+
+def source_key(video_id: str) -> str:
+    return f"videos/{video_id}_source.mp4"
+
+
+def preview_key(video_id: str) -> str:
+    return f"videos/{video_id}_preview.mp4"
+
+
+def audio_key(audio_id: str) -> str:
+    return f"audio/{audio_id}.mp3"
+
+
+def is_temporary_name(filename: str) -> bool:
+    """In-progress writes are named ``<target>.<random>.tmp[.<ext>]`` throughout, then renamed into place"""
+    return "tmp" in filename.split(".")[1:]
+
+
+@dataclass
+class StoredObject:
+    key: str
+    size: int
+    modified: float  # Unix time of the last write
+
+
+class MediaStorage(ABC):
+    """Where videos and voiceover audio live, addressed by key rather than path.
+
+    ffmpeg and the probes still need real files: :meth:`local_path` returns
+    one for reading, and new content is written to a :meth:`staging_path`
+    (or any local file) and handed over with :meth:`put_file`.
+    """
+
+    def __init__(self, scratch_dir: str = None):
+        self.scratch_dir = scratch_dir or os.environ.get("STORAGE_SCRATCH_DIR", "static/scratch/")
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def version(self, key: str) -> str:
+        """Identifier of the object's current content; raises FileNotFoundError if missing"""
+        pass
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """A local file with the object's content; raises FileNotFoundError if missing"""
+        pass
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        """Like :meth:`local_path`, but the file is guaranteed to stay in place until the block exits.
+
+        Use it for anything that reads the file later on, such as ffmpeg: a
+        backend that caches remote objects may otherwise evict it meanwhile.
+        """
+        yield self.local_path(key)
+
+    @abstractmethod
+    def put_file(self, key: str, path: str, move: bool = False):
+        """Store the local file at ``path`` under ``key``, replacing any previous content atomically.
+
+        With ``move`` the caller gives up ``path``, which lets the storage
+        rename it instead of copying.
+        """
+        pass
+
+    @abstractmethod
+    def copy(self, src_key: str, dst_key: str):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Remove the object; a missing object is not an error"""
+        pass
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        """Every stored object whose key starts with ``prefix``; in-progress writes are not objects yet"""
+        pass
+
+    @abstractmethod
+    def serve(self, request: Request, key: str, media_type: str, immutable: bool = False) -> Response:
+        """HTTP response for a GET of the object, with the caching semantics of ``cached_file_response``"""
+        pass
+
+    def work_dirs(self) -> List[str]:
+        """Node-local directories, besides scratch space, that the backend writes files into"""
+        return []
+
+    def scratch_path(self, filename: str) -> str:
+        """Node-local path for a temporary file that is never stored"""
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        return os.path.join(self.scratch_dir, filename)
+
+    def staging_path(self, key: str) -> str:
+        """Node-local path to write new content for ``key`` before ``put_file(key, path, move=True)``"""
+        return self.scratch_path(f"{uuid.uuid4().hex}{os.path.splitext(key)[1]}")
+
+
+def create_media_storage() -> MediaStorage:
+    """Storage backend selected by STORAGE_BACKEND ("local" or "s3")"""
+    backend = os.environ.get("STORAGE_BACKEND", "local")
+    if backend == "local":
+        from storage.local_media_storage import LocalMediaStorage
+        return LocalMediaStorage()
+    if backend == "s3":
+        from storage.s3_media_storage import S3MediaStorage
+        return S3MediaStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected 'local' or 's3'")
@@ -0,0 +1,325 @@
+import fcntl
+import logging
+import mimetypes
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import RedirectResponse
+
+from storage.media_storage import MediaStorage, StoredObject
+from utils.http_cache import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+from utils.metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+MiB = 1024 ** 2
+
+
+class S3MediaStorage(MediaStorage):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, ...), shared by every API node.
+
+    Uploads are streamed from disk in multipart chunks and GETs are answered
+    with a redirect to a presigned URL, so video bytes never pass through the
+    API. Files that ffmpeg needs locally are kept in a read-through cache:
+    ``{cache_dir}/{key}`` plus a ``.etag`` sidecar whose mtime gives LRU
+    order, revalidated against the bucket with a HEAD on every use. The
+    cache may be shared by several processes: files opened through
+    :meth:`local_file` hold a shared ``flock`` on a ``.pin`` sidecar, which
+    eviction in any of them must take exclusively first.
+    """
+
+    def __init__(self, bucket: str = None, prefix: str = None, client=None,
+                 cache_dir: str = None, cache_max_bytes: Optional[int] = None, scratch_dir: str = None):
+        super().__init__(scratch_dir)
+        # boto3 is only needed when this backend is selected
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket or os.environ["S3_BUCKET"]
+        self.prefix = prefix if prefix is not None else os.environ.get("S3_PREFIX", "")
+        self.client = client or boto3.client(
+            "s3",
+            endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None,
+            region_name=os.environ.get("S3_REGION") or None,
+        )
+        self.presign_expires = int(os.environ.get("S3_PRESIGN_EXPIRES", "3600"))
+        chunk_bytes = int(os.environ.get("S3_MULTIPART_CHUNK_BYTES", str(8 * MiB)))
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_bytes,
+            multipart_chunksize=chunk_bytes,
+            max_concurrency=int(os.environ.get("S3_MAX_CONCURRENCY", "4")),
+        )
+        self.cache_dir = cache_dir or os.environ.get("STORAGE_CACHE_DIR", "static/storage_cache/")
+        self.cache_max_bytes = cache_max_bytes if cache_max_bytes is not None else int(
+            os.environ.get("STORAGE_CACHE_MAX_BYTES", str(10 * 1024 ** 3))
+        )
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}  # Key -> [download lock, threads using it]; dropped when unused
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def version(self, key: str) -> str:
+        head = self._head(key)
+        if head is None:
+            raise FileNotFoundError(f"No stored object '{key}'")
+        return head["ETag"].strip('"')
+
+    def local_path(self, key: str) -> str:
+        head = self._head(key)
+        if head is None:
+            raise FileNotFoundError(f"No stored object '{key}'")
+        etag = head["ETag"].strip('"')
+        path = self._cache_path(key)
+        # One download per key at a time; other keys keep being served from the cache meanwhile
+        with self._key_lock(key):
+            if self._cached_etag(key) == etag and os.path.exists(path):
+                with self._lock:
+                    self.cache_hits += 1
+                self._touch(key)
+                return path
+            with self._lock:
+                self.cache_misses += 1
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                logger.info(f"Downloading {key} from s3://{self.bucket} into the local cache")
+                with timed_stage("storage.download"):
+                    self.client.download_file(
+                        self.bucket, self.object_key(key), tmp_path, Config=self.transfer_config
+                    )
+                # Keep the object's mtime so a re-download looks like the same file to the segment cache
+                modified = head["LastModified"].timestamp()
+                os.utime(tmp_path, (modified, modified))
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            with self._lock:
+                self._remember(key, etag)
+            return path
+
+    @contextmanager
+    def local_file(self, key: str) -> Iterator[str]:
+        # Pinned before the download, so no process sharing the cache can evict it while the caller reads it
+        path = self._cache_path(key)
+        pin = self._pin(path)
+        try:
+            yield self.local_path(key)
+        finally:
+            os.close(pin)
+            if not os.path.exists(path):
+                self._drop_pin(path)
+
+    def put_file(self, key: str, path: str, move: bool = False):
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        with timed_stage("storage.upload"):
+            self.client.upload_file(
+                path, self.bucket, self.object_key(key),
+                ExtraArgs={"ContentType": content_type}, Config=self.transfer_config
+            )
+        if not move:
+            return
+        # Whatever was just written is about to be read (a render's source, a fresh preview): keep it hot
+        head = self._head(key)
+        with self._lock:
+            cache_path = self._cache_path(key)
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            try:
+                modified = head["LastModified"].timestamp()
+                os.utime(path, (modified, modified))
+                os.replace(path, cache_path)
+            except OSError as e:
+                logger.debug(f"Not caching {key} locally: {e}")
+                os.remove(path)
+                return
+            self._remember(key, head["ETag"].strip('"'))
+
+    def copy(self, src_key: str, dst_key: str):
+        self.client.copy(
+            {"Bucket": self.bucket, "Key": self.object_key(src_key)}, self.bucket, self.object_key(dst_key),
+            Config=self.transfer_config
+        )
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        with self._lock:
+            for path in (self._cache_path(key), self._etag_path(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._drop_pin(self._cache_path(key))
+
+    def list_objects(self, prefix: str) -> Iterator[StoredObject]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    key=item["Key"][len(self.prefix):], size=item["Size"], modified=item["LastModified"].timestamp()
+                )
+
+    def work_dirs(self) -> List[str]:
+        return [self.cache_dir]
+
+    def serve(self, request: Request, key: str, media_type: str, immutable: bool = False) -> Response:
+        """Redirect to a presigned URL; the bucket then handles Range, ETag and conditional GETs itself"""
+        if not immutable and request.query_params.get("v") is not None:
+            immutable = request.query_params["v"] == self.version(key)
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.object_key(key),
+                "ResponseContentType": media_type,
+                "ResponseCacheControl": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            },
+            ExpiresIn=self.presign_expires,
+        )
+        # The presigned URL expires, so the redirect itself must never be cached
+        return RedirectResponse(url, status_code=307, headers={"cache-control": "no-store"})
+
+    def cache_stats(self):
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "bytes": self._cache_bytes(),
+                "max_bytes": self.cache_max_bytes,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_ratio": self.cache_hits / lookups if lookups else 0.0,
+            }
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    @contextmanager
+    def _key_lock(self, key: str):
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, *key.split("/"))
+
+    def _etag_path(self, key: str) -> str:
+        return f"{self._cache_path(key)}.etag"
+
+    def _cached_etag(self, key: str) -> Optional[str]:
+        try:
+            with open(self._etag_path(key)) as etag_file:
+                return etag_file.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _touch(self, key: str):
+        try:
+            os.utime(self._etag_path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key: str, etag: str):
+        # Caller holds self._lock
+        with open(self._etag_path(key), "w") as etag_file:
+            etag_file.write(etag)
+        self._evict(keep=self._cache_path(key))
+
+    def _pin(self, path: str) -> int:
+        """Take a shared lock on ``path``'s pin file; returns its descriptor, which releases the pin when closed"""
+        pin_path = f"{path}.pin"
+        os.makedirs(os.path.dirname(pin_path), exist_ok=True)
+        while True:
+            fd = os.open(pin_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                # An eviction may have removed the pin file while we waited for it: pin the current one instead
+                if os.fstat(fd).st_ino == os.stat(pin_path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _claim(self, path: str) -> Optional[int]:
+        """Lock ``path``'s pin file exclusively, or return None at once if any process has the file pinned"""
+        fd = os.open(f"{path}.pin", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _drop_pin(self, path: str):
+        if not os.path.exists(f"{path}.pin"):
+            return
+        claim = self._claim(path)
+        if claim is not None:
+            try:
+                os.remove(f"{path}.pin")
+            finally:
+                os.close(claim)
+
+    def _cached_entries(self):
+        entries = []
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if not filename.endswith(".etag"):
+                    continue
+                etag_path = os.path.join(directory, filename)
+                path = etag_path[:-len(".etag")]
+                try:
+                    entries.append((os.path.getmtime(etag_path), path, os.path.getsize(path)))
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def _cache_bytes(self) -> int:
+        return sum(size for _, _, size in self._cached_entries())
+
+    def _evict(self, keep: str):
+        # Caller holds self._lock. The directory is rescanned so several processes can share it.
+        entries = sorted(self._cached_entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.cache_max_bytes:
+                break
+            if path == keep:
+                continue
+            claim = self._claim(path)
+            if claim is None:
+                continue
+            try:
+                for stale in (path, f"{path}.etag", f"{path}.pin"):
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+            finally:
+                os.close(claim)
+            total -= size
+            logger.debug(f"Evicted {path} from the storage cache")
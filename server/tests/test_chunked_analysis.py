@@ -0,0 +1,165 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to Python path to make video_processor module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.timeline import format_timestamp, parse_timestamp
+from repositories import video_repository
+from video_processor import gemini_video_processor
+from video_processor.chunking import VideoChunk, stitch_subtitles
+from video_processor.gemini_video_processor import GeminiVideoProcessor
+
+
+class FakeGeminiClient:
+    """Offline stand-in for genai.Client: uploads are instantly active and each file gets canned subtitles"""
+
+    def __init__(self, subtitles_for, barrier=None):
+        self.subtitles_for = subtitles_for
+        self.barrier = barrier
+        self.uploads = []
+        self._lock = threading.Lock()
+        self.files = SimpleNamespace(upload=self._upload, get=self._get)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _upload(self, file):
+        name = f"files/{os.path.splitext(os.path.basename(file))[0]}"
+        with self._lock:
+            self.uploads.append((name, os.path.getsize(file)))
+        return SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+
+    def _get(self, name):
+        return SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+
+    def _generate_content(self, model, config, contents):
+        if self.barrier is not None:
+            # Only returns once every expected request is in flight at the same time
+            self.barrier.wait()
+        return SimpleNamespace(text=json.dumps({"subtitles": self.subtitles_for(contents[0].name)}))
+
+
+def cue(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_format_timestamp_round_trips():
+    for seconds in (0, 59, 61.5, 3725.125):
+        assert parse_timestamp(format_timestamp(seconds)) == seconds
+    assert format_timestamp(75) == "01:15"
+
+
+def test_stitch_offsets_cues_onto_the_global_timeline():
+    pieces = [
+        (VideoChunk("a.mp4", 0.0, 30.0), [cue("00:01", "00:05", "opening shot")]),
+        (VideoChunk("b.mp4", 30.0, 61.5), [cue("00:02", "00:06", "a cat appears")]),
+    ]
+
+    assert stitch_subtitles(pieces) == [
+        cue("00:01", "00:05", "opening shot"),
+        cue("00:32", "00:36", "a cat appears"),
+    ]
+
+
+def test_stitch_folds_repeated_cue_at_the_seam():
+    pieces = [
+        (VideoChunk("a.mp4", 0.0, 30.0), [cue("00:20", "00:29", "The dog sprints across the yard")]),
+        (VideoChunk("b.mp4", 30.0, 60.0), [cue("00:00", "00:04", "The dog sprints across the yard!"),
+                                          cue("00:10", "00:15", "It finds the ball")]),
+    ]
+
+    assert stitch_subtitles(pieces) == [
+        cue("00:20", "00:34", "The dog sprints across the yard"),
+        cue("00:40", "00:45", "It finds the ball"),
+    ]
+
+
+def test_stitch_clips_to_the_chunk_and_trims_overlaps_with_folded_cues():
+    pieces = [
+        (VideoChunk("a.mp4", 0.0, 30.0), [cue("00:20", "00:40", "The dog sprints across the yard")]),
+        (VideoChunk("b.mp4", 30.0, 60.0), [cue("00:00", "00:04", "the dog sprints across the yard"),
+                                          cue("00:01", "00:04.2", "It barks"),
+                                          cue("00:03", "00:08", "Next scene")]),
+    ]
+
+    assert stitch_subtitles(pieces) == [
+        cue("00:20", "00:34", "The dog sprints across the yard"),
+        cue("00:34", "00:38", "Next scene"),
+    ]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_chunked_mode_analyzes_pieces_concurrently(tmp_path, monkeypatch):
+    video = str(tmp_path / "long.mp4")
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25:duration=50",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-g", "25", video], check=True, capture_output=True)
+    monkeypatch.setenv("GEMINI_CHUNK_MINUTES", str(20 / 60))
+    monkeypatch.setattr(video_repository, "upsert_transcripts", lambda video_id, subtitles: None)
+    client = FakeGeminiClient(lambda name: [cue("00:01", "00:03", f"{name} opening"),
+                                            cue("00:15", "00:18", f"{name} middle")],
+                              barrier=threading.Barrier(3, timeout=10))
+    stages = []
+
+    result = GeminiVideoProcessor(client=client).process(video, "prompt", on_stage=stages.append)
+
+    assert [name for name, _ in sorted(client.uploads)] == ["files/chunk_0000", "files/chunk_0001", "files/chunk_0002"]
+    assert result.video_id == "files/chunk_0000"
+    assert stages == ["uploading", "analyzing"]
+    starts = [parse_timestamp(subtitle["start"]) for subtitle in result.subtitles]
+    assert starts == sorted(starts)
+    # Pieces are cut at keyframes just after 20 s and 40 s; the last piece is too short for its second cue
+    assert [subtitle["text"] for subtitle in result.subtitles] == [
+        "files/chunk_0000 opening", "files/chunk_0000 middle", "files/chunk_0001 opening",
+        "files/chunk_0001 middle", "files/chunk_0002 opening"
+    ]
+    assert 40 <= starts[4] <= 42
+
+
+def test_failed_chunk_stops_the_others_before_deleting_the_pieces(monkeypatch):
+    def split_video(video_path, chunk_dir, chunk_seconds):
+        chunks = []
+        for n in range(4):
+            path = os.path.join(chunk_dir, f"chunk_{n:04d}.mp4")
+            with open(path, "wb") as f:
+                f.write(b"piece")
+            chunks.append(VideoChunk(path, n * 20.0, (n + 1) * 20.0))
+        return chunks
+
+    class SlowUploadClient(FakeGeminiClient):
+        def _upload(self, file):
+            if not file.endswith("chunk_0000.mp4"):
+                time.sleep(0.2)
+            return super()._upload(file)
+
+        def _generate_content(self, model, config, contents):
+            if contents[0].name == "files/chunk_0000":
+                raise RuntimeError("quota exceeded")
+            return super()._generate_content(model, config, contents)
+
+    monkeypatch.setattr(gemini_video_processor, "split_video", split_video)
+    monkeypatch.setenv("GEMINI_CHUNK_MINUTES", "1")
+    monkeypatch.setenv("GEMINI_MAX_CONCURRENCY", "2")
+    client = SlowUploadClient(lambda name: [])
+
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        GeminiVideoProcessor(client=client).process(__file__, "prompt")
+
+    # The upload in flight finished reading its piece; the pieces still queued were never uploaded
+    assert sorted(name for name, _ in client.uploads) == ["files/chunk_0000", "files/chunk_0001"]
+
+
+def test_short_video_is_analyzed_whole(monkeypatch):
+    monkeypatch.setattr(video_repository, "upsert_transcripts", lambda video_id, subtitles: None)
+    client = FakeGeminiClient(lambda name: [cue("00:01", "00:03", "hello")])
+
+    result = GeminiVideoProcessor(client=client).process(__file__, "prompt")
+
+    assert client.uploads[0][0] == "files/test_chunked_analysis"
+    assert result.subtitles == [cue("00:01", "00:03", "hello")]
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+
+import psycopg2
+import pytest
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories import video_repository  # noqa: F401  registers the prepared statements
+from utils import db
+
+
+@pytest.fixture
+def pool():
+    try:
+        pool = db.ConnectionPool(min_size=1, max_size=2, timeout=0.2, health_check_interval=0)
+    except psycopg2.OperationalError:
+        pytest.skip("Postgres not reachable")
+    yield pool
+    pool.closeall()
+
+
+def test_checkout_blocks_when_exhausted(pool):
+    first = pool.getconn()
+    second = pool.getconn()
+
+    with pytest.raises(psycopg2.pool.PoolError):
+        pool.getconn()
+
+    pool.putconn(first)
+    third = pool.getconn()
+    assert third is first
+    pool.putconn(second)
+    pool.putconn(third)
+
+
+def test_dead_connection_is_replaced_on_checkout(pool):
+    victim = pool.getconn()
+    killer = pool.getconn()
+    with killer.cursor() as cursor:
+        cursor.execute("SELECT pg_terminate_backend(%s)", (victim.info.backend_pid,))
+    killer.commit()
+    pool.putconn(killer)
+    pool.putconn(victim)
+
+    conns = [pool.getconn(), pool.getconn()]
+    for conn in conns:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 AS one")
+            assert cursor.fetchone()["one"] == 1
+    for conn in conns:
+        pool.putconn(conn)
+
+
+def test_statements_are_prepared_once_per_connection(pool, monkeypatch):
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+    for _ in range(3):
+        with db.get_db_cursor() as cursor:
+            db.execute_prepared(cursor, "select_video", ("missing",))
+            assert cursor.fetchone() is None
+            assert "select_video" in cursor.connection.prepared
+
+
+def test_advisory_locks_leave_the_pool_free(pool, monkeypatch):
+    monkeypatch.setattr(db, "get_pool", lambda: pool)
+
+    with db.advisory_lock("test-lock-a"), db.advisory_lock("test-lock-b"), db.advisory_lock("test-lock-c"):
+        with db.get_db_cursor() as cursor:
+            cursor.execute("SELECT 1 AS one")
+            assert cursor.fetchone()["one"] == 1
+        with db.try_advisory_lock("test-lock-a") as acquired:
+            assert not acquired
+
+    with db.try_advisory_lock("test-lock-a") as acquired:
+        assert acquired
+
+
+def test_concurrent_first_requests_share_one_async_pool(monkeypatch):
+    created = []
+
+    async def create_pool(**kwargs):
+        await asyncio.sleep(0.01)
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(db.asyncpg, "create_pool", create_pool)
+    monkeypatch.setattr(db, "_async_pool", None)
+
+    async def first_requests():
+        return await asyncio.gather(*(db.get_async_pool() for _ in range(5)))
+
+    assert asyncio.run(first_requests()) == created * 5
+    assert len(created) == 1
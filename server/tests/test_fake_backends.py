@@ -0,0 +1,82 @@
+import asyncio
+import os
+import random
+import shutil
+import sys
+
+import pytest
+
+# Add parent directory to Python path to make tts and video_processor modules importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_media import make_test_video
+from render.timeline import parse_timestamp
+from tts.fake_tts_processor import FakeTTSProcessor
+from tts.mp3_duration import MP3DurationCounter
+from tts.tts_processor import create_tts_processor
+from video_processor import fake_video_processor
+from video_processor.fake_video_processor import FakeVideoProcessor, jittered
+from video_processor.video_processor import create_video_processor
+
+
+def test_fake_tts_audio_length_follows_the_text():
+    tts = FakeTTSProcessor(first_byte_seconds=0, realtime_factor=0, chars_per_second=15, jitter=0)
+    counter = MP3DurationCounter()
+
+    chunks = list(tts.stream("x" * 60))
+    for chunk in chunks:
+        counter.feed(chunk)
+
+    assert counter.duration == pytest.approx(4.0, abs=0.03)
+    assert len(chunks) > 1
+
+
+def test_fake_tts_keys_differ_by_text_and_voice():
+    tts = FakeTTSProcessor()
+
+    assert tts.cache_key("hello") == tts.cache_key("hello")
+    assert tts.cache_key("hello") != tts.cache_key("hello", voice_id="other")
+    assert tts.cache_key("hello") != tts.cache_key("goodbye")
+
+
+def test_jitter_stays_within_bounds():
+    rng = random.Random(0)
+    samples = [jittered(2.0, 0.25, rng) for _ in range(1000)]
+
+    assert 1.5 <= min(samples) and max(samples) <= 2.5
+    assert jittered(1.0, 3.0, rng) >= 0
+
+
+def test_fake_analysis_covers_the_video(monkeypatch):
+    stored = {}
+    monkeypatch.setattr(fake_video_processor, "probe_media", lambda path: {"duration": 21.5})
+    monkeypatch.setattr(fake_video_processor.video_repository, "upsert_transcripts",
+                        lambda video_id, subtitles: stored.update({video_id: subtitles}))
+    processor = FakeVideoProcessor(upload_seconds=0, generate_seconds=0, cue_seconds=5)
+    stages = []
+
+    result = asyncio.run(processor.process_async("video.mp4", "a demo", stages.append))
+
+    assert stages == ["uploading", "analyzing"]
+    assert [parse_timestamp(cue["start"]) for cue in result.subtitles] == [0, 5, 10, 15, 20]
+    assert parse_timestamp(result.subtitles[-1]["end"]) == 21.5
+    assert stored == {result.video_id.replace("files/", ""): result.subtitles}
+
+
+def test_backends_are_selected_by_environment(monkeypatch):
+    monkeypatch.setenv("VIDEO_PROCESSOR_BACKEND", "fake")
+    monkeypatch.setenv("TTS_BACKEND", "fake")
+
+    assert isinstance(create_video_processor(), FakeVideoProcessor)
+    assert isinstance(create_tts_processor(), FakeTTSProcessor)
+
+    monkeypatch.setenv("TTS_BACKEND", "espeak")
+    with pytest.raises(ValueError):
+        create_tts_processor()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_synthetic_video_is_playable(tmp_path):
+    path = make_test_video(str(tmp_path / "video.mp4"), seconds=2, width=160, height=120)
+
+    assert os.path.getsize(path) > 0
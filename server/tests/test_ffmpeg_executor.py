@@ -0,0 +1,151 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ffmpeg_executor import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, Cancellation, FFmpegCancelled, FFmpegExecutor, PriorityGate,
+    StderrRing, ffmpeg_context
+)
+
+FAKE_FFMPEG = """#!{python}
+import sys, time
+reports, delay, stderr_lines = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+for line in range(stderr_lines):
+    print(f"log line {{line}}", file=sys.stderr)
+for report in range(1, reports + 1):
+    print(f"frame={{report * 25}}\\nout_time_us={{report * 1000000}}", flush=True)
+    print("progress=" + ("end" if report == reports else "continue"), flush=True)
+    time.sleep(delay)
+sys.exit(1 if stderr_lines else 0)
+"""
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path):
+    """A script named ffmpeg that prints ``-progress`` reports: args are reports, seconds between, stderr lines"""
+    path = tmp_path / "ffmpeg"
+    path.write_text(FAKE_FFMPEG.format(python=sys.executable))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def executor():
+    executor = FFmpegExecutor(max_concurrent=1, stderr_lines=3)
+    yield executor
+    executor.shutdown()
+
+
+def test_progress_is_reported_while_ffmpeg_runs(executor, fake_ffmpeg):
+    events = []
+
+    result = executor.run_sync([fake_ffmpeg, "3", "0", "0"], progress=True, on_progress=events.append)
+
+    assert [event["out_time_us"] for event in events] == ["1000000", "2000000", "3000000"]
+    assert [event["progress"] for event in events] == ["continue", "continue", "end"]
+    assert "out_time_us=3000000" in result.stdout
+    assert result.returncode == 0
+
+
+def test_stderr_keeps_only_the_last_lines(executor, fake_ffmpeg):
+    result = executor.run_sync([fake_ffmpeg, "1", "0", "10"])
+
+    assert result.returncode == 1
+    assert result.stderr == "[7 earlier line(s) dropped]\nlog line 7\nlog line 8\nlog line 9\n"
+
+
+def test_timeout_kills_the_process(executor, fake_ffmpeg):
+    started = time.monotonic()
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        executor.run_sync([fake_ffmpeg, "100", "0.1", "0"], progress=True, timeout=0.3)
+
+    assert time.monotonic() - started < 3
+
+
+def test_cancellation_kills_running_and_refuses_new_runs(executor, fake_ffmpeg):
+    cancellation = Cancellation()
+    threading.Timer(0.3, cancellation.cancel).start()
+
+    with ffmpeg_context(cancellation=cancellation):
+        with pytest.raises(FFmpegCancelled):
+            executor.run_sync([fake_ffmpeg, "100", "0.1", "0"], progress=True)
+        with pytest.raises(FFmpegCancelled):
+            executor.run_sync([fake_ffmpeg, "1", "0", "0"])
+
+
+def test_cancelling_the_awaiting_task_kills_the_process(executor, fake_ffmpeg):
+    async def main():
+        task = asyncio.ensure_future(executor.run_async([fake_ffmpeg, "100", "0.1", "0"], progress=True))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The slot is free again
+        return await asyncio.wait_for(executor.run_async([fake_ffmpeg, "1", "0", "0"]), 5)
+
+    assert asyncio.run(main()).returncode == 0
+
+
+def test_runs_beyond_the_slots_wait(executor, fake_ffmpeg):
+    started = time.monotonic()
+    threads = [threading.Thread(target=executor.run_sync, args=([fake_ffmpeg, "1", "0.4", "0"],)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.monotonic() - started >= 0.8
+
+
+def test_gate_admits_by_priority_then_arrival():
+    async def main():
+        gate = PriorityGate(1)
+        await gate.acquire()
+        admitted = []
+
+        async def wait(name, priority):
+            await gate.acquire(priority)
+            admitted.append(name)
+            gate.release()
+
+        waiters = [
+            asyncio.ensure_future(wait(name, priority))
+            for name, priority in [("archival", PRIORITY_BACKGROUND), ("preview", PRIORITY_INTERACTIVE),
+                                   ("upload", PRIORITY_BACKGROUND)]
+        ]
+        await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*waiters)
+        return admitted, gate.active
+
+    assert asyncio.run(main()) == (["preview", "archival", "upload"], 0)
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def main():
+        gate = PriorityGate(1)
+        await gate.acquire()
+        waiter = asyncio.ensure_future(gate.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        gate.release()
+        return gate.waiting, gate.active
+
+    assert asyncio.run(main()) == (0, 0)
+
+
+def test_stderr_ring_without_overflow():
+    ring = StderrRing(3)
+    ring.feed("a\n")
+
+    assert ring.text() == "a\n"
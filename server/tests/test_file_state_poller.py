@@ -0,0 +1,106 @@
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+# Add parent directory to Python path to make video_processor module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from video_processor.file_state_poller import FileProcessingError, FileProcessingTimeout, FileStatePoller
+
+
+def gemini_file(name, state):
+    return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+
+class FakeFiles:
+    """files.get that reports PROCESSING for the first ``processing_checks[name]`` calls, then ``final[name]``"""
+
+    def __init__(self, processing_checks, final=None, errors=0):
+        self.processing_checks = dict(processing_checks)
+        self.final = final or {}
+        self.errors = errors
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            self.calls.append(name)
+            if self.errors:
+                self.errors -= 1
+                raise ConnectionError("status check failed")
+            if self.calls.count(name) <= self.processing_checks[name]:
+                return gemini_file(name, "PROCESSING")
+            return gemini_file(name, self.final.get(name, "ACTIVE"))
+
+
+def make_poller(files, **kwargs):
+    return FileStatePoller(files.get, initial_delay=0.01, max_delay=0.04, **kwargs)
+
+
+def test_concurrent_waiters_share_one_poller_with_backoff():
+    files = FakeFiles({f"files/{i}": 3 for i in range(5)})
+    poller = make_poller(files)
+    events = []
+
+    async def wait_all():
+        return await asyncio.gather(*(
+            poller.wait_until_active(gemini_file(f"files/{i}", "PROCESSING"), on_progress=events.append)
+            for i in range(5)
+        ))
+
+    results = asyncio.run(wait_all())
+
+    assert [file.state.name for file in results] == ["ACTIVE"] * 5
+    assert poller.checks == 20
+    # Waiters registered together stay in step: four rounds of five checks each, not twenty separate loops
+    assert poller.rounds == 4
+    assert {event["state"] for event in events} == {"PROCESSING", "ACTIVE"}
+    assert max(event["checks"] for event in events) == 4
+
+
+def test_already_active_file_is_returned_without_polling():
+    files = FakeFiles({})
+    poller = make_poller(files)
+
+    result = asyncio.run(poller.wait_until_active(gemini_file("files/a", "ACTIVE")))
+
+    assert result.name == "files/a"
+    assert files.calls == []
+
+
+def test_failed_processing_raises():
+    poller = make_poller(FakeFiles({"files/a": 1}, final={"files/a": "FAILED"}))
+
+    with pytest.raises(FileProcessingError):
+        asyncio.run(poller.wait_until_active(gemini_file("files/a", "PROCESSING")))
+
+
+def test_status_check_errors_are_retried():
+    files = FakeFiles({"files/a": 0}, errors=2)
+
+    result = asyncio.run(make_poller(files).wait_until_active(gemini_file("files/a", "PROCESSING")))
+
+    assert result.state.name == "ACTIVE"
+    assert len(files.calls) == 3
+
+
+def test_timeout_and_cancellation_stop_polling():
+    files = FakeFiles({"files/slow": 10 ** 6, "files/cancelled": 10 ** 6})
+    poller = make_poller(files)
+
+    async def scenario():
+        cancelled = asyncio.ensure_future(poller.wait_until_active(gemini_file("files/cancelled", "PROCESSING")))
+        with pytest.raises(FileProcessingTimeout):
+            await poller.wait_until_active(gemini_file("files/slow", "PROCESSING"), timeout=0.1)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.sleep(0.1)
+        return poller._task.done()
+
+    assert asyncio.run(scenario())
+    assert poller._waiters == []
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.http_cache import IMMUTABLE_CACHE_CONTROL, cached_file_response, file_version
+
+CONTENT = bytes(range(256)) * 64
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(CONTENT)
+    return str(path)
+
+
+@pytest.fixture
+def client(video):
+    app = FastAPI()
+
+    @app.get("/video")
+    async def get_video(request: Request):
+        return cached_file_response(request, video, "video/mp4")
+
+    return TestClient(app)
+
+
+def test_full_get_has_etag_and_revalidates(client, video):
+    response = client.get("/video")
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == f'"{file_version(video)}"'
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.headers["accept-ranges"] == "bytes"
+
+
+def test_matching_etag_returns_304(client):
+    etag = client.get("/video").headers["etag"]
+
+    response = client.get("/video", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_rerender_changes_etag(client, video, tmp_path):
+    etag = client.get("/video").headers["etag"]
+    rendered = tmp_path / "rendered.mp4"
+    rendered.write_bytes(CONTENT[::-1])
+    os.replace(rendered, video)
+
+    response = client.get("/video", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_range_returns_206_with_the_slice(client):
+    response = client.get("/video", headers={"Range": "bytes=1000-1999"})
+
+    assert response.status_code == 206
+    assert response.content == CONTENT[1000:2000]
+    assert response.headers["content-range"] == f"bytes 1000-1999/{len(CONTENT)}"
+
+
+def test_open_ended_and_unsatisfiable_ranges(client):
+    assert client.get("/video", headers={"Range": "bytes=-100"}).content == CONTENT[-100:]
+    assert client.get("/video", headers={"Range": f"bytes={len(CONTENT)}-"}).status_code == 416
+
+
+def test_stale_if_range_gets_the_full_file(client):
+    response = client.get("/video", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_versioned_url_is_immutable_only_for_the_current_version(client, video):
+    current = client.get("/video", params={"v": file_version(video)})
+    stale = client.get("/video", params={"v": "0000000000000000"})
+
+    assert current.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert stale.headers["cache-control"] == "no-cache"
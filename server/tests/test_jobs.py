@@ -0,0 +1,157 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import psycopg2
+import pytest
+
+# Add parent directory to Python path to make jobs module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import job_store, worker
+from repositories import media_repository
+from video_processor import analysis_cache
+from models.video_processor import ProcessedVideoResponse
+from pipeline.process_video import ProcessVideoPipeline
+from tts.audio_cache import TTSAudioCache
+from tts.batch import BatchTTSSynthesizer
+from utils.db import advisory_lock
+from video_processor.video_processor import VideoProcessor
+
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+class FakeVideoProcessor(VideoProcessor):
+    def __init__(self):
+        self.calls = 0
+
+    def analysis_key(self, content_sha256, prompt):
+        return f"{content_sha256}:{prompt}"
+
+    def process(self, video_path, prompt, on_stage=None):
+        self.calls += 1
+        on_stage("uploading")
+        on_stage("analyzing")
+        return ProcessedVideoResponse(video_id="files/abc", subtitles=[
+            {"start": "00:00", "end": "00:02", "text": "first"},
+            {"start": "00:02", "end": "00:04", "text": "second"},
+        ])
+
+
+class FakeTTSProcessor:
+    def stream(self, text, voice_id="voice"):
+        return iter([MP3_FRAME * 10, MP3_FRAME * 10])
+
+    def cache_key(self, text, voice_id="voice"):
+        return TTSAudioCache.make_key(text=text, voice_id=voice_id)
+
+
+def test_pipeline_reports_stages_in_order(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(media_repository, "register_media", lambda video_id, kind, keys: None)
+    upload = tmp_path / "upload.mp4"
+    upload.write_bytes(b"video")
+    pipeline = ProcessVideoPipeline(
+        FakeVideoProcessor(), FakeTTSProcessor(),
+        TTSAudioCache(cache_dir=str(tmp_path / "cache")), BatchTTSSynthesizer(max_in_flight=2)
+    )
+    reports = []
+
+    result = asyncio.run(pipeline.run(str(upload), "prompt", report=lambda *r: reports.append(r)))
+
+    stages = [stage for stage, _ in reports]
+    progress = [value for _, value in reports]
+    assert stages[:4] == ["uploading", "analyzing", "saving_video", "synthesizing"]
+    assert stages[-1] == "done"
+    assert progress == sorted(progress)
+    assert progress[-1] == 1.0
+    assert not os.path.exists(upload)
+    videos_dir = tmp_path / "static" / "videos"
+    assert os.path.samefile(videos_dir / "abc.mp4", videos_dir / "abc_source.mp4")
+    assert all(subtitle["audio_id"].startswith("audio_") for subtitle in result.subtitles)
+
+
+def test_repeat_upload_reuses_stored_analysis(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(media_repository, "register_media", lambda video_id, kind, keys: None)
+    stored = {}
+    monkeypatch.setattr(analysis_cache, "find_analysis", lambda key: stored.get(key))
+    monkeypatch.setattr(analysis_cache, "store_analysis", lambda key, sha, video_id, subtitles: stored.update(
+        {key: {"video_id": video_id, "subtitles": subtitles}}))
+    video_processor = FakeVideoProcessor()
+    pipeline = ProcessVideoPipeline(
+        video_processor, FakeTTSProcessor(),
+        TTSAudioCache(cache_dir=str(tmp_path / "cache")), BatchTTSSynthesizer(max_in_flight=2)
+    )
+
+    def run(use_analysis_cache=True):
+        upload = tmp_path / "upload.mp4"
+        upload.write_bytes(b"video")
+        return asyncio.run(pipeline.run(str(upload), "prompt", content_sha256="sha",
+                                        use_analysis_cache=use_analysis_cache))
+
+    first = run()
+    second = run()
+    run(use_analysis_cache=False)
+
+    assert video_processor.calls == 2
+    assert second.video_id == "abc"
+    assert [s["text"] for s in second.subtitles] == [s["text"] for s in first.subtitles]
+    assert "audio_id" not in stored["sha:prompt"]["subtitles"][0]
+
+
+def test_reporter_throttles_and_times_stages(monkeypatch):
+    writes = []
+    monkeypatch.setattr(job_store, "update_progress", lambda *args: writes.append(args))
+    reporter = worker.JobReporter("job", min_interval=60)
+
+    reporter.report("analyzing", 0.3)
+    reporter.report("synthesizing", 0.5)
+    reporter.report("synthesizing", 0.6)
+    reporter.report("synthesizing", 0.7)
+    timings = reporter.finish()
+
+    assert [w[1] for w in writes] == ["analyzing", "synthesizing"]
+    assert set(timings) == {"analyzing", "synthesizing"}
+    assert writes[1][3] == {"analyzing": timings["analyzing"]}
+
+
+def test_cancelled_and_crashed_jobs_are_marked_failed(monkeypatch):
+    failed = []
+    monkeypatch.setattr(job_store, "mark_failed", lambda job_id, error: failed.append(job_id))
+    runner = worker.JobRunner(max_workers=1)
+    broken_executor = runner._executor
+    cancelled = Future()
+    cancelled.cancel()
+    crashed = Future()
+    crashed.set_exception(BrokenProcessPool("worker died"))
+
+    try:
+        runner._on_done("cancelled", broken_executor, cancelled)
+        runner._on_done("crashed", broken_executor, crashed)
+        assert failed == ["cancelled", "crashed"]
+        assert runner._executor is not broken_executor
+    finally:
+        runner.shutdown()
+
+
+def test_start_fails_jobs_of_stopped_runners():
+    try:
+        stopped_job = job_store.create_job("test", {}, "test-stopped-runner")
+    except psycopg2.Error as e:
+        pytest.skip(f"Postgres with migrations not available: {e}")
+    live_job = job_store.create_job("test", {}, "test-live-runner")
+    runner = worker.JobRunner(max_workers=1)
+    own_job = job_store.create_job("test", {}, runner.runner_id)
+
+    try:
+        with advisory_lock(worker.RUNNER_LOCK_PREFIX + "test-live-runner"):
+            runner.start()
+        statuses = [job_store.get_job(job_id)["status"] for job_id in (stopped_job, live_job, own_job)]
+        assert statuses == [job_store.FAILED, job_store.QUEUED, job_store.QUEUED]
+    finally:
+        runner.shutdown()
+        for job_id in (live_job, own_job):
+            job_store.mark_failed(job_id, "test over")
@@ -0,0 +1,89 @@
+import os
+import sys
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Add parent directory to Python path to make storage module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.local_media_storage import LocalMediaStorage
+from storage.media_storage import audio_key, source_key, video_key
+
+
+def make_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_put_file_moves_or_links(tmp_path):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"))
+    upload = make_file(tmp_path, "upload.mp4", b"video")
+    cached = make_file(tmp_path, "cached.mp3", b"audio")
+
+    storage.put_file(source_key("vid"), upload, move=True)
+    storage.put_file("audio/a.mp3", cached)
+
+    assert not os.path.exists(upload)
+    assert os.path.samefile(cached, storage.local_path("audio/a.mp3"))
+    with open(storage.local_path(source_key("vid")), "rb") as source:
+        assert source.read() == b"video"
+
+
+def test_copy_shares_the_file_and_replace_detaches_it(tmp_path):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"))
+    storage.put_file(source_key("vid"), make_file(tmp_path, "upload.mp4", b"original"), move=True)
+    storage.copy(source_key("vid"), video_key("vid"))
+    assert os.path.samefile(storage.local_path(source_key("vid")), storage.local_path(video_key("vid")))
+    before = storage.version(video_key("vid"))
+
+    staged = storage.staging_path(video_key("vid"))
+    with open(staged, "wb") as rendered:
+        rendered.write(b"rendered")
+    storage.put_file(video_key("vid"), staged, move=True)
+
+    assert storage.version(video_key("vid")) != before
+    with open(storage.local_path(source_key("vid")), "rb") as source:
+        assert source.read() == b"original"
+    assert sorted(os.listdir(tmp_path / "static" / "videos")) == ["vid.mp4", "vid_source.mp4"]
+
+
+def test_missing_objects(tmp_path):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"))
+
+    assert not storage.exists(video_key("nope"))
+    storage.delete(video_key("nope"))
+    try:
+        storage.local_path(video_key("nope"))
+    except FileNotFoundError:
+        pass
+    else:
+        raise AssertionError("expected FileNotFoundError")
+
+
+def test_list_objects_skips_writes_in_progress(tmp_path):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"))
+    storage.put_file(video_key("vid"), make_file(tmp_path, "upload.mp4", b"video"), move=True)
+    storage.put_file(audio_key("a"), make_file(tmp_path, "a.mp3", b"audio"))
+    make_file(tmp_path / "static" / "videos", "vid.mp4.0123.tmp.mp4", b"partial")
+
+    assert [(obj.key, obj.size) for obj in storage.list_objects("videos/")] == [(video_key("vid"), 5)]
+    assert sorted(obj.key for obj in storage.list_objects("")) == [audio_key("a"), video_key("vid")]
+
+
+def test_serve_supports_etag_and_range(tmp_path):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"))
+    storage.put_file(video_key("vid"), make_file(tmp_path, "upload.mp4", b"0123456789"), move=True)
+    app = FastAPI()
+
+    @app.get("/video")
+    async def get_video(request: Request):
+        return storage.serve(request, video_key("vid"), "video/mp4")
+
+    client = TestClient(app)
+    etag = client.get("/video").headers["etag"]
+
+    assert etag == f'"{storage.version(video_key("vid"))}"'
+    assert client.get("/video", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/video", headers={"Range": "bytes=2-4"}).content == b"234"
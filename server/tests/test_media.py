@@ -0,0 +1,77 @@
+import json
+import os
+import subprocess
+import sys
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import update_video
+from repositories import video_repository
+from storage.local_media_storage import LocalMediaStorage
+from utils.media import parse_probe_output, probe_media
+
+PROBE_OUTPUT = {
+    "streams": [
+        {"codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080, "avg_frame_rate": "30000/1001"},
+        {"codec_type": "audio", "codec_name": "aac", "avg_frame_rate": "0/0"},
+    ],
+    "format": {"duration": "12.480000", "size": "1048576"},
+}
+
+
+def fail_probe(path):
+    raise AssertionError(f"unexpected probe of {path}")
+
+
+def test_parse_probe_output():
+    assert parse_probe_output(PROBE_OUTPUT) == {
+        "duration": 12.48,
+        "width": 1920,
+        "height": 1080,
+        "fps": 29.97,
+        "video_codec": "h264",
+        "audio_codec": "aac",
+        "size": 1048576,
+    }
+
+
+def test_silent_video_has_no_audio_codec():
+    probe = {"streams": PROBE_OUTPUT["streams"][:1], "format": PROBE_OUTPUT["format"]}
+
+    assert parse_probe_output(probe)["audio_codec"] is None
+
+
+def test_probe_media_runs_ffprobe_once():
+    commands = []
+
+    def run(cmd, **kwargs):
+        commands.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, json.dumps(PROBE_OUTPUT), "")
+
+    assert probe_media("video.mp4", run=run)["duration"] == 12.48
+    assert len(commands) == 1 and commands[0][0] == "ffprobe"
+
+
+def test_update_uses_stored_media_info(monkeypatch):
+    stored = {"video_id": "vid", "media_info": {"duration": 30.0}}
+    monkeypatch.setattr(video_repository, "get_video", lambda video_id: stored)
+    monkeypatch.setattr(update_video, "probe_media", fail_probe)
+
+    assert update_video.get_media_info(LocalMediaStorage(), "vid") == {"duration": 30.0}
+
+
+def test_update_probes_and_stores_legacy_videos(tmp_path, monkeypatch):
+    storage = LocalMediaStorage(root=str(tmp_path))
+    (tmp_path / "videos").mkdir()
+    (tmp_path / "videos" / "vid_source.mp4").write_bytes(b"source")
+    saved = {}
+    monkeypatch.setattr(video_repository, "get_video", lambda video_id: {"video_id": video_id, "media_info": None})
+    monkeypatch.setattr(video_repository, "save_media_info", lambda video_id, info: saved.update({video_id: info}))
+    monkeypatch.setattr(update_video, "probe_media", lambda path: {"duration": 8.0, "path": path})
+
+    media_info = update_video.get_media_info(storage, "vid")
+
+    assert media_info["duration"] == 8.0
+    assert media_info["path"].endswith("vid_source.mp4")
+    assert saved == {"vid": media_info}
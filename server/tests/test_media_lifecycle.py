@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+
+import psycopg2
+import pytest
+
+# Add parent directory to Python path to make storage module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import job_store
+from render.render_scheduler import exclusive_render
+from repositories import media_repository, video_repository
+from storage.local_media_storage import LocalMediaStorage
+from storage.media_lifecycle import EVICTED, ORPHAN, STALE_AUDIO, TEMPORARY, MediaLifecycleManager
+from storage.media_storage import audio_key, source_key, video_key
+from utils.db import get_db_cursor
+
+LIVE_VIDEO = "test-lifecycle-live"
+GONE_VIDEO = "test-lifecycle-gone"
+OTHER_VIDEO = "test-lifecycle-other"
+TEST_VIDEO_IDS = [LIVE_VIDEO, GONE_VIDEO, OTHER_VIDEO]
+HOUR = 3600
+
+
+@pytest.fixture
+def clean_videos():
+    def clean():
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM videos WHERE video_id = ANY(%s)", (TEST_VIDEO_IDS,))
+            cursor.execute("DELETE FROM media_objects WHERE video_id = ANY(%s)", (TEST_VIDEO_IDS,))
+
+    try:
+        clean()
+    except psycopg2.Error as e:
+        pytest.skip(f"Postgres with migrations not available: {e}")
+    yield
+    clean()
+
+
+def write(path, size, age=0.0):
+    """Create a file of ``size`` bytes last modified ``age`` seconds ago"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    modified = time.time() - age
+    os.utime(path, (modified, modified))
+    return path
+
+
+def make_manager(tmp_path, **kwargs):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"), scratch_dir=str(tmp_path / "static" / "scratch"))
+    settings = dict(upload_dir=str(tmp_path / "static" / "uploads"), cache_dirs=[str(tmp_path / "static" / "tts")],
+                    temp_max_age_seconds=HOUR, orphan_grace_seconds=HOUR, stale_audio_seconds=0,
+                    quota_bytes=0, video_quota_bytes=0, min_free_bytes=0)
+    settings.update(kwargs)
+    return MediaLifecycleManager(storage, str(tmp_path / "static" / "segments"), **settings), storage
+
+
+def chunk_path(tmp_path, video_id, n):
+    return str(tmp_path / "static" / "segments" / video_id / "standard" / f"{n:032x}.mp4")
+
+
+def test_old_temporary_files_are_removed(tmp_path, clean_videos):
+    manager, storage = make_manager(tmp_path)
+    static = tmp_path / "static"
+    crashed = [
+        write(str(static / "scratch" / "temp_audio_x.mp3"), 10, age=2 * HOUR),
+        write(str(static / "uploads" / "abc_video.mp4"), 10, age=2 * HOUR),
+        write(storage.path(video_key(LIVE_VIDEO)) + ".0123.tmp.mp4", 10, age=2 * HOUR),
+        write(str(static / "tts" / "key.mp3.0123.tmp"), 10, age=2 * HOUR),
+        write(str(static / "segments" / LIVE_VIDEO / "standard" / "concat_1.txt"), 10, age=2 * HOUR),
+    ]
+    kept = [
+        write(str(static / "scratch" / "temp_audio_y.mp3"), 10),
+        write(str(static / "tts" / "key.mp3"), 10, age=2 * HOUR),
+        write(str(static / "uploads" / "queued_video.mp4"), 10, age=2 * HOUR),
+    ]
+    job_id = job_store.create_job("process_video", {"upload_path": kept[-1]})
+    video_repository.upsert_transcripts(LIVE_VIDEO, [])
+
+    try:
+        report = manager.sweep()
+    finally:
+        job_store.mark_failed(job_id, "test over")
+
+    assert [os.path.exists(path) for path in crashed] == [False] * len(crashed)
+    assert all(os.path.exists(path) for path in kept)
+    assert report.removed_files == {TEMPORARY: len(crashed)}
+    assert manager.stats()["removed_bytes"] == {TEMPORARY: 10 * len(crashed)}
+
+
+def test_orphaned_and_stale_objects_are_removed(tmp_path, clean_videos, monkeypatch):
+    monkeypatch.setattr(media_repository, "index_created_at", lambda: time.time() - 3 * HOUR)
+    manager, storage = make_manager(tmp_path)
+    video_repository.upsert_transcripts(LIVE_VIDEO, [{"text": "one"}])
+    write(storage.path(video_key(LIVE_VIDEO)), 100, age=2 * HOUR)
+    write(storage.path(source_key(GONE_VIDEO)), 100, age=2 * HOUR)
+    write(storage.path(audio_key("audio_stale")), 10, age=2 * HOUR)
+    media_repository.register_media(LIVE_VIDEO, media_repository.AUDIO_MEDIA, [audio_key("audio_stale")])
+    video_repository.upsert_transcripts(LIVE_VIDEO, [{"text": "two"}])
+    write(storage.path(audio_key("audio_current")), 10, age=2 * HOUR)
+    media_repository.register_media(LIVE_VIDEO, media_repository.AUDIO_MEDIA, [audio_key("audio_current")])
+    write(storage.path(audio_key("audio_unindexed")), 10, age=2 * HOUR)
+    write(storage.path(audio_key("audio_uploading")), 10)
+    write(chunk_path(tmp_path, GONE_VIDEO, 1), 50, age=2 * HOUR)
+
+    report = manager.sweep()
+
+    assert sorted(obj.key for obj in storage.list_objects("")) == [
+        audio_key("audio_current"), audio_key("audio_uploading"), video_key(LIVE_VIDEO)
+    ]
+    assert not os.path.exists(tmp_path / "static" / "segments" / GONE_VIDEO)
+    assert report.removed_files == {ORPHAN: 3, STALE_AUDIO: 1}
+    assert report.usage_bytes == 110
+    assert list(media_repository.get_media_references([audio_key("audio_stale"), audio_key("audio_current")])) == [
+        audio_key("audio_current")
+    ]
+
+
+def test_audio_from_before_the_index_is_kept(tmp_path, clean_videos, monkeypatch):
+    monkeypatch.setattr(media_repository, "index_created_at", lambda: time.time() - HOUR / 2)
+    manager, storage = make_manager(tmp_path)
+    write(storage.path(audio_key("audio_legacy")), 10, age=2 * HOUR)
+
+    report = manager.sweep()
+
+    assert [obj.key for obj in storage.list_objects("audio/")] == [audio_key("audio_legacy")]
+    assert report.removed_files == {}
+
+
+def test_quotas_evict_least_recently_used_chunks(tmp_path, clean_videos):
+    manager, storage = make_manager(tmp_path, video_quota_bytes=250, quota_bytes=250)
+    video_repository.upsert_transcripts(LIVE_VIDEO, [])
+    video_repository.upsert_transcripts(OTHER_VIDEO, [])
+    write(storage.path(video_key(LIVE_VIDEO)), 100)
+    live_chunks = [write(chunk_path(tmp_path, LIVE_VIDEO, n), 50, age=10 * (4 - n)) for n in range(4)]
+    other_chunks = [write(chunk_path(tmp_path, OTHER_VIDEO, n), 50, age=100 + n) for n in range(2)]
+
+    report = manager.sweep()
+
+    # LIVE_VIDEO holds 300 bytes, 50 over its quota; the 400 in total are then still 100 over the global quota
+    assert [os.path.exists(path) for path in live_chunks] == [False, True, True, True]
+    assert [os.path.exists(path) for path in other_chunks] == [False, False]
+    assert report.removed_files == {EVICTED: 3}
+    assert report.videos_over_quota == 1
+    assert report.usage_bytes == 250
+
+
+def test_videos_being_rendered_are_not_evicted(tmp_path, clean_videos):
+    manager, _ = make_manager(tmp_path, quota_bytes=1)
+    video_repository.upsert_transcripts(LIVE_VIDEO, [])
+    chunk = write(chunk_path(tmp_path, LIVE_VIDEO, 1), 50)
+
+    with exclusive_render(LIVE_VIDEO):
+        report = manager.sweep()
+
+    assert os.path.exists(chunk)
+    assert report.busy_videos_skipped == 1
+    assert manager.sweep().removed_files == {EVICTED: 1}
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+from prometheus_client import REGISTRY
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.audio_cache import TTSAudioCache
+from utils.ffmpeg import instrument_command, parse_benchmark, parse_progress, run_ffmpeg
+from utils.metrics import latest_metrics, timed, timed_stage
+
+PROGRESS_OUTPUT = """frame=25
+out_time_us=1000000
+progress=continue
+frame=50
+out_time_us=2000000
+speed=  47x
+progress=end
+"""
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_timed_stage_observes_wall_time_and_counts_errors():
+    count = sample("voicecanvas_stage_seconds_count", stage="test.fails")
+    errors = sample("voicecanvas_stage_errors_total", stage="test.fails")
+
+    with pytest.raises(ValueError):
+        with timed_stage("test.fails"):
+            raise ValueError("boom")
+
+    assert sample("voicecanvas_stage_seconds_count", stage="test.fails") == count + 1
+    assert sample("voicecanvas_stage_errors_total", stage="test.fails") == errors + 1
+
+
+def test_timed_decorates_coroutines():
+    @timed("test.coroutine")
+    async def work():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    before = sample("voicecanvas_stage_seconds_sum", stage="test.coroutine")
+
+    assert asyncio.run(work()) == "done"
+    assert sample("voicecanvas_stage_seconds_sum", stage="test.coroutine") - before >= 0.01
+
+
+def test_tts_cache_lookups_are_counted(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    hits = sample("voicecanvas_tts_cache_lookups_total", result="hit")
+    misses = sample("voicecanvas_tts_cache_lookups_total", result="miss")
+
+    cache.get_or_create("key", lambda: b"\xff\xfb\x90\x64" + b"\0" * 600)
+    cache.get("key")
+
+    assert sample("voicecanvas_tts_cache_lookups_total", result="hit") == hits + 1
+    assert sample("voicecanvas_tts_cache_lookups_total", result="miss") == misses + 1
+
+
+def test_metrics_are_exposed_in_text_format():
+    with timed_stage("test.exposed"):
+        pass
+
+    assert b'voicecanvas_stage_seconds_bucket{le="0.005",stage="test.exposed"}' in latest_metrics()
+
+
+def test_only_ffmpeg_writing_to_files_is_instrumented():
+    assert instrument_command(["ffmpeg", "-y", "-i", "in.mp4", "out.mp4"])[:5] == [
+        "ffmpeg", "-benchmark", "-progress", "pipe:1", "-nostats"
+    ]
+    assert instrument_command(["ffprobe", "in.mp4"]) == ["ffprobe", "in.mp4"]
+    assert instrument_command(["ffmpeg", "-i", "in.mp4", "-f", "wav", "-"])[1] == "-i"
+
+
+def test_progress_and_benchmark_parsing():
+    assert parse_progress(PROGRESS_OUTPUT)["out_time_us"] == "2000000"
+    assert parse_progress(PROGRESS_OUTPUT)["speed"] == "47x"
+    assert parse_benchmark("...\nbench: utime=0.025s stime=0.006s rtime=0.043s\nbench: maxrss=19780KiB\n") == {
+        "user": 0.025, "system": 0.006, "real": 0.043
+    }
+    assert parse_benchmark("no benchmark here") is None
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_run_ffmpeg_records_cpu_and_media_time(tmp_path):
+    cpu_count = sample("voicecanvas_ffmpeg_cpu_seconds_count", operation="test")
+    media = sample("voicecanvas_ffmpeg_media_seconds_total", operation="test")
+
+    run_ffmpeg(["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25:duration=2",
+                "-c:v", "libx264", "-preset", "ultrafast", str(tmp_path / "out.mp4")], operation="test")
+
+    assert sample("voicecanvas_ffmpeg_cpu_seconds_count", operation="test") == cpu_count + 1
+    assert sample("voicecanvas_ffmpeg_media_seconds_total", operation="test") == pytest.approx(media + 2.0)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_run_ffmpeg_raises_like_subprocess_run(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        run_ffmpeg(["ffmpeg", "-y", "-i", str(tmp_path / "missing.mp4"), str(tmp_path / "out.mp4")])
+
+    assert error.value.cmd[1] == "-y"
+    assert "missing.mp4" in error.value.stderr
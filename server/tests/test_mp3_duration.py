@@ -0,0 +1,65 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# Add parent directory to Python path to make tts module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.mp3_duration import MP3DurationCounter, parse_frame_header
+
+# Silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes, 1152 samples
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+# MPEG-2 Layer III frame: 64 kbps, 22.05 kHz, 208 bytes, 576 samples
+MPEG2_FRAME = b"\xff\xf3\x80\xc4" + b"\x00" * 204
+
+
+def count(data, chunk_size):
+    counter = MP3DurationCounter()
+    for start in range(0, len(data), chunk_size):
+        counter.feed(data[start:start + chunk_size])
+    return counter
+
+
+def id3_tag(payload_size):
+    size = bytes((payload_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + size + b"\xff" * payload_size
+
+
+def test_frame_headers():
+    assert parse_frame_header(MP3_FRAME[:4]) == (417, 1152, 44100)
+    assert parse_frame_header(MPEG2_FRAME[:4]) == (208, 576, 22050)
+    assert parse_frame_header(b"\xff\xfb\xf0\x64") is None
+    assert parse_frame_header(b"ID3\x04") is None
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 417, 4096, 10 ** 6])
+def test_duration_does_not_depend_on_chunking(chunk_size):
+    counter = count(MP3_FRAME * 40, chunk_size)
+
+    assert counter.frames == 40
+    assert counter.duration == 40 * 1152 / 44100
+
+
+def test_skips_id3_tag_xing_frame_and_junk():
+    xing_frame = MP3_FRAME[:36] + b"Xing" + MP3_FRAME[40:]
+    data = id3_tag(3000) + xing_frame + MPEG2_FRAME * 10 + b"TAG" + b"\x00" * 125
+
+    counter = count(data, 500)
+
+    assert counter.frames == 10
+    assert counter.duration == 10 * 576 / 22050
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_matches_an_encoded_file(tmp_path):
+    path = str(tmp_path / "tone.mp3")
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", "sine=duration=3", "-b:a", "192k", path],
+                   check=True, capture_output=True)
+    with open(path, "rb") as mp3:
+        data = mp3.read()
+
+    # The encoder pads the stream by up to a frame at each end
+    assert abs(count(data, 8192).duration - 3.0) < 2 * 1152 / 44100
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+import threading
+from contextlib import nullcontext
+
+import pytest
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import update_video
+from render import render_scheduler
+from render.profiles import get_render_profile
+from render.render_scheduler import RenderScheduler, RenderSuperseded, RenderTicket
+from render.segment_renderer import SegmentRenderer
+from storage.media_storage import preview_key, video_key
+from test_update_video import SEGMENTS, FakeRunner, setup_video
+
+
+@pytest.fixture
+def generations(monkeypatch):
+    """In-memory render generations instead of the videos table, and no advisory lock"""
+    latest = {}
+
+    def next_generation(video_id):
+        latest[video_id] = latest.get(video_id, 0) + 1
+        return latest[video_id]
+
+    monkeypatch.setattr(render_scheduler.video_repository, "next_render_generation", next_generation)
+    monkeypatch.setattr(render_scheduler.video_repository, "get_render_generation",
+                        lambda video_id: latest.get(video_id, 0))
+    monkeypatch.setattr(render_scheduler, "exclusive_render", lambda video_id: nullcontext())
+    return latest
+
+
+def test_queued_renders_are_coalesced_to_the_latest(generations):
+    scheduler = RenderScheduler()
+    started, release = threading.Event(), threading.Event()
+    rendered = []
+
+    def render(generation):
+        rendered.append(generation)
+        started.set()
+        release.wait(5)
+        return generation
+
+    async def main():
+        first = scheduler.request("vid")
+        running = asyncio.ensure_future(scheduler.run(first, lambda: render(1)))
+        await asyncio.to_thread(started.wait, 5)
+        queued = [scheduler.request("vid") for _ in range(2)]
+        waiting = [scheduler.run(ticket, lambda ticket=ticket: render(ticket.generation)) for ticket in queued]
+        release.set()
+        return await asyncio.gather(running, *waiting, return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    # The first render had already started; the second was overtaken while it waited
+    assert rendered == [1, 3]
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], RenderSuperseded)
+    assert scheduler.dropped == 1
+    assert scheduler.latest_known("vid") == 0
+
+
+def test_renders_of_different_videos_do_not_coalesce(generations):
+    scheduler = RenderScheduler()
+
+    async def main():
+        tickets = [scheduler.request("a"), scheduler.request("b")]
+        return await asyncio.gather(*(scheduler.run(ticket, lambda: "done") for ticket in tickets))
+
+    assert asyncio.run(main()) == ["done", "done"]
+    assert scheduler.dropped == 0
+
+
+def test_running_render_stops_at_the_next_segment(tmp_path, monkeypatch):
+    storage, audio, saved = setup_video(tmp_path, monkeypatch)
+    runner = FakeRunner()
+    latest = {"generation": 1}
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        latest["generation"] = 2  # A newer update arrives while the first segment encodes
+        return runner(cmd, **kwargs)
+
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=run)
+    ticket = RenderTicket("vid", 1, latest=lambda: latest["generation"])
+
+    with pytest.raises(RenderSuperseded):
+        update_video.run_full_render(
+            renderer, storage, "vid", SEGMENTS, [audio], [2.0], get_render_profile("archival"), ticket
+        )
+
+    assert len(calls) == 1
+    with open(storage.path(video_key("vid")), "rb") as video:
+        assert video.read() == b"original"
+    assert saved == {}
+    assert not os.path.exists(audio)
+
+
+def test_stale_render_is_not_published(tmp_path, monkeypatch):
+    storage, audio, _ = setup_video(tmp_path, monkeypatch)
+    latest = {"generation": 1}
+
+    def run(cmd, **kwargs):
+        if cmd[0] == "ffmpeg" and "-f" in cmd and "concat" in cmd:
+            latest["generation"] = 2  # Superseded during the final mux
+        return FakeRunner()(cmd, **kwargs)
+
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=run)
+    ticket = RenderTicket("vid", 1, latest=lambda: latest["generation"])
+
+    with pytest.raises(RenderSuperseded):
+        update_video.render_and_replace(
+            renderer, storage, "vid", SEGMENTS, [audio], [2.0], preview_key("vid"), get_render_profile("preview"),
+            ticket
+        )
+
+    assert not storage.exists(preview_key("vid"))
+    assert [name for name in os.listdir(tmp_path / "static" / "videos") if ".tmp." in name] == []
@@ -0,0 +1,152 @@
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+# Add parent directory to Python path to make storage module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage.media_storage import source_key, video_key
+from storage.s3_media_storage import S3MediaStorage
+
+BUCKET = "media"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def make_storage(tmp_path, s3, **kwargs):
+    return S3MediaStorage(bucket=BUCKET, prefix="media/", client=s3, cache_dir=str(tmp_path / "cache"),
+                          scratch_dir=str(tmp_path / "scratch"), **kwargs)
+
+
+def make_file(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_put_file_uploads_in_parts_and_keeps_moved_files_hot(tmp_path, s3, monkeypatch):
+    monkeypatch.setenv("S3_MULTIPART_CHUNK_BYTES", str(5 * 1024 ** 2))
+    storage = make_storage(tmp_path, s3)
+    content = os.urandom(11 * 1024 ** 2)
+
+    storage.put_file(source_key("vid"), make_file(tmp_path, "upload.mp4", content), move=True)
+
+    head = s3.head_object(Bucket=BUCKET, Key="media/videos/vid_source.mp4")
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["ContentType"] == "video/mp4"
+    with open(storage.local_path(source_key("vid")), "rb") as cached:
+        assert cached.read() == content
+    assert storage.cache_stats()["misses"] == 0
+
+
+def test_read_through_cache_revalidates_against_the_bucket(tmp_path, s3):
+    writer = make_storage(tmp_path / "node_a", s3)
+    reader = make_storage(tmp_path / "node_b", s3)
+    writer.put_file(video_key("vid"), make_file(tmp_path, "first.mp4", b"first"))
+
+    first = reader.local_path(video_key("vid"))
+    reader.local_path(video_key("vid"))
+    writer.put_file(video_key("vid"), make_file(tmp_path, "second.mp4", b"second"))
+    second = reader.local_path(video_key("vid"))
+
+    with open(second, "rb") as cached:
+        assert cached.read() == b"second"
+    assert first == second
+    assert reader.cache_stats()["hits"] == 1
+    assert reader.cache_stats()["misses"] == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path, s3):
+    storage = make_storage(tmp_path, s3, cache_max_bytes=10)
+    for name in ("a", "b", "c"):
+        storage.put_file(f"audio/{name}.mp3", make_file(tmp_path, f"{name}.mp3", b"12345"))
+
+    storage.local_path("audio/a.mp3")
+    storage.local_path("audio/b.mp3")
+    os.utime(os.path.join(storage.cache_dir, "audio", "a.mp3.etag"), (0, 0))
+    storage.local_path("audio/c.mp3")
+
+    assert sorted(os.listdir(os.path.join(storage.cache_dir, "audio"))) == [
+        "b.mp3", "b.mp3.etag", "c.mp3", "c.mp3.etag"
+    ]
+
+
+def test_files_in_use_survive_eviction_by_any_process(tmp_path, s3):
+    storage = make_storage(tmp_path, s3, cache_max_bytes=10)
+    # Shares the cache directory like a render worker process; flock pins hold across separately opened files
+    worker = make_storage(tmp_path, s3, cache_max_bytes=10)
+    for name in ("a", "b", "c"):
+        storage.put_file(f"audio/{name}.mp3", make_file(tmp_path, f"{name}.mp3", b"12345"))
+
+    with worker.local_file("audio/a.mp3") as path:
+        storage.local_path("audio/b.mp3")
+        os.utime(os.path.join(storage.cache_dir, "audio", "a.mp3.etag"), (0, 0))
+        storage.local_path("audio/c.mp3")
+        with open(path, "rb") as cached:
+            assert cached.read() == b"12345"
+
+    assert sorted(os.listdir(os.path.join(storage.cache_dir, "audio"))) == [
+        "a.mp3", "a.mp3.etag", "a.mp3.pin", "c.mp3", "c.mp3.etag"
+    ]
+    assert storage._key_locks == {} and worker._key_locks == {}
+
+
+def test_copy_delete_and_missing_objects(tmp_path, s3):
+    storage = make_storage(tmp_path, s3)
+    storage.put_file(source_key("vid"), make_file(tmp_path, "upload.mp4", b"video"), move=True)
+
+    storage.copy(source_key("vid"), video_key("vid"))
+    storage.delete(source_key("vid"))
+
+    assert storage.exists(video_key("vid"))
+    assert not storage.exists(source_key("vid"))
+    assert not os.path.exists(os.path.join(storage.cache_dir, "videos", "vid_source.mp4"))
+    with pytest.raises(FileNotFoundError):
+        storage.version(source_key("vid"))
+
+
+def test_list_objects_strips_the_prefix(tmp_path, s3):
+    storage = make_storage(tmp_path, s3)
+    storage.put_file(video_key("vid"), make_file(tmp_path, "upload.mp4", b"video"))
+    storage.put_file(source_key("vid"), make_file(tmp_path, "source.mp4", b"source"))
+
+    assert sorted((obj.key, obj.size) for obj in storage.list_objects("videos/")) == [
+        (video_key("vid"), 5), (source_key("vid"), 6)
+    ]
+    assert list(storage.list_objects("audio/")) == []
+
+
+def test_serve_redirects_to_presigned_url(tmp_path, s3):
+    storage = make_storage(tmp_path, s3)
+    storage.put_file(video_key("vid"), make_file(tmp_path, "upload.mp4", b"video"))
+    app = FastAPI()
+
+    @app.get("/video")
+    async def get_video(request: Request):
+        return storage.serve(request, video_key("vid"), "video/mp4")
+
+    client = TestClient(app)
+    plain = client.get("/video", follow_redirects=False)
+    versioned = client.get("/video", params={"v": storage.version(video_key("vid"))}, follow_redirects=False)
+
+    assert plain.status_code == 307
+    assert plain.headers["cache-control"] == "no-store"
+    assert "media/videos/vid.mp4" in plain.headers["location"]
+    assert "Signature=" in plain.headers["location"]
+    assert "no-cache" in plain.headers["location"]
+    assert "immutable" in versioned.headers["location"]
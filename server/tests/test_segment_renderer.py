@@ -0,0 +1,174 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.profiles import get_render_profile
+from render.segment_renderer import SegmentRenderer, build_chunk_command, build_mux_command
+
+
+class FakeRunner:
+    """Records ffmpeg commands and creates their output file instead of encoding"""
+
+    def __init__(self):
+        self.commands = []
+
+    def __call__(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        with open(cmd[-1], "wb") as output:
+            output.write(b"chunk")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    @property
+    def chunk_commands(self):
+        return [cmd for cmd in self.commands if "concat" not in cmd]
+
+
+def make_segments(factor):
+    return [
+        {"type": "non", "start": 0, "end": 2, "new_duration": 2},
+        {"type": "transcript", "start": 2, "end": 4, "new_duration": 2 * factor, "factor": factor, "audio_index": 0},
+        {"type": "non", "start": 4, "end": 6, "new_duration": 2},
+    ]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.mp4"
+    path.write_bytes(b"source")
+    return str(path)
+
+
+def test_second_render_only_encodes_dirty_segments(tmp_path, source):
+    runner = FakeRunner()
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=runner)
+    output = str(tmp_path / "out.mp4")
+
+    first = renderer.render("vid", source, make_segments(1.5), [], [], output)
+    runner.commands.clear()
+    second = renderer.render("vid", source, make_segments(1.8), [], [], output)
+
+    assert len(first.rendered) == 3
+    assert len(second.rendered) == 1
+    assert len(second.reused) == 2
+    assert len(runner.chunk_commands) == 1
+    assert "setpts=PTS-STARTPTS,setpts=PTS*1.8000" in runner.chunk_commands[0]
+
+
+def test_stale_chunks_are_pruned(tmp_path, source):
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=FakeRunner())
+    output = str(tmp_path / "out.mp4")
+
+    renderer.render("vid", source, make_segments(1.5), [], [], output)
+    stats = renderer.render("vid", source, make_segments(1.8), [], [], output)
+
+    chunk_dir = renderer.chunk_dir("vid", get_render_profile())
+    chunks = sorted(f[:-len(".mp4")] for f in os.listdir(chunk_dir))
+    assert chunks == sorted(segment["chunk_key"] for segment in stats.plan)
+
+
+def test_changed_source_invalidates_chunks(tmp_path, source):
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=FakeRunner())
+    before = renderer.plan_chunks("vid", source, make_segments(1.5))
+
+    with open(source, "ab") as f:
+        f.write(b"more")
+    after = renderer.plan_chunks("vid", source, make_segments(1.5))
+
+    assert all(a["chunk_key"] != b["chunk_key"] for a, b in zip(before, after))
+
+
+def test_mux_command_has_two_inputs_and_stream_copies_video():
+    cmd = build_mux_command("list.txt", "voiceover.pcm", "out.mp4", get_render_profile("archival"))
+
+    assert cmd.count("-i") == 2
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert "-filter_complex" not in cmd
+
+
+def test_render_mixes_voiceover_before_mux(tmp_path, source):
+    runner = FakeRunner()
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=runner)
+
+    renderer.render("vid", source, make_segments(1.5), ["a.mp3", "b.mp3"], [0.0, 2.5], str(tmp_path / "out.mp4"))
+
+    decodes = [cmd for cmd in runner.commands if cmd[-1].endswith(".pcm")]
+    assert [cmd[cmd.index("-i") + 1] for cmd in decodes] == ["a.mp3", "b.mp3"]
+    assert runner.commands[-1].count("-i") == 2
+    assert [f for f in os.listdir(renderer.chunk_dir("vid", get_render_profile())) if not f.endswith(".mp4")] == []
+
+
+def test_profiles_get_separate_chunks(tmp_path, source):
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=FakeRunner())
+    segments = make_segments(1.5)
+
+    preview = renderer.plan_chunks("vid", source, segments, get_render_profile("preview"))
+    archival = renderer.plan_chunks("vid", source, segments, get_render_profile("archival"))
+
+    assert all(p["chunk_key"] != a["chunk_key"] for p, a in zip(preview, archival))
+
+
+def test_preview_render_keeps_full_quality_chunks(tmp_path, source):
+    runner = FakeRunner()
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=runner)
+    output = str(tmp_path / "out.mp4")
+    archival = get_render_profile("archival")
+
+    renderer.render("vid", source, make_segments(1.5), [], [], output, archival)
+    renderer.render("vid", source, make_segments(1.5), [], [], output, get_render_profile("preview"))
+    runner.commands.clear()
+    stats = renderer.render("vid", source, make_segments(1.5), [], [], output, archival)
+
+    assert len(stats.reused) == 3
+    assert runner.chunk_commands == []
+
+
+def test_preview_profile_downscales_fast():
+    cmd = build_chunk_command("in.mp4", make_segments(1.5)[1], "out.mp4", get_render_profile("preview"))
+
+    assert cmd[cmd.index("-preset") + 1] == "ultrafast"
+    assert "scale=-2:'min(480,ih)'" in cmd[cmd.index("-vf") + 1]
+    assert "-threads" in cmd
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+@pytest.mark.parametrize("profile_name", ["preview", "archival"])
+def test_render_with_ffmpeg(tmp_path, profile_name):
+    source = str(tmp_path / "source.mp4")
+    audio = str(tmp_path / "line.mp3")
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25:duration=6",
+                    "-c:v", "libx264", "-preset", "ultrafast", source], check=True, capture_output=True)
+    subprocess.run(["ffmpeg", "-y", "-f", "lavfi", "-i", "sine=duration=3", audio], check=True, capture_output=True)
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"))
+    output = str(tmp_path / "out.mp4")
+
+    renderer.render("vid", source, make_segments(1.5), [audio], [2.0], output, get_render_profile(profile_name))
+
+    assert os.path.getsize(output) > 0
+
+
+def test_progress_covers_only_the_chunks_being_encoded(tmp_path, source):
+    runner = FakeRunner()
+
+    def run(cmd, on_progress=None, **kwargs):
+        if on_progress is not None:
+            # Halfway through the 3.6 s retimed chunk, then done
+            duration = 3.6
+            on_progress({"out_time_us": str(int(duration / 2 * 1e6)), "progress": "continue"})
+            on_progress({"out_time_us": str(int(duration * 1e6)), "progress": "end"})
+        return runner(cmd, **kwargs)
+
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=run)
+    output = str(tmp_path / "out.mp4")
+    renderer.render("vid", source, make_segments(1.5), [], [], output)
+    reported = []
+
+    renderer.render("vid", source, make_segments(1.8), [], [], output, report=reported.append)
+
+    # Only the retimed middle segment is encoded, so it alone spans 0-100%
+    assert reported == pytest.approx([0.5, 1.0])
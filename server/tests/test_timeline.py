@@ -0,0 +1,102 @@
+import os
+import sys
+
+import pytest
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.timeline import parse_timestamp, parse_timestamps, plan_audio_fit, plan_timeline
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("00:07", 7.0),
+    ("01:05", 65.0),
+    ("1:02:03", 3723.0),
+    ("00:01.250", 1.25),
+    ("00:00:01,5", 1.5),
+    ("42", 42.0),
+    (3.0004, 3.0),
+])
+def test_parse_timestamp(value, seconds):
+    assert parse_timestamp(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "ab:cd", "1:2:3:4", "-00:01"])
+def test_parse_timestamp_rejects_garbage(value):
+    with pytest.raises(ValueError):
+        parse_timestamp(value)
+
+
+def test_gaps_keep_speed_and_cues_match_audio():
+    plan = plan_timeline(["00:02", "00:06"], ["00:04", "00:07"], [3.0, 1.5], 10.0)
+
+    assert [(s["type"], s["start"], s["end"]) for s in plan.segments] == [
+        ("non", 0.0, 2.0), ("transcript", 2.0, 4.0), ("non", 4.0, 6.0), ("transcript", 6.0, 7.0), ("non", 7.0, 10.0)
+    ]
+    assert plan.segments[1]["factor"] == pytest.approx(1.5)
+    assert plan.audio_delays == pytest.approx([2.0, 7.0])
+    assert plan.duration == pytest.approx(11.5)
+
+
+def test_unsorted_cues_keep_their_audio_index():
+    plan = plan_timeline(["00:06", "00:02"], ["00:07", "00:04"], [1.5, 3.0], 10.0)
+
+    transcripts = [s for s in plan.segments if s["type"] == "transcript"]
+    assert [s["audio_index"] for s in transcripts] == [1, 0]
+    assert plan.audio_delays == pytest.approx([7.0, 2.0])
+
+
+def test_overlapping_cue_only_retimes_uncovered_footage():
+    plan = plan_timeline([1.0, 2.0, 2.5], [3.0, 4.0, 2.8], [2.0, 2.0, 1.0], 5.0)
+
+    transcripts = [s for s in plan.segments if s["type"] == "transcript"]
+    assert [(s["start"], s["end"], s["audio_index"]) for s in transcripts] == [(1.0, 3.0, 0), (3.0, 4.0, 1)]
+    # The fully covered cue has no footage and speaks where the covering footage ends
+    assert plan.audio_delays == pytest.approx([1.0, 3.0, 5.0])
+
+
+def test_extreme_factors_are_clamped():
+    plan = plan_timeline([0.0, 1.0], [1.0, 5.0], [30.0, 0.1], 5.0, min_factor=0.5, max_factor=4.0)
+
+    assert [s["factor"] for s in plan.segments] == [4.0, 0.5]
+    assert [s["new_duration"] for s in plan.segments] == [4.0, 2.0]
+
+
+def test_cues_past_the_end_are_clipped():
+    plan = plan_timeline(["00:08"], ["00:20"], [2.0], 10.0)
+
+    assert plan.segments[-1]["end"] == 10.0
+    assert plan.duration == pytest.approx(10.0)
+
+
+def test_no_cues_plays_the_whole_video():
+    plan = plan_timeline([], [], [], 10.0)
+
+    assert plan.segments == [{"type": "non", "start": 0.0, "end": 10.0, "new_duration": 10.0}]
+    assert plan.audio_delays == []
+
+
+def test_parse_timestamps_matches_single_parsing():
+    values = ["00:07", "1:02:03", "00:01.250", " 00:00:01,5 ", "42"]
+
+    assert parse_timestamps(values).tolist() == [parse_timestamp(value) for value in values]
+    with pytest.raises(ValueError, match="'1:x'"):
+        parse_timestamps(["00:01", "1:x"])
+
+
+def test_audio_fit_speeds_up_pads_and_bounds_tempo():
+    fit = plan_audio_fit(["00:06", "00:00", "00:03"], ["00:08", "00:02", "00:05"], [2.5, 1.0, 6.0], 10.0,
+                         min_tempo=1.0, max_tempo=1.5)
+
+    assert fit.audio_delays == pytest.approx([6.0, 0.0, 3.0])
+    assert fit.slot_lengths == pytest.approx([2.0, 2.0, 2.0])
+    # 2.5 s into 2 s is sped up; 1 s is padded, not slowed; 6 s hits the bound and is trimmed later
+    assert fit.tempos == pytest.approx([1.25, 1.0, 1.5])
+    assert fit.duration == 10.0
+
+
+def test_audio_fit_slot_ends_at_the_next_cue_and_the_video():
+    fit = plan_audio_fit(["00:01", "00:02", "00:09"], ["00:04", "00:03", "00:15"], [1.0, 1.0, 1.0], 10.0)
+
+    assert fit.slot_lengths == pytest.approx([1.0, 1.0, 1.0])
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+hypothesis = pytest.importorskip("hypothesis")
+from hypothesis import assume, given, settings, strategies as st
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.timeline import plan_timeline
+
+MIN_FACTOR, MAX_FACTOR = 0.5, 4.0
+
+millis = st.integers(min_value=0, max_value=600_000).map(lambda ms: ms / 1000)
+cues = st.lists(st.tuples(millis, millis, st.floats(min_value=0.05, max_value=60)), max_size=60)
+
+
+def plan(cue_list, video_duration):
+    return plan_timeline(
+        [start for start, _, _ in cue_list], [end for _, end, _ in cue_list],
+        [length for _, _, length in cue_list], video_duration,
+        min_factor=MIN_FACTOR, max_factor=MAX_FACTOR
+    )
+
+
+@settings(max_examples=300)
+@given(cues, millis.filter(lambda d: d > 0))
+def test_segments_tile_the_source_once(cue_list, video_duration):
+    segments = plan(cue_list, video_duration).segments
+
+    assert segments[0]["start"] == 0
+    assert segments[-1]["end"] == pytest.approx(video_duration)
+    for previous, current in zip(segments, segments[1:]):
+        assert current["start"] == pytest.approx(previous["end"])
+        assert current["end"] > current["start"]
+
+
+@settings(max_examples=300)
+@given(cues, millis.filter(lambda d: d > 0))
+def test_durations_and_delays_are_consistent(cue_list, video_duration):
+    result = plan(cue_list, video_duration)
+
+    assert sum(s["new_duration"] for s in result.segments) == pytest.approx(result.duration)
+    assert len(result.audio_delays) == len(cue_list)
+    assert all(-1e-9 <= delay <= result.duration + 1e-9 for delay in result.audio_delays)
+    position = 0.0
+    for segment in result.segments:
+        if segment["type"] == "transcript":
+            assert MIN_FACTOR <= segment["factor"] <= MAX_FACTOR
+            assert segment["new_duration"] == pytest.approx((segment["end"] - segment["start"]) * segment["factor"])
+            assert result.audio_delays[segment["audio_index"]] == pytest.approx(position)
+        position += segment["new_duration"]
+
+
+@settings(max_examples=200)
+@given(cues, st.randoms(use_true_random=False))
+def test_cue_order_does_not_change_the_timeline(cue_list, rng):
+    assume(len({start for start, _, _ in cue_list}) == len(cue_list))
+    shuffled = list(range(len(cue_list)))
+    rng.shuffle(shuffled)
+
+    original = plan(cue_list, 600.0)
+    permuted = plan([cue_list[i] for i in shuffled], 600.0)
+
+    strip = [{k: v for k, v in s.items() if k != "audio_index"} for s in permuted.segments]
+    assert strip == [{k: v for k, v in s.items() if k != "audio_index"} for s in original.segments]
+    assert [permuted.audio_delays[j] for j in sorted(range(len(shuffled)), key=shuffled.__getitem__)] == \
+        pytest.approx(original.audio_delays)
@@ -0,0 +1,150 @@
+import os
+import sys
+
+# Add parent directory to Python path to make tts module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.audio_cache import TTSAudioCache
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes, 1152 samples
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+def fake_mp3(frames=50):
+    return MP3_FRAME * frames
+
+
+def test_key_depends_on_every_parameter():
+    base = dict(text="hi", voice_id="v1", model_id="m", output_format="mp3", voice_settings={"stability": 1})
+    key = TTSAudioCache.make_key(**base)
+
+    assert key == TTSAudioCache.make_key(**dict(reversed(list(base.items()))))
+    for name, value in [("text", "hello"), ("voice_id", "v2"), ("model_id", "m2"),
+                        ("output_format", "pcm"), ("voice_settings", {"stability": 0.5})]:
+        assert TTSAudioCache.make_key(**{**base, name: value}) != key
+
+
+def test_hit_skips_synthesis_and_keeps_duration(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path), max_bytes=10 ** 6)
+    calls = []
+
+    def synthesize():
+        calls.append(1)
+        return fake_mp3()
+
+    first = cache.get_or_create("k", synthesize)
+    second = cache.get_or_create("k", synthesize)
+
+    assert len(calls) == 1
+    assert second.path == first.path
+    assert abs(second.duration - 50 * 1152 / 44100) < 0.05
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_index_survives_restart(tmp_path):
+    TTSAudioCache(cache_dir=str(tmp_path)).put("k", fake_mp3())
+
+    reopened = TTSAudioCache(cache_dir=str(tmp_path))
+
+    assert reopened.get("k") is not None
+    assert reopened.stats()["entries"] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    entry_size = len(fake_mp3())
+    cache = TTSAudioCache(cache_dir=str(tmp_path), max_bytes=entry_size * 2)
+    cache.put("a", fake_mp3())
+    cache.put("b", fake_mp3())
+    cache.get("a")
+
+    cache.put("c", fake_mp3())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), "b.mp3"))
+
+
+def test_materialized_file_outlives_eviction(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path / "cache"), max_bytes=len(fake_mp3()))
+    entry = cache.put("a", fake_mp3())
+    dest = str(tmp_path / "audio_a.mp3")
+
+    TTSAudioCache.materialize(entry, dest)
+    cache.put("b", fake_mp3())
+
+    assert cache.get("a") is None
+    assert os.path.getsize(dest) == len(fake_mp3())
+
+
+def test_get_or_create_links_each_entry_before_it_can_be_evicted(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path / "cache"), max_bytes=len(fake_mp3()))
+    dests = [str(tmp_path / f"audio_{key}.mp3") for key in ("a", "b")]
+
+    entries = [cache.get_or_create(key, fake_mp3, dest_path=dest) for key, dest in zip(("a", "b"), dests)]
+
+    assert [entry.path for entry in entries] == dests
+    assert cache.get("a") is None
+    assert all(os.path.getsize(dest) == len(fake_mp3()) for dest in dests)
+
+
+def test_get_or_create_synthesizes_again_if_another_process_evicted_the_entry(tmp_path, monkeypatch):
+    cache = TTSAudioCache(cache_dir=str(tmp_path / "cache"))
+    stale = cache.put("a", fake_mp3())
+    os.remove(stale.path)
+    monkeypatch.setattr(cache, "get", lambda key: stale)
+    calls = []
+    dest = str(tmp_path / "audio_a.mp3")
+
+    entry = cache.get_or_create("a", lambda: calls.append("a") or fake_mp3(), dest_path=dest)
+
+    assert calls == ["a"]
+    assert entry.path == dest
+    assert os.path.getsize(dest) == len(fake_mp3())
+
+
+def test_opened_audio_stays_readable_after_eviction(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path / "cache"), max_bytes=len(fake_mp3()))
+    cache.put("a", fake_mp3())
+
+    with cache.open_audio("a") as audio_file:
+        cache.put("b", fake_mp3())
+        assert cache.get("a") is None
+        assert audio_file.read() == fake_mp3()
+    assert cache.open_audio("a") is None
+
+
+def test_streamed_put_counts_duration_across_chunks(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    audio = fake_mp3()
+
+    entry = cache.put("k", (audio[i:i + 1000] for i in range(0, len(audio), 1000)))
+
+    assert entry.size == len(audio)
+    assert entry.duration == 50 * 1152 / 44100
+    with open(entry.path, "rb") as cached:
+        assert cached.read() == audio
+
+
+def test_stream_into_passes_chunks_through_and_stores_when_done(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    chunks = [MP3_FRAME * 2, MP3_FRAME * 3]
+    stream = cache.stream_into("k", iter(chunks))
+
+    assert next(stream) == chunks[0]
+    assert cache.get("k") is None
+    assert list(stream) == chunks[1:]
+    assert cache.get("k").duration == 5 * 1152 / 44100
+
+
+def test_abandoned_stream_stores_nothing(tmp_path):
+    cache = TTSAudioCache(cache_dir=str(tmp_path))
+    stream = cache.stream_into("k", iter([MP3_FRAME, MP3_FRAME]))
+
+    next(stream)
+    stream.close()
+
+    assert cache.get("k") is None
+    assert os.listdir(str(tmp_path)) == []
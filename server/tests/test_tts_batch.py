@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to Python path to make tts module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.batch import BatchTTSSynthesizer
+
+
+class FakeApiError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeTTSBackend:
+    """Local stand-in for the ElevenLabs client that sleeps to simulate latency"""
+
+    def __init__(self, latency=0.05, fail_texts=(), rate_limited_times=0):
+        self.latency = latency
+        self.fail_texts = set(fail_texts)
+        self.rate_limited_times = rate_limited_times
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def process(self, text):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            rate_limited = self.rate_limited_times > 0
+            if rate_limited:
+                self.rate_limited_times -= 1
+        try:
+            time.sleep(self.latency)
+            if rate_limited:
+                raise FakeApiError(429, {"retry-after": "0.01"})
+            if text in self.fail_texts:
+                raise FakeApiError(400)
+            return f"audio:{text}".encode()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_results_keep_subtitle_order():
+    backend = FakeTTSBackend(latency=0.01)
+    synthesizer = BatchTTSSynthesizer(max_in_flight=4)
+    texts = [f"line {i}" for i in range(20)]
+
+    results = asyncio.run(synthesizer.synthesize_all(backend.process, texts))
+
+    assert [r.index for r in results] == list(range(20))
+    assert [r.value for r in results] == [f"audio:{t}".encode() for t in texts]
+
+
+def test_concurrency_is_bounded_and_faster_than_serial():
+    backend = FakeTTSBackend(latency=0.05)
+    synthesizer = BatchTTSSynthesizer(max_in_flight=4)
+    texts = [f"line {i}" for i in range(16)]
+
+    started = time.monotonic()
+    asyncio.run(synthesizer.synthesize_all(backend.process, texts))
+    elapsed = time.monotonic() - started
+
+    assert backend.max_in_flight == 4
+    assert elapsed < 16 * 0.05 / 2
+
+
+def test_failed_line_does_not_discard_successful_lines():
+    backend = FakeTTSBackend(latency=0.01, fail_texts={"bad"})
+    synthesizer = BatchTTSSynthesizer(max_in_flight=2)
+
+    results = asyncio.run(synthesizer.synthesize_all(backend.process, ["one", "bad", "three"]))
+
+    assert [r.ok for r in results] == [True, False, True]
+    assert results[1].error.status_code == 400
+    assert results[1].attempts == 1
+    assert results[2].value == b"audio:three"
+
+
+def test_rate_limited_calls_are_retried():
+    backend = FakeTTSBackend(latency=0.01, rate_limited_times=2)
+    synthesizer = BatchTTSSynthesizer(max_in_flight=1, max_retries=3)
+
+    results = asyncio.run(synthesizer.synthesize_all(backend.process, ["hello"]))
+
+    assert results[0].ok
+    assert results[0].attempts == 3
+    assert backend.calls == 3
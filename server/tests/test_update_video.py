@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+
+# Add parent directory to Python path to make pipeline module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import update_video
+from render.profiles import get_render_profile
+from render.segment_renderer import SegmentRenderer
+from render.timeline import plan_audio_fit
+from repositories import video_repository
+from storage.local_media_storage import LocalMediaStorage
+from storage.media_storage import preview_key, source_key, video_key
+
+
+class FakeRunner:
+    """Creates each ffmpeg output file instead of encoding"""
+
+    def __call__(self, cmd, **kwargs):
+        with open(cmd[-1], "wb") as output:
+            output.write(b"rendered")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+SEGMENTS = [
+    {"type": "non", "start": 0, "end": 2, "new_duration": 2},
+    {"type": "transcript", "start": 2, "end": 4, "new_duration": 3, "factor": 1.5, "audio_index": 0},
+]
+
+
+def setup_video(tmp_path, monkeypatch):
+    storage = LocalMediaStorage(root=str(tmp_path / "static"), scratch_dir=str(tmp_path / "scratch"))
+    os.makedirs(tmp_path / "static" / "videos")
+    with open(storage.path(source_key("vid")), "wb") as source:
+        source.write(b"source")
+    with open(storage.path(video_key("vid")), "wb") as video:
+        video.write(b"original")
+    audio = tmp_path / "line.mp3"
+    audio.write_bytes(b"audio")
+    saved = {}
+    monkeypatch.setattr(video_repository, "save_render_plan", lambda video_id, plan: saved.update({video_id: plan}))
+    return storage, str(audio), saved
+
+
+def test_preview_leaves_current_video_in_place(tmp_path, monkeypatch):
+    storage, audio, saved = setup_video(tmp_path, monkeypatch)
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=FakeRunner())
+
+    update_video.render_and_replace(
+        renderer, storage, "vid", SEGMENTS, [audio], [2.0], preview_key("vid"), get_render_profile("preview")
+    )
+
+    assert storage.exists(preview_key("vid"))
+    with open(storage.path(video_key("vid")), "rb") as video:
+        assert video.read() == b"original"
+    assert os.path.exists(audio)
+    assert saved == {}
+
+
+def test_full_render_replaces_video_and_retires_preview(tmp_path, monkeypatch):
+    storage, audio, saved = setup_video(tmp_path, monkeypatch)
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"), run=FakeRunner())
+    update_video.render_and_replace(
+        renderer, storage, "vid", SEGMENTS, [audio], [2.0], preview_key("vid"), get_render_profile("preview")
+    )
+
+    stats = update_video.run_full_render(
+        renderer, storage, "vid", SEGMENTS, [audio], [2.0], get_render_profile("archival")
+    )
+
+    assert len(stats.rendered) == 2
+    assert not storage.exists(preview_key("vid"))
+    assert not os.path.exists(audio)
+    assert saved["vid"]["profile"] == "archival"
+    assert [name for name in os.listdir(tmp_path / "static" / "videos") if ".tmp." in name] == []
+
+
+def test_audio_fit_remuxes_without_encoding(tmp_path, monkeypatch):
+    storage, audio, saved = setup_video(tmp_path, monkeypatch)
+    runner = FakeRunner()
+    commands = []
+    renderer = SegmentRenderer(cache_root=str(tmp_path / "segments"),
+                               run=lambda cmd, **kwargs: commands.append(cmd) or runner(cmd, **kwargs))
+    fit = plan_audio_fit(["00:02"], ["00:04"], [3.0], 10.0)
+
+    stats = update_video.run_audio_fit_render(
+        renderer, storage, "vid", [audio], fit, get_render_profile("archival")
+    )
+
+    assert stats.rendered == []
+    assert [cmd[cmd.index("-c:v") + 1] for cmd in commands if "-c:v" in cmd] == ["copy"]
+    assert commands[-1][commands[-1].index("-i") + 1] == storage.path(source_key("vid"))
+    with open(storage.path(video_key("vid")), "rb") as video:
+        assert video.read() == b"rendered"
+    assert not os.path.exists(audio)
+    assert saved["vid"]["fit_mode"] == "audio"
+    assert saved["vid"]["tempos"] == [1.5]
@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+import threading
+
+import pytest
+from fastapi import UploadFile
+
+# Add parent directory to Python path to make utils module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.uploads import UploadTooLargeError, save_upload
+
+
+class RecordingFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.read_sizes = []
+        self.read_threads = set()
+
+    def read(self, size=-1):
+        self.read_sizes.append(size)
+        self.read_threads.add(threading.get_ident())
+        return super().read(size)
+
+
+def test_upload_is_streamed_in_chunks_and_hashed(tmp_path):
+    data = os.urandom(10 * 1024 + 5)
+    source = RecordingFile(data)
+    upload = UploadFile(file=source, filename="../clip.mov")
+
+    stored = asyncio.run(save_upload(upload, upload_dir=str(tmp_path), chunk_size=1024))
+
+    assert stored.size == len(data)
+    assert stored.sha256 == hashlib.sha256(data).hexdigest()
+    assert os.path.dirname(stored.path) == str(tmp_path)
+    assert stored.path.endswith("_clip.mov")
+    with open(stored.path, "rb") as f:
+        assert f.read() == data
+    assert set(source.read_sizes) == {1024}
+    assert threading.get_ident() not in source.read_threads
+
+
+def test_oversized_upload_is_rejected_and_removed(tmp_path):
+    upload = UploadFile(file=io.BytesIO(b"x" * 4096), filename="big.mp4")
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(upload, upload_dir=str(tmp_path), max_bytes=1000, chunk_size=512))
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,122 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import pytest
+
+# Add parent directory to Python path to make repositories module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories import video_repository
+from utils.db import get_db_cursor
+
+TEST_VIDEO_IDS = ["test-repo-a", "test-repo-b"]
+
+
+@pytest.fixture
+def clean_videos():
+    try:
+        with get_db_cursor() as cursor:
+            cursor.execute("DELETE FROM videos WHERE video_id = ANY(%s)", (TEST_VIDEO_IDS,))
+    except psycopg2.Error as e:
+        pytest.skip(f"Postgres with migrations not available: {e}")
+    yield
+    with get_db_cursor() as cursor:
+        cursor.execute("DELETE FROM videos WHERE video_id = ANY(%s)", (TEST_VIDEO_IDS,))
+
+
+def test_upsert_creates_then_replaces(clean_videos):
+    video_repository.upsert_transcripts("test-repo-a", [{"text": "one"}])
+    video_repository.upsert_transcripts("test-repo-a", [{"text": "two"}])
+
+    assert video_repository.get_video("test-repo-a")["transcripts"] == [{"text": "two"}]
+
+
+def test_concurrent_upserts_do_not_race(clean_videos):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(
+            lambda i: video_repository.upsert_transcripts("test-repo-a", [{"text": str(i)}]), range(32)
+        ))
+
+    assert video_repository.get_video("test-repo-a") is not None
+
+
+def test_get_many_skips_missing(clean_videos):
+    video_repository.ensure_video("test-repo-a")
+    video_repository.ensure_video("test-repo-b")
+
+    videos = video_repository.get_videos(TEST_VIDEO_IDS + ["test-repo-missing"])
+
+    assert sorted(videos) == TEST_VIDEO_IDS
+
+
+def test_patch_merges_fields_into_single_cues(clean_videos):
+    video_repository.upsert_transcripts("test-repo-a", [
+        {"start": "00:00", "end": "00:02", "text": "one"},
+        {"start": "00:02", "end": "00:04", "text": "two"},
+    ])
+
+    patched = video_repository.patch_transcripts("test-repo-a", {-1: {"text": "nope"}, 1: {"text": "TWO"}, 5: {"text": "nope"}})
+
+    assert patched == {"applied": [1], "version": 2}
+    assert video_repository.get_video("test-repo-a")["transcripts"] == [
+        {"start": "00:00", "end": "00:02", "text": "one"},
+        {"start": "00:02", "end": "00:04", "text": "TWO"},
+    ]
+
+
+def test_media_info_round_trips(clean_videos):
+    video_repository.upsert_transcripts("test-repo-a", [])
+    video_repository.save_media_info("test-repo-a", {"duration": 12.5, "width": 1280, "height": 720})
+
+    assert video_repository.get_video("test-repo-a")["media_info"]["duration"] == 12.5
+    assert video_repository.get_video("test-repo-a")["transcripts"] == []
+
+
+def test_render_generations_increase(clean_videos):
+    assert video_repository.get_render_generation("test-repo-a") == 0
+
+    first = video_repository.next_render_generation("test-repo-a")
+    second = video_repository.next_render_generation("test-repo-a")
+
+    assert second == first + 1
+    assert video_repository.get_render_generation("test-repo-a") == second
+
+
+def test_versions_only_advance_on_change(clean_videos):
+    cues = [{"start": "00:00", "end": "00:02", "text": "one"}, {"start": "00:02", "end": "00:04", "text": "two"}]
+
+    assert video_repository.upsert_transcripts("test-repo-a", cues) == 1
+    assert video_repository.upsert_transcripts("test-repo-a", cues) == 1
+    assert video_repository.patch_transcripts("test-repo-a", {0: {"text": "one"}}) == {"applied": [], "version": 1}
+    assert video_repository.upsert_transcripts("test-repo-a", cues + [{"text": "three"}]) == 2
+    assert video_repository.get_video("test-repo-a")["transcript_version"] == 2
+
+
+def test_changed_cues_between_versions(clean_videos):
+    video_repository.upsert_transcripts("test-repo-a", [{"text": "one"}, {"text": "two"}, {"text": "three"}])
+    video_repository.patch_transcripts("test-repo-a", {1: {"text": "TWO"}})
+    video_repository.upsert_transcripts("test-repo-a", [{"text": "one"}, {"text": "TWO"}])
+
+    assert video_repository.changed_cues("test-repo-a", 1, 2) == [1]
+    assert video_repository.changed_cues("test-repo-a", 2) == [2]
+    assert video_repository.changed_cues("test-repo-a", 0) == [0, 1]
+    assert video_repository.changed_cues("test-repo-a", 7) is None
+
+
+def test_patch_against_a_stale_version_is_rejected(clean_videos):
+    video_repository.upsert_transcripts("test-repo-a", [{"text": "one"}])
+    video_repository.patch_transcripts("test-repo-a", {0: {"text": "ONE"}}, expected_version=1)
+
+    with pytest.raises(video_repository.TranscriptVersionConflict) as conflict:
+        video_repository.patch_transcripts("test-repo-a", {0: {"text": "uno"}}, expected_version=1)
+
+    assert conflict.value.current == 2
+    assert video_repository.get_video("test-repo-a")["transcripts"] == [{"text": "ONE"}]
+
+
+def test_diff_cue_hashes():
+    assert video_repository.diff_cue_hashes(["a", "b", "c"], ["a", "x", "c", "d"]) == [1, 3]
+    assert video_repository.diff_cue_hashes(["a", "b"], ["a"]) == [1]
+    assert video_repository.diff_cue_hashes([], []) == []
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# Add parent directory to Python path to make render module importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render.voiceover import CHANNELS, SAMPLE_RATE, atempo_filter, build_decode_command, build_voiceover_track
+
+
+class FakeDecoder:
+    """Stands in for ffmpeg: 'decodes' each named cue to a constant-valued PCM clip"""
+
+    def __init__(self, clips):
+        self.clips = clips
+
+    def __call__(self, cmd, **kwargs):
+        value, seconds = self.clips[cmd[cmd.index("-i") + 1]]
+        samples = np.full(int(seconds * SAMPLE_RATE) * CHANNELS, value, dtype="<i2")
+        with open(cmd[-1], "wb") as pcm:
+            pcm.write(samples.tobytes())
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+
+def read_track(path):
+    return np.fromfile(path, dtype="<i2").reshape(-1, CHANNELS)
+
+
+def test_cues_land_at_their_delays_with_silence_between(tmp_path):
+    track = str(tmp_path / "track.pcm")
+    decoder = FakeDecoder({"a.mp3": (100, 1.0), "b.mp3": (200, 0.5)})
+
+    build_voiceover_track(["a.mp3", "b.mp3"], [0.5, 2.0], track, run=decoder)
+
+    samples = read_track(track)
+    assert len(samples) == int(2.5 * SAMPLE_RATE)
+    assert (samples[:SAMPLE_RATE // 2] == 0).all()
+    assert (samples[SAMPLE_RATE // 2:int(1.5 * SAMPLE_RATE)] == 100).all()
+    assert (samples[int(1.5 * SAMPLE_RATE):2 * SAMPLE_RATE] == 0).all()
+    assert (samples[2 * SAMPLE_RATE:] == 200).all()
+    assert os.listdir(tmp_path) == ["track.pcm"]
+
+
+def test_overlapping_cues_are_summed_and_clipped(tmp_path):
+    track = str(tmp_path / "track.pcm")
+    decoder = FakeDecoder({"a.mp3": (30000, 1.0), "b.mp3": (5000, 1.0)})
+
+    build_voiceover_track(["a.mp3", "b.mp3"], [0.0, 0.5], track, run=decoder)
+
+    samples = read_track(track)
+    assert samples[SAMPLE_RATE // 4, 0] == 30000
+    assert samples[3 * SAMPLE_RATE // 4, 0] == 32767
+    assert samples[5 * SAMPLE_RATE // 4, 0] == 5000
+
+
+def test_large_tempo_changes_are_chained():
+    assert atempo_filter(1.25) == "atempo=1.2500"
+    assert atempo_filter(3.0) == "atempo=2.0000,atempo=1.5000"
+    assert atempo_filter(0.4) == "atempo=0.5000,atempo=0.8000"
+
+
+def test_fitted_cue_is_sped_up_and_cut_at_its_slot():
+    cmd = build_decode_command("a.mp3", "a.pcm", tempo=1.5, max_seconds=2.0)
+
+    assert cmd[cmd.index("-af") + 1] == "atempo=1.5000,afade=t=out:st=1.950:d=0.05"
+    assert cmd[cmd.index("-t") + 1] == "2.000"
+    assert "-af" not in build_decode_command("a.mp3", "a.pcm")
+
+
+def test_cue_without_a_slot_is_left_out(tmp_path):
+    track = str(tmp_path / "track.pcm")
+    decoder = FakeDecoder({"a.mp3": (100, 1.0)})
+
+    build_voiceover_track(["a.mp3", "b.mp3"], [0.0, 1.0], track, run=decoder, tempos=[1.0, 1.0],
+                          slot_lengths=[1.0, 0.0])
+
+    assert len(read_track(track)) == SAMPLE_RATE
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import BinaryIO, Callable, Dict, Generator, Iterable, Optional, Union
+
+from tts.mp3_duration import MP3DurationCounter
+from utils.metrics import TTS_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAudio:
+    key: str
+    path: str
+    duration: float
+    size: int
+
+
+class TTSAudioCache:
+    """Content-addressed on-disk cache of synthesized MP3s.
+
+    Each entry is ``{key}.mp3`` plus a ``{key}.json`` sidecar holding the
+    duration, so cache hits never need to parse the MP3 again. The sidecar
+    mtime is bumped on every hit and is used to rebuild LRU order on start-up.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.environ.get("TTS_CACHE_DIR", "static/tts_cache/")
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get("TTS_CACHE_MAX_BYTES", str(2 * 1024 ** 3))
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedAudio]" = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(**params) -> str:
+        payload = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAudio]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                # Another worker process sharing the directory may have written it
+                entry = self._read_entry(key)
+                if entry is not None:
+                    self._entries[key] = entry
+                    self._total_bytes += entry.size
+            if entry is None or not os.path.exists(entry.path):
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                TTS_CACHE_LOOKUPS.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        TTS_CACHE_LOOKUPS.labels(result="hit").inc()
+        self._touch(key)
+        return entry
+
+    def open_audio(self, key: str) -> Optional[BinaryIO]:
+        """Open the cached MP3 for reading, or return None on a miss.
+
+        Unlike a path, an open file stays readable if the entry is evicted
+        before the caller is done with it.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            try:
+                return open(entry.path, "rb")
+            except FileNotFoundError:
+                # Evicted since the lookup, possibly by another process sharing the directory
+                return None
+
+    def put(self, key: str, audio: Union[bytes, Iterable[bytes]]) -> CachedAudio:
+        """Store the MP3 given as bytes or as an iterator of chunks, which is written as it arrives"""
+        stream = self.stream_into(key, [audio] if isinstance(audio, bytes) else audio)
+        try:
+            while True:
+                next(stream)
+        except StopIteration as done:
+            return done.value
+
+    def stream_into(self, key: str, chunks: Iterable[bytes]) -> Generator[bytes, None, CachedAudio]:
+        """Pass ``chunks`` through while writing them to the cache.
+
+        The duration is counted from the MP3 frame headers on the way, so the
+        file is never read back. The entry only becomes visible once the last
+        chunk is through; if the stream fails or is abandoned, nothing is stored.
+        """
+        audio_path = self._audio_path(key)
+        tmp_path = f"{audio_path}.{uuid.uuid4().hex}.tmp"
+        counter = MP3DurationCounter()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as audio_file:
+                for chunk in chunks:
+                    audio_file.write(chunk)
+                    counter.feed(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, audio_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with open(self._meta_path(key), "w") as meta_file:
+            json.dump({"duration": counter.duration, "size": size}, meta_file)
+
+        entry = CachedAudio(key=key, path=audio_path, duration=counter.duration, size=size)
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key].size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self._evict()
+        return entry
+
+    def get_or_create(self, key: str, synthesize: Callable[[], Union[bytes, Iterable[bytes]]],
+                      dest_path: Optional[str] = None) -> CachedAudio:
+        """Return the entry for ``key``, calling ``synthesize`` on a miss.
+
+        With ``dest_path`` the MP3 is also materialized there and the returned
+        entry points at it. Linking happens under the cache lock, so this
+        process cannot evict the entry first; if another process sharing the
+        directory did, the audio is synthesized again.
+        """
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, synthesize())
+        if dest_path is None:
+            return entry
+        try:
+            return self._materialize_entry(entry, dest_path)
+        except FileNotFoundError:
+            logger.info(f"TTS cache entry {key} was evicted before use, synthesizing it again")
+            return self._materialize_entry(self.put(key, synthesize()), dest_path)
+
+    @staticmethod
+    def materialize(entry: CachedAudio, dest_path: str) -> str:
+        """Expose a cached MP3 at ``dest_path`` without copying when possible.
+
+        A hard link keeps the data alive even if the cache evicts the entry
+        while the caller is still using the file.
+        """
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        try:
+            os.link(entry.path, dest_path)
+        except OSError:
+            shutil.copyfile(entry.path, dest_path)
+        return dest_path
+
+    def _materialize_entry(self, entry: CachedAudio, dest_path: str) -> CachedAudio:
+        with self._lock:
+            self.materialize(entry, dest_path)
+        return replace(entry, path=dest_path)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _audio_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _touch(self, key: str):
+        try:
+            os.utime(self._meta_path(key))
+        except OSError:
+            pass
+
+    def _forget(self, key: str):
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+
+    def _evict(self):
+        # Caller holds self._lock. The newest entry is never evicted.
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self._total_bytes -= entry.size
+            self.evictions += 1
+            for path in (entry.path, self._meta_path(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            logger.debug(f"Evicted TTS cache entry {key}")
+
+    def _read_entry(self, key: str) -> Optional[CachedAudio]:
+        audio_path = self._audio_path(key)
+        if not os.path.exists(audio_path):
+            return None
+        try:
+            with open(self._meta_path(key)) as meta_file:
+                meta = json.load(meta_file)
+            return CachedAudio(key=key, path=audio_path, duration=meta["duration"], size=meta["size"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable TTS cache entry {key}: {e}")
+            return None
+
+    def _load_index(self):
+        found = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            key = filename[:-len(".json")]
+            entry = self._read_entry(key)
+            if entry is not None:
+                found.append((os.path.getmtime(self._meta_path(key)), entry))
+
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self._total_bytes += entry.size
+        with self._lock:
+            self._evict()
+        logger.info(f"Loaded {len(self._entries)} TTS cache entries ({self._total_bytes} bytes)")
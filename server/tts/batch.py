@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_STATUS_CODES = {429}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class SynthesisResult:
+    index: int
+    text: str
+    value: Any = None
+    error: Optional[Exception] = None
+    attempts: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchTTSSynthesizer:
+    """Runs a blocking TTS call for many lines on a bounded thread pool.
+
+    The pool size is the per-node max-in-flight limit. When the backend answers
+    with a rate limit, every worker waits out a shared cooldown before sending
+    its next request instead of hammering the API.
+    """
+
+    def __init__(
+            self,
+            max_in_flight: Optional[int] = None,
+            max_retries: Optional[int] = None,
+            base_delay: float = 0.5,
+            max_delay: float = 8.0,
+    ):
+        self.max_in_flight = max_in_flight or int(os.environ.get("TTS_MAX_IN_FLIGHT", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("TTS_MAX_RETRIES", "3"))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="tts")
+        self._cooldown_lock = threading.Lock()
+        self._cooldown_until = 0.0
+
+    async def synthesize_all(self, synthesize: Callable[[str], Any], texts: Sequence[str]) -> List[SynthesisResult]:
+        """Synthesize every text concurrently; results come back in input order.
+
+        A failing line is reported through its own ``SynthesisResult.error`` and
+        never cancels the lines that succeed.
+        """
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(self._executor, self._run_one, synthesize, index, text)
+            for index, text in enumerate(texts)
+        ]
+        return list(await asyncio.gather(*futures))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _run_one(self, synthesize: Callable[[str], Any], index: int, text: str) -> SynthesisResult:
+        attempt = 0
+        while True:
+            attempt += 1
+            self._wait_for_cooldown()
+            try:
+                return SynthesisResult(index=index, text=text, value=synthesize(text), attempts=attempt)
+            except Exception as e:
+                status_code = _status_code(e)
+                if status_code not in RETRYABLE_STATUS_CODES or attempt > self.max_retries:
+                    logger.error(f"TTS failed for line {index} after {attempt} attempt(s): {e}")
+                    return SynthesisResult(index=index, text=text, error=e, attempts=attempt)
+
+                delay = self._backoff_delay(attempt, e)
+                if status_code in RATE_LIMIT_STATUS_CODES:
+                    self._start_cooldown(delay)
+                logger.warning(f"TTS line {index} got status {status_code}, retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _backoff_delay(self, attempt: int, error: Exception) -> float:
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _start_cooldown(self, delay: float):
+        with self._cooldown_lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    def _wait_for_cooldown(self):
+        with self._cooldown_lock:
+            remaining = self._cooldown_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
@@ -3,7 +3,11 @@ import typing
 
 from elevenlabs import ElevenLabs, VoiceSettings
 
+from tts.audio_cache import TTSAudioCache
 from tts.tts_processor import TTSProcessor
+from utils.metrics import TTS_CHARACTERS, timed_stage
+
+DEFAULT_VOICE_ID = "AZnzlk1XvdvUeBnXmlld"
 
 
 class ElevenLabsTTSProcessor(TTSProcessor):
@@ -11,24 +15,47 @@ class ElevenLabsTTSProcessor(TTSProcessor):
         self.client = ElevenLabs(
             api_key=os.environ.get("ELEVENLABS_API_KEY")
         )
+        self.model_id = "eleven_multilingual_v2"
+        self.output_format = "mp3_44100_192"
+        self.voice_settings = VoiceSettings(
+            stability=1,
+            style=0.1,
+            similarity_boost=0.8
+        )
+
+    def process(self, text: str, voice_id: str = DEFAULT_VOICE_ID) -> bytes:
+        return b''.join(self.stream(text, voice_id=voice_id))
+
+    def stream(self, text: str, voice_id: str = DEFAULT_VOICE_ID) -> typing.Iterator[bytes]:
+        """MP3 chunks as ElevenLabs produces them, from the streaming endpoint"""
+        TTS_CHARACTERS.inc(len(text))
+        audio = self.client.text_to_speech.convert_as_stream(
+            voice_id,
+            text=text,
+            model_id=self.model_id,
+            output_format=self.output_format,
+            voice_settings=self.voice_settings
+        )
+        if isinstance(audio, bytes):
+            audio = [audio]
+        return self._timed(audio, len(text))
+
+    @staticmethod
+    def _timed(audio: typing.Iterable[bytes], characters: int) -> typing.Iterator[bytes]:
+        # Timed until the last chunk is through. The span is not made current: consumers such as
+        # /text-to-speech resume the stream on whichever threadpool thread is free.
+        with timed_stage("tts.synthesize", current=False, characters=characters):
+            yield from audio
 
-    def process(self, text: str, voice_id: str = "AZnzlk1XvdvUeBnXmlld") -> bytes:
-        audio = self.client.text_to_speech.convert(
+    def cache_key(self, text: str, voice_id: str = DEFAULT_VOICE_ID) -> str:
+        return TTSAudioCache.make_key(
             text=text,
             voice_id=voice_id,
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_192",
-            voice_settings=VoiceSettings(
-                stability=1,
-                style=0.1,
-                similarity_boost=0.8
-            )
+            model_id=self.model_id,
+            output_format=self.output_format,
+            voice_settings=self.voice_settings.model_dump()
         )
-        # Convert iterator to bytes if needed
-        if isinstance(audio, typing.Iterator):
-            return b''.join(audio)
-        return audio
 
     def get_models(self) -> typing.List[typing.Dict[str, str]]:
         voices = self.client.voices.get_all()
-        return [{"name": voice.name, "id": voice.voice_id} for voice in voices]
\ No newline at end of file
+        return [{"name": voice.name, "id": voice.voice_id} for voice in voices]
@@ -0,0 +1,67 @@
+import os
+import random
+import time
+import typing
+
+from tts.audio_cache import TTSAudioCache
+from tts.tts_processor import TTSProcessor
+from utils.metrics import TTS_CHARACTERS, timed_stage
+
+# Silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, 417 bytes, 1152 samples
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+FRAME_SECONDS = 1152 / 44100
+# Frames per streamed chunk, about half a second of audio
+CHUNK_FRAMES = 19
+
+
+class FakeTTSProcessor(TTSProcessor):
+    """Offline stand-in for ElevenLabs with configurable latency, for load tests and benchmarks.
+
+    Streams silent MP3 whose length follows the text at ``chars_per_second``.
+    The first chunk arrives after ``first_byte_seconds`` and the rest at
+    ``realtime_factor`` times the speed of playback, each delay scaled by a
+    random factor within ``jitter``.
+    """
+
+    def __init__(self, first_byte_seconds: typing.Optional[float] = None,
+                 realtime_factor: typing.Optional[float] = None, chars_per_second: typing.Optional[float] = None,
+                 jitter: typing.Optional[float] = None, seed: typing.Optional[int] = None):
+        self.first_byte_seconds = first_byte_seconds if first_byte_seconds is not None else float(
+            os.environ.get("FAKE_TTS_FIRST_BYTE_SECONDS", "0.3")
+        )
+        self.realtime_factor = realtime_factor if realtime_factor is not None else float(
+            os.environ.get("FAKE_TTS_REALTIME_FACTOR", "0.1")
+        )
+        self.chars_per_second = chars_per_second or float(os.environ.get("FAKE_TTS_CHARS_PER_SECOND", "15"))
+        self.jitter = jitter if jitter is not None else float(os.environ.get("FAKE_LATENCY_JITTER", "0.2"))
+        self._rng = random.Random(seed)
+
+    def process(self, text: str, voice_id: str = "fake") -> bytes:
+        return b''.join(self.stream(text, voice_id=voice_id))
+
+    def stream(self, text: str, voice_id: str = "fake") -> typing.Iterator[bytes]:
+        TTS_CHARACTERS.inc(len(text))
+        frames = max(1, round(len(text) / self.chars_per_second / FRAME_SECONDS))
+        delays = [self._jittered(self.first_byte_seconds)] + [
+            self._jittered(CHUNK_FRAMES * FRAME_SECONDS * self.realtime_factor)
+            for _ in range(CHUNK_FRAMES, frames, CHUNK_FRAMES)
+        ]
+        return self._stream(frames, delays, len(text))
+
+    def cache_key(self, text: str, voice_id: str = "fake") -> str:
+        return TTSAudioCache.make_key(
+            text=text, voice_id=voice_id, model_id="fake", chars_per_second=self.chars_per_second
+        )
+
+    def get_models(self) -> typing.List[typing.Dict[str, str]]:
+        return [{"name": "Fake", "id": "fake"}]
+
+    def _jittered(self, mean: float) -> float:
+        return max(0.0, mean * self._rng.uniform(1 - self.jitter, 1 + self.jitter))
+
+    @staticmethod
+    def _stream(frames: int, delays: typing.List[float], characters: int) -> typing.Iterator[bytes]:
+        with timed_stage("tts.synthesize", current=False, characters=characters):
+            for index, delay in enumerate(delays):
+                time.sleep(delay)
+                yield MP3_FRAME * min(CHUNK_FRAMES, frames - index * CHUNK_FRAMES)
@@ -0,0 +1,106 @@
+from typing import Optional, Tuple
+
+# Bitrates in kbps by [MPEG-1][layer], index 0 ("free") and 15 (invalid) excluded by the parser
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates by the header's version bits: 0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+_HEADER_BYTES = 4
+# Enough of the first frame to find a Xing/Info tag, which sits after the side information
+_TAG_LOOKAHEAD = 40
+
+
+def parse_frame_header(header: bytes) -> Optional[Tuple[int, int, int]]:
+    """``(frame_length, samples, sample_rate)`` for a valid MPEG audio frame header, else None"""
+    b1, b2 = header[1], header[2]
+    if header[0] != 0xFF or b1 & 0xE0 != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if mpeg1 or layer == 2 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+class MP3DurationCounter:
+    """Computes an MP3's duration from its frame headers while the bytes stream past.
+
+    Only headers are parsed: the counter jumps from one header to the next,
+    so it never holds more than a few bytes of audio. A leading ID3v2 tag is
+    skipped, as is a Xing/Info frame, which carries no audio.
+    """
+
+    def __init__(self):
+        self.frames = 0
+        self.samples = 0
+        self.sample_rate = 0
+        self._buffer = b""
+        self._skip = 0
+        self._checked_id3 = False
+        self._first_frame = True
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate if self.sample_rate else 0.0
+
+    def feed(self, chunk: bytes):
+        if self._skip:
+            skipped = min(self._skip, len(chunk))
+            self._skip -= skipped
+            chunk = chunk[skipped:]
+        data = self._buffer + chunk if self._buffer else chunk
+        position = 0
+        end = len(data)
+        while True:
+            if not self._checked_id3:
+                if end - position < 10:
+                    break
+                self._checked_id3 = True
+                if data[position:position + 3] == b"ID3":
+                    size = 0
+                    for byte in data[position + 6:position + 10]:
+                        size = (size << 7) | (byte & 0x7F)
+                    footer = 10 if data[position + 5] & 0x10 else 0
+                    position += 10 + size + footer
+                    if position > end:
+                        break
+                continue
+            lookahead = _TAG_LOOKAHEAD if self._first_frame else _HEADER_BYTES
+            if end - position < lookahead:
+                break
+            header = parse_frame_header(data[position:position + _HEADER_BYTES])
+            if header is None:
+                # Not a frame boundary (junk or a trailing ID3v1 tag): resynchronize byte by byte
+                position += 1
+                continue
+            frame_length, samples, sample_rate = header
+            tag_area = data[position + _HEADER_BYTES:position + _TAG_LOOKAHEAD]
+            if not (self._first_frame and (b"Xing" in tag_area or b"Info" in tag_area)):
+                self.frames += 1
+                self.samples += samples
+                self.sample_rate = sample_rate
+            self._first_frame = False
+            position += frame_length
+            if position > end:
+                break
+        if position > end:
+            self._skip = position - end
+            self._buffer = b""
+        else:
+            self._buffer = data[position:]
@@ -1,3 +1,4 @@
+import os
 from abc import ABC, abstractmethod
 
 
@@ -6,3 +7,15 @@ class TTSProcessor(ABC):
     @abstractmethod
     def process(self, text: str) -> str:
         pass
+
+
+def create_tts_processor() -> TTSProcessor:
+    """Text-to-speech backend selected by TTS_BACKEND ("elevenlabs" or "fake")"""
+    backend = os.environ.get("TTS_BACKEND", "elevenlabs")
+    if backend == "elevenlabs":
+        from tts.elevenlabs_tts_processor import ElevenLabsTTSProcessor
+        return ElevenLabsTTSProcessor()
+    if backend == "fake":
+        from tts.fake_tts_processor import FakeTTSProcessor
+        return FakeTTSProcessor()
+    raise ValueError(f"Unknown TTS_BACKEND '{backend}', expected 'elevenlabs' or 'fake'")
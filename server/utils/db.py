@@ -1,7 +1,22 @@
+import asyncio
+import json
+import logging
 import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import asyncpg
 import psycopg2
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import connection as PGConnection
 from psycopg2.extras import RealDictCursor
-from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Fixed queries registered by the repositories, prepared server-side once per pooled connection on first use
+PREPARED_STATEMENTS = {}
+
 
 def get_db_config():
     return {
@@ -12,14 +27,123 @@ def get_db_config():
         "port": os.environ.get("POSTGRES_PORT", "5432"),
     }
 
+
+def get_pool_config():
+    return {
+        "min_size": int(os.environ.get("DB_POOL_MIN", "1")),
+        "max_size": int(os.environ.get("DB_POOL_MAX", "10")),
+        "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        "health_check_interval": float(os.environ.get("DB_HEALTH_CHECK_INTERVAL", "30")),
+    }
+
+
+class PooledConnection(PGConnection):
+    """psycopg2 connection that remembers its prepared statements and last use"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """Thread-safe blocking pool with min/max sizes and health checks on checkout.
+
+    psycopg2's ThreadedConnectionPool raises as soon as it is exhausted; this
+    wrapper makes callers wait up to ``timeout`` seconds for a free connection
+    instead. A connection idle for longer than ``health_check_interval`` is
+    pinged with ``SELECT 1`` before being handed out and replaced if dead.
+    """
+
+    def __init__(self, min_size: int, max_size: int, timeout: float, health_check_interval: float):
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._pool = pg_pool.ThreadedConnectionPool(
+            min_size, max_size,
+            **get_db_config(),
+            cursor_factory=RealDictCursor,
+            connection_factory=PooledConnection
+        )
+
+    def getconn(self) -> PooledConnection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pg_pool.PoolError(f"No database connection available after {self.timeout}s")
+        try:
+            while True:
+                conn = self._pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                logger.warning("Discarding broken pooled database connection")
+                self._pool.putconn(conn, close=True)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn: PooledConnection, broken: bool = False):
+        try:
+            conn.last_used = time.monotonic()
+            self._pool.putconn(conn, close=broken or conn.closed != 0)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        self._pool.closeall()
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return this process's pool, creating it on first use (and again after a fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(**get_pool_config())
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
+
 @contextmanager
 def get_db_connection():
     """Context manager for database connections"""
-    conn = psycopg2.connect(**get_db_config(), cursor_factory=RealDictCursor)
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
     try:
         yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
     finally:
-        conn.close()
+        if not broken and not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+            conn.rollback()
+        pool.putconn(conn, broken=broken)
+
 
 @contextmanager
 def get_db_cursor():
@@ -34,3 +158,107 @@ def get_db_cursor():
             raise
         finally:
             cursor.close()
+
+
+@contextmanager
+def advisory_lock(name: str):
+    """Hold the session-level Postgres advisory lock ``name`` for the block, waiting until it is free.
+
+    Works across processes and nodes sharing the database. The lock is held
+    on a connection of its own rather than a pooled one: the block (a whole
+    render) still queries through the pool, which must not be used up by the
+    locks themselves. The lock is released explicitly on exit, since the
+    server only drops it some time after the connection closes; Postgres
+    still releases it if the connection dies.
+    """
+    conn = psycopg2.connect(**get_db_config())
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+        conn.commit()
+        yield
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def try_advisory_lock(name: str):
+    """Like :func:`advisory_lock`, but yields False at once instead of waiting when another session holds it"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s)) AS acquired", (name,))
+            acquired = cursor.fetchone()["acquired"]
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+                conn.commit()
+
+
+def execute_prepared(cursor, name: str, params: tuple):
+    """Run one of PREPARED_STATEMENTS, preparing it on this connection the first time"""
+    conn = cursor.connection
+    prepared = getattr(conn, "prepared", None)
+    if prepared is None or name not in prepared:
+        cursor.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+        if prepared is not None:
+            prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+_async_pool = None
+_async_pool_lock = asyncio.Lock()
+
+
+async def _init_async_connection(conn):
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    await conn.set_type_codec("json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """Return the asyncpg pool, creating it on first use.
+
+    asyncpg prepares and caches every statement it runs, so the fixed queries
+    are parsed once per connection.
+    """
+    global _async_pool
+    if _async_pool is None:
+        async with _async_pool_lock:
+            if _async_pool is None:
+                config = get_db_config()
+                pool_config = get_pool_config()
+                _async_pool = await asyncpg.create_pool(
+                    database=config["dbname"],
+                    user=config["user"],
+                    password=config["password"],
+                    host=config["host"],
+                    port=int(config["port"]),
+                    min_size=pool_config["min_size"],
+                    max_size=pool_config["max_size"],
+                    timeout=pool_config["timeout"],
+                    max_inactive_connection_lifetime=300,
+                    init=_init_async_connection
+                )
+    return _async_pool
+
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """Async context manager for pooled database connections"""
+    pool = await get_async_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+async def close_async_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
@@ -0,0 +1,83 @@
+import logging
+import os
+import re
+import subprocess
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from utils.ffmpeg_executor import ProgressEvent, get_executor
+from utils.metrics import FFMPEG_CPU_SECONDS, FFMPEG_MEDIA_SECONDS, FFMPEG_WALL_SECONDS, span
+
+logger = logging.getLogger(__name__)
+
+_BENCHMARK_PATTERN = re.compile(r"bench: utime=([\d.]+)s stime=([\d.]+)s rtime=([\d.]+)s")
+
+
+def instrument_command(cmd: Sequence[str]) -> List[str]:
+    """Have ffmpeg print its CPU times (``-benchmark``) and a final progress report on stdout.
+
+    Commands that are not ffmpeg, or that write their output to stdout, are left as they are.
+    """
+    if os.path.basename(cmd[0]) != "ffmpeg" or "pipe:1" in cmd or cmd[-1] == "-":
+        return list(cmd)
+    return [cmd[0], "-benchmark", "-progress", "pipe:1", "-nostats", *cmd[1:]]
+
+
+def parse_progress(output: str) -> Dict[str, str]:
+    """The latest value of every ``key=value`` line of a ``-progress`` report"""
+    progress = {}
+    for line in output.splitlines():
+        key, separator, value = line.partition("=")
+        if separator:
+            progress[key.strip()] = value.strip()
+    return progress
+
+
+def parse_benchmark(stderr: str) -> Optional[Dict[str, float]]:
+    """User, system and real seconds from the ``bench:`` line ffmpeg prints on exit with ``-benchmark``"""
+    matches = _BENCHMARK_PATTERN.findall(stderr or "")
+    if not matches:
+        return None
+    user, system, real = map(float, matches[-1])
+    return {"user": user, "system": system, "real": real}
+
+
+def run_ffmpeg(cmd: Sequence[str], operation: str = "ffmpeg", check: bool = True, timeout: Optional[float] = None,
+               on_progress: Optional[Callable[[ProgressEvent], None]] = None, capture_output: bool = True,
+               text: bool = True) -> subprocess.CompletedProcess:
+    """Run an ffmpeg or ffprobe command like ``subprocess.run``, recording its cost under ``operation``.
+
+    The command runs on the process's shared :class:`~utils.ffmpeg_executor.FFmpegExecutor`,
+    so it waits for a slot and takes the priority and cancellation of the
+    calling context. Output is always captured as text (``capture_output``
+    and ``text`` are accepted for ``subprocess.run`` compatibility), and
+    stderr only holds its last lines. ``on_progress`` receives each
+    ``-progress`` report while ffmpeg runs. Wall time is measured for every
+    run; ffmpeg runs also report their CPU time and the media time they wrote.
+    """
+    instrumented = instrument_command(cmd)
+    started = time.perf_counter()
+    with span(f"ffmpeg.{operation}", command=" ".join(cmd)) as ffmpeg_span:
+        result = get_executor().run_sync(
+            instrumented, operation, timeout=timeout, progress=len(instrumented) > len(cmd), on_progress=on_progress
+        )
+        wall = time.perf_counter() - started
+        FFMPEG_WALL_SECONDS.labels(operation=operation).observe(wall)
+        stats = {"wall": round(wall, 3)}
+
+        benchmark = parse_benchmark(result.stderr)
+        if benchmark is not None:
+            stats["cpu"] = benchmark["user"] + benchmark["system"]
+            FFMPEG_CPU_SECONDS.labels(operation=operation).observe(stats["cpu"])
+        if len(instrumented) > len(cmd):
+            out_time_us = parse_progress(result.stdout).get("out_time_us", "")
+            if out_time_us.isdigit():
+                stats["media"] = int(out_time_us) / 1e6
+                FFMPEG_MEDIA_SECONDS.labels(operation=operation).inc(stats["media"])
+        logger.debug(f"ffmpeg {operation}: {stats}")
+        if ffmpeg_span is not None:
+            ffmpeg_span.set_attributes({f"ffmpeg.{key}_seconds": value for key, value in stats.items()})
+
+    if check and result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, list(cmd), result.stdout, result.stderr)
+    return result
@@ -0,0 +1,349 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import queue
+import subprocess
+import threading
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, List, Optional, Sequence
+
+from utils.metrics import FFMPEG_QUEUED, FFMPEG_RUNNING
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # A client is waiting for the result
+PRIORITY_NORMAL = 5
+PRIORITY_BACKGROUND = 10
+
+# Longest line kept from ffmpeg's output; anything longer is split
+MAX_LINE_BYTES = 64 * 1024
+
+ProgressEvent = Dict[str, str]
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("ffmpeg_priority", default=PRIORITY_NORMAL)
+_cancellation: contextvars.ContextVar = contextvars.ContextVar("ffmpeg_cancellation", default=None)
+
+
+class FFmpegCancelled(Exception):
+    pass
+
+
+class Cancellation:
+    """Thread-safe switch that kills the ffmpeg runs started under it and refuses new ones"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Call ``callback`` on cancel, or right away if already cancelled; returns a function that unregisters it"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+@contextmanager
+def ffmpeg_context(priority: Optional[int] = None, cancellation: Optional[Cancellation] = None):
+    """Priority and cancellation for the ffmpeg runs started in the block.
+
+    Carried in context variables, so it follows the work into threads started
+    with ``asyncio.to_thread``, which copy the caller's context.
+    """
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority)))
+    if cancellation is not None:
+        tokens.append((_cancellation, _cancellation.set(cancellation)))
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+class StderrRing:
+    """The last ``max_lines`` lines of a stream, so error reports stay small however much ffmpeg logs"""
+
+    def __init__(self, max_lines: int):
+        self.dropped = 0
+        self._lines: Deque[str] = collections.deque(maxlen=max_lines)
+
+    def feed(self, line: str):
+        if len(self._lines) == self._lines.maxlen:
+            self.dropped += 1
+        self._lines.append(line)
+
+    def text(self) -> str:
+        prefix = f"[{self.dropped} earlier line(s) dropped]\n" if self.dropped else ""
+        return prefix + "".join(self._lines)
+
+
+class PriorityGate:
+    """Semaphore that admits waiters lowest ``priority`` first, in arrival order within a priority.
+
+    Only used from the executor's event loop.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.active = 0
+        self._waiters: List = []
+        self._sequence = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: int = PRIORITY_NORMAL):
+        if self.active < self.slots and not self._waiters:
+            self.active += 1
+            return
+        entry = (priority, next(self._sequence), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._waiters, entry)
+        try:
+            await entry[2]
+        except asyncio.CancelledError:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            elif entry[2].done() and not entry[2].cancelled():
+                # The slot was handed over just as the waiter gave up: pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, admitted = heapq.heappop(self._waiters)
+            if not admitted.done():
+                admitted.set_result(None)  # The slot goes straight to the waiter; active stays the same
+                return
+        self.active -= 1
+
+
+def default_slots() -> int:
+    """Concurrent ffmpeg runs per process: one per two usable cores, as x264 spreads each encode over several"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS
+        cores = os.cpu_count() or 2
+    return max(1, cores // 2)
+
+
+async def _pump_lines(stream: asyncio.StreamReader, handle_line: Callable[[str], None]):
+    pending = b""
+    while True:
+        data = await stream.read(MAX_LINE_BYTES)
+        if not data:
+            break
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        if len(pending) >= MAX_LINE_BYTES:
+            lines.append(pending)
+            pending = b""
+        for line in lines:
+            handle_line(line.decode("utf-8", errors="replace") + "\n")
+    if pending:
+        handle_line(pending.decode("utf-8", errors="replace"))
+
+
+class FFmpegExecutor:
+    """Runs ffmpeg and ffprobe as asyncio subprocesses on one event loop thread per process.
+
+    ffmpeg runs wait for one of ``max_concurrent`` slots, handed out by
+    priority; ffprobe only reads headers and skips the queue. With
+    ``progress`` the run's stdout is a ``-progress`` report that is parsed into
+    events as it arrives. Only the last ``stderr_lines`` lines of stderr are
+    kept, and a run that times out or is cancelled is killed.
+
+    Blocking callers such as renderers on worker threads use :meth:`run_sync`;
+    coroutines on another event loop use :meth:`run_async`. Either way the
+    subprocesses are managed off the caller's loop.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, stderr_lines: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent or int(os.environ.get("FFMPEG_MAX_CONCURRENT", "0")) or default_slots()
+        self.stderr_lines = stderr_lines or int(os.environ.get("FFMPEG_STDERR_LINES", "200"))
+        self.timeout = timeout if timeout is not None else float(os.environ.get("FFMPEG_TIMEOUT_SECONDS", "0")) or None
+        self.gate = PriorityGate(self.max_concurrent)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._start_lock = threading.Lock()
+
+    def run_sync(self, cmd: Sequence[str], operation: str = "ffmpeg", priority: Optional[int] = None,
+                 timeout: Optional[float] = None, progress: bool = False,
+                 on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+                 cancellation: Optional[Cancellation] = None) -> subprocess.CompletedProcess:
+        """Run ``cmd`` and block until it exits; ``on_progress`` is called on the calling thread"""
+        cancellation = cancellation or _cancellation.get()
+        events = queue.SimpleQueue() if on_progress is not None else None
+        future = self._submit(cmd, operation, priority, timeout, progress, events.put if events else None,
+                              cancellation)
+        if events is not None:
+            future.add_done_callback(lambda _: events.put(None))
+            for event in iter(events.get, None):
+                on_progress(event)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            raise FFmpegCancelled(f"{operation} was cancelled") from None
+
+    async def run_async(self, cmd: Sequence[str], operation: str = "ffmpeg", priority: Optional[int] = None,
+                        timeout: Optional[float] = None, progress: bool = False,
+                        on_progress: Optional[Callable[[ProgressEvent], None]] = None,
+                        cancellation: Optional[Cancellation] = None) -> subprocess.CompletedProcess:
+        """Run ``cmd`` from a coroutine; cancelling the awaiting task kills the process.
+
+        ``on_progress`` is called on the executor's thread and must not block.
+        """
+        cancellation = cancellation or _cancellation.get()
+        future = self._submit(cmd, operation, priority, timeout, progress, on_progress, cancellation)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if cancellation is not None and cancellation.cancelled:
+                raise FFmpegCancelled(f"{operation} was cancelled") from None
+            raise
+
+    def shutdown(self):
+        with self._start_lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop = None
+
+    def _submit(self, cmd, operation, priority, timeout, progress, on_progress, cancellation):
+        priority = _priority.get() if priority is None else priority
+        if cancellation is not None and cancellation.cancelled:
+            raise FFmpegCancelled(f"{operation} was cancelled before it started")
+        return asyncio.run_coroutine_threadsafe(
+            self._run(list(cmd), operation, priority, timeout or self.timeout, progress, on_progress, cancellation),
+            self._ensure_loop()
+        )
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=self._serve, args=(loop,), name="ffmpeg-executor", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _run(self, cmd: List[str], operation: str, priority: int, timeout: Optional[float], progress: bool,
+                   on_progress: Optional[Callable[[ProgressEvent], None]],
+                   cancellation: Optional[Cancellation]) -> subprocess.CompletedProcess:
+        unregister = None
+        if cancellation is not None:
+            # Cancelled here rather than through the caller's future, so the caller only hears of it once
+            # the process is gone
+            task, loop = asyncio.current_task(), asyncio.get_running_loop()
+            unregister = cancellation.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await self._run_gated(cmd, operation, priority, timeout, progress, on_progress)
+        finally:
+            if unregister is not None:
+                unregister()
+
+    async def _run_gated(self, cmd: List[str], operation: str, priority: int, timeout: Optional[float],
+                         progress: bool,
+                         on_progress: Optional[Callable[[ProgressEvent], None]]) -> subprocess.CompletedProcess:
+        gated = os.path.basename(cmd[0]) == "ffmpeg"
+        if gated:
+            FFMPEG_QUEUED.labels(operation=operation).inc()
+            try:
+                await self.gate.acquire(priority)
+            finally:
+                FFMPEG_QUEUED.labels(operation=operation).dec()
+        try:
+            with FFMPEG_RUNNING.labels(operation=operation).track_inprogress():
+                return await self._run_process(cmd, timeout, progress, on_progress)
+        finally:
+            if gated:
+                self.gate.release()
+
+    async def _run_process(self, cmd: List[str], timeout: Optional[float], progress: bool,
+                           on_progress: Optional[Callable[[ProgressEvent], None]]) -> subprocess.CompletedProcess:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        stderr = StderrRing(self.stderr_lines)
+        stdout: List[str] = []
+        report: ProgressEvent = {}
+
+        def handle_stdout(line: str):
+            if not progress:
+                stdout.append(line)
+                return
+            key, separator, value = line.partition("=")
+            if separator:
+                report[key.strip()] = value.strip()
+            # Every report ends with progress=continue, or progress=end for the last one
+            if key.strip() == "progress" and on_progress is not None:
+                on_progress(dict(report))
+
+        try:
+            await asyncio.wait_for(asyncio.gather(
+                _pump_lines(process.stdout, handle_stdout), _pump_lines(process.stderr, stderr.feed), process.wait()
+            ), timeout)
+        except asyncio.TimeoutError:
+            await self._kill(process)
+            raise subprocess.TimeoutExpired(cmd, timeout, "".join(stdout), stderr.text()) from None
+        except asyncio.CancelledError:
+            await self._kill(process)
+            raise
+
+        if progress:
+            stdout = [f"{key}={value}\n" for key, value in report.items()]
+        return subprocess.CompletedProcess(cmd, process.returncode, "".join(stdout), stderr.text())
+
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process):
+        if process.returncode is None:
+            logger.info(f"Killing ffmpeg process {process.pid}")
+            process.kill()
+            await process.wait()
+        # Read the pipes to their end so their transports close while the loop is alive
+        await asyncio.gather(process.stdout.read(), process.stderr.read())
+
+
+_executor: Optional[FFmpegExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> FFmpegExecutor:
+    """The process-wide executor, created on first use so job workers build their own"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = FFmpegExecutor()
+        return _executor
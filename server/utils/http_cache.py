@@ -0,0 +1,54 @@
+import hashlib
+import os
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+# Versioned URLs never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned URLs can be re-rendered in place; the client must revalidate with the ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def file_version(path: str) -> str:
+    """Identifier of the file's current content.
+
+    Renders replace the file with os.replace, which always yields a new
+    inode/mtime, so this changes with every render and never otherwise.
+    """
+    stat = os.stat(path)
+    return hashlib.sha256(f"{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_file_response(request: Request, path: str, media_type: str, immutable: bool = False) -> Response:
+    """Serve a file with an ETag, conditional GET (304) and Range (206) support.
+
+    ``immutable`` marks content that never changes at this URL: either the
+    file is write-once, or the request's ``v`` query parameter names the
+    version currently on disk.
+    """
+    version = file_version(path)
+    etag = f'"{version}"'
+    if immutable or request.query_params.get("v") == version:
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = REVALIDATE_CACHE_CONTROL
+    headers = {"etag": etag, "cache-control": cache_control}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range/If-Range requests with 206 (or 416) on its own
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def versioned_url(url: str, version: str) -> str:
+    """Append the content version so the URL can be cached as immutable"""
+    return f"{url}?v={version}"
@@ -0,0 +1,44 @@
+import json
+import logging
+from fractions import Fraction
+from typing import Callable, Dict, Optional
+
+from utils.ffmpeg import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_rate(rate: Optional[str]) -> Optional[float]:
+    # ffprobe reports rates as fractions such as "30000/1001"; "0/0" means unknown
+    try:
+        value = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(float(value), 3) if value else None
+
+
+def parse_probe_output(probe: Dict) -> Dict:
+    """Reduce ffprobe's JSON to the metadata the render pipeline needs"""
+    streams = probe.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    media_format = probe.get("format", {})
+    duration = media_format.get("duration") or video.get("duration")
+    return {
+        "duration": float(duration) if duration is not None else None,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": _frame_rate(video.get("avg_frame_rate") or video.get("r_frame_rate")),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "size": int(media_format["size"]) if "size" in media_format else None,
+    }
+
+
+def probe_media(path: str, run: Callable = run_ffmpeg) -> Dict:
+    """Read container and stream metadata with one ffprobe call (headers only, not a decode pass)"""
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    result = run(cmd, check=True, capture_output=True, text=True, operation="probe")
+    media_info = parse_probe_output(json.loads(result.stdout))
+    logger.info(f"Probed {path}: {media_info}")
+    return media_info
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Callable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Tracing is optional; stages are still timed into the histograms
+    trace = None
+
+# From a cache lookup to an hour-long full-quality render
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+STAGE_SECONDS = Histogram(
+    "voicecanvas_stage_seconds", "Wall time of one pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+)
+STAGE_ERRORS = Counter("voicecanvas_stage_errors_total", "Pipeline stages that raised", ["stage"])
+RENDERS_SUPERSEDED = Counter(
+    "voicecanvas_renders_superseded_total", "Renders dropped because a newer update of the video arrived",
+    ["state"]
+)
+TTS_CHARACTERS = Counter("voicecanvas_tts_characters_total", "Characters sent to the text-to-speech API")
+TTS_CACHE_LOOKUPS = Counter("voicecanvas_tts_cache_lookups_total", "TTS audio cache lookups", ["result"])
+FFMPEG_WALL_SECONDS = Histogram(
+    "voicecanvas_ffmpeg_wall_seconds", "Wall time of one ffmpeg or ffprobe run", ["operation"], buckets=STAGE_BUCKETS
+)
+FFMPEG_CPU_SECONDS = Histogram(
+    "voicecanvas_ffmpeg_cpu_seconds", "User plus system CPU time of one ffmpeg run, as reported by -benchmark",
+    ["operation"], buckets=STAGE_BUCKETS
+)
+FFMPEG_MEDIA_SECONDS = Counter(
+    "voicecanvas_ffmpeg_media_seconds_total", "Seconds of media written by ffmpeg, from its -progress report",
+    ["operation"]
+)
+FFMPEG_QUEUED = Gauge(
+    "voicecanvas_ffmpeg_queued", "ffmpeg runs waiting for a slot of the executor", ["operation"],
+    multiprocess_mode="livesum"
+)
+FFMPEG_RUNNING = Gauge(
+    "voicecanvas_ffmpeg_running", "ffmpeg and ffprobe processes running", ["operation"], multiprocess_mode="livesum"
+)
+MEDIA_REMOVED_FILES = Counter(
+    "voicecanvas_media_removed_files_total", "Files removed by the media lifecycle sweeper", ["reason"]
+)
+MEDIA_REMOVED_BYTES = Counter(
+    "voicecanvas_media_removed_bytes_total", "Bytes freed by the media lifecycle sweeper", ["reason"]
+)
+MEDIA_USAGE_BYTES = Gauge(
+    "voicecanvas_media_usage_bytes", "Stored objects plus cached segment chunks, as of the last sweep",
+    multiprocess_mode="max"
+)
+
+_tracer = trace.get_tracer(__name__) if trace is not None else None
+
+
+def span(name: str, current: bool = True, **attributes):
+    """An OpenTelemetry span around a block; a no-op yielding None without OpenTelemetry.
+
+    Spans are only exported once an SDK is configured, e.g. by running under
+    ``opentelemetry-instrument``. Pass ``current=False`` inside generators: a
+    span made current there would be detached from a different context when
+    the generator is resumed on another thread.
+    """
+    if _tracer is None:
+        return nullcontext()
+    if current:
+        return _tracer.start_as_current_span(name, attributes=attributes)
+    return _tracer.start_span(name, attributes=attributes)
+
+
+@contextmanager
+def timed_stage(stage: str, current: bool = True, **attributes):
+    """Observe the block's wall time in ``voicecanvas_stage_seconds{stage=...}`` and trace it as a span"""
+    started = time.perf_counter()
+    with span(stage, current, **attributes) as stage_span:
+        try:
+            yield stage_span
+        except Exception:
+            STAGE_ERRORS.labels(stage=stage).inc()
+            raise
+        finally:
+            STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator form of :func:`timed_stage` for plain and async functions"""
+    def decorate(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def timed_coroutine(*args, **kwargs):
+                with timed_stage(stage):
+                    return await func(*args, **kwargs)
+            return timed_coroutine
+
+        @wraps(func)
+        def timed_function(*args, **kwargs):
+            with timed_stage(stage):
+                return func(*args, **kwargs)
+        return timed_function
+    return decorate
+
+
+def latest_metrics() -> bytes:
+    """Metrics in the Prometheus text format.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set, the samples of every process
+    sharing that directory are merged, so job workers and all API workers
+    report through any one of them.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,70 @@
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = "static/uploads/"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+def get_max_upload_bytes() -> int:
+    return int(os.environ.get("MAX_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+
+
+async def save_upload(upload: UploadFile, upload_dir: str = UPLOAD_DIR, max_bytes: Optional[int] = None,
+                      chunk_size: int = UPLOAD_CHUNK_SIZE) -> StoredUpload:
+    """Stream an upload to a single file under ``upload_dir`` in fixed-size chunks.
+
+    Memory use stays at one chunk regardless of the file size. The sha256 is
+    computed on the way through, and a partial file is removed if the upload
+    exceeds ``max_bytes``. The copy runs in one threadpool call, off the event
+    loop. Keep ``upload_dir`` on the same filesystem as ``static/videos/`` so
+    the file can later be renamed into place.
+    """
+    max_bytes = max_bytes if max_bytes is not None else get_max_upload_bytes()
+    os.makedirs(upload_dir, exist_ok=True)
+    filename = os.path.basename(upload.filename or "upload")
+    path = os.path.join(upload_dir, f"{uuid.uuid4().hex}_{filename}")
+    try:
+        # The request body is already spooled by the time the handler runs, so the whole copy is blocking file I/O
+        size, sha256 = await run_in_threadpool(_copy_upload, upload.file, path, max_bytes, chunk_size)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    logger.info(f"Stored upload {filename} at {path} ({size} bytes)")
+    return StoredUpload(path=path, size=size, sha256=sha256)
+
+
+def _copy_upload(source: BinaryIO, path: str, max_bytes: int, chunk_size: int) -> Tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "wb") as upload_file:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(f"Upload exceeds the {max_bytes} byte limit")
+            digest.update(chunk)
+            upload_file.write(chunk)
+    return size, digest.hexdigest()
@@ -0,0 +1,50 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from utils.db import get_db_cursor
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+
+def get_analysis_ttl_seconds() -> int:
+    return int(os.environ.get("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def make_analysis_key(**params) -> str:
+    """Hash of the video content plus everything that shapes the generated subtitles"""
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@timed("db.find_analysis")
+def find_analysis(analysis_key: str, ttl_seconds: Optional[int] = None) -> Optional[Dict]:
+    ttl_seconds = ttl_seconds if ttl_seconds is not None else get_analysis_ttl_seconds()
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT video_id, subtitles FROM video_analyses
+            WHERE analysis_key = %s AND created_at > now() - make_interval(secs => %s)
+            """,
+            (analysis_key, ttl_seconds)
+        )
+        row = cursor.fetchone()
+    return dict(row) if row else None
+
+
+@timed("db.store_analysis")
+def store_analysis(analysis_key: str, content_sha256: str, video_id: str, subtitles: List[Dict]):
+    with get_db_cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO video_analyses (analysis_key, content_sha256, video_id, subtitles)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (analysis_key) DO UPDATE
+            SET video_id = EXCLUDED.video_id, subtitles = EXCLUDED.subtitles, created_at = now()
+            """,
+            (analysis_key, content_sha256, video_id, json.dumps(subtitles))
+        )
+    logger.info(f"Stored analysis {analysis_key} for video_id: {video_id}")
@@ -0,0 +1,96 @@
+import csv
+import difflib
+import logging
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from render.timeline import format_timestamp, parse_timestamp
+from utils.ffmpeg import run_ffmpeg
+
+logger = logging.getLogger(__name__)
+
+# Cues this close to a seam are compared with the other side's cues for duplicates
+SEAM_WINDOW_SECONDS = 2.0
+# Texts at least this similar (difflib ratio) are the same line described twice
+DUPLICATE_SIMILARITY = 0.8
+# A cue trimmed shorter than this at a seam is dropped
+MIN_CUE_SECONDS = 0.5
+
+
+@dataclass
+class VideoChunk:
+    path: str
+    start: float
+    end: float
+
+
+def build_split_command(video_path: str, chunk_dir: str, chunk_seconds: float) -> List[str]:
+    # Stream copy can only cut at keyframes, so pieces run to the first keyframe after each chunk_seconds
+    return [
+        "ffmpeg", "-y", "-i", video_path,
+        "-map", "0:v", "-map", "0:a?", "-c", "copy",
+        "-f", "segment", "-segment_time", str(chunk_seconds), "-reset_timestamps", "1",
+        "-segment_list", os.path.join(chunk_dir, "chunks.csv"), "-segment_list_type", "csv",
+        os.path.join(chunk_dir, "chunk_%04d.mp4")
+    ]
+
+
+def split_video(video_path: str, chunk_dir: str, chunk_seconds: float,
+                run: Callable = run_ffmpeg) -> List[VideoChunk]:
+    """Cut the video into roughly ``chunk_seconds`` long pieces, with their exact offsets from the segment list"""
+    run(build_split_command(video_path, chunk_dir, chunk_seconds), check=True, capture_output=True, text=True,
+        operation="split")
+    with open(os.path.join(chunk_dir, "chunks.csv"), newline="") as chunk_list:
+        chunks = [
+            VideoChunk(path=os.path.join(chunk_dir, filename), start=float(start), end=float(end))
+            for filename, start, end in csv.reader(chunk_list)
+        ]
+    logger.info(f"Split {video_path} into {len(chunks)} chunk(s)")
+    return chunks
+
+
+def offset_subtitles(subtitles: Sequence[Dict], chunk: VideoChunk) -> List[List]:
+    """``[start, end, cue]`` on the global timeline for a chunk's cues, clipped to the chunk"""
+    duration = chunk.end - chunk.start
+    placed = []
+    for cue in subtitles:
+        try:
+            start, end = parse_timestamp(cue["start"]), parse_timestamp(cue["end"])
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Dropping cue with unusable timestamps from {chunk.path}: {cue} ({e})")
+            continue
+        start, end = min(start, duration), min(end, duration)
+        if end > start:
+            placed.append([chunk.start + start, chunk.start + end, cue])
+    return sorted(placed, key=lambda item: item[0])
+
+
+def _is_duplicate(first: str, second: str) -> bool:
+    return difflib.SequenceMatcher(None, first.lower(), second.lower()).ratio() >= DUPLICATE_SIMILARITY
+
+
+def stitch_subtitles(pieces: Sequence[Tuple[VideoChunk, Sequence[Dict]]]) -> List[Dict]:
+    """Merge per-chunk cue lists, in chunk order, into one list on the global timeline.
+
+    Both sides of a seam often describe the same moment. A cue near the start
+    of a chunk that repeats the last cue before the seam is folded into it,
+    extending it; later cues that overlap the extended cue are trimmed to
+    start where it ends, and dropped if little is left.
+    """
+    merged: List[List] = []
+    for index, (chunk, subtitles) in enumerate(pieces):
+        for start, end, cue in offset_subtitles(subtitles, chunk):
+            # Only cues meeting the end of an earlier chunk are touched; a chunk's own cues are kept as given
+            if merged and merged[-1][3] < index:
+                previous = merged[-1]
+                if (start < chunk.start + SEAM_WINDOW_SECONDS and previous[1] > chunk.start - SEAM_WINDOW_SECONDS
+                        and _is_duplicate(previous[2]["text"], cue["text"])):
+                    previous[1] = max(previous[1], end)
+                    continue
+                if start < previous[1]:
+                    start = previous[1]
+                    if end - start < MIN_CUE_SECONDS:
+                        continue
+            merged.append([start, end, cue, index])
+    return [{**cue, "start": format_timestamp(start), "end": format_timestamp(end)} for start, end, cue, _ in merged]
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from models.video_processor import ProcessedVideoResponse
+from render.timeline import format_timestamp
+from repositories import video_repository
+from utils.media import probe_media
+from video_processor.analysis_cache import make_analysis_key
+from video_processor.video_processor import VideoProcessor
+
+logger = logging.getLogger(__name__)
+
+# Used when the upload cannot be probed (e.g. ffprobe is missing)
+FALLBACK_DURATION_SECONDS = 30.0
+
+
+def jittered(mean: float, jitter: float, rng: random.Random) -> float:
+    """``mean`` scaled by a uniform factor in ``[1 - jitter, 1 + jitter]``, never negative"""
+    return max(0.0, mean * rng.uniform(1 - jitter, 1 + jitter))
+
+
+class FakeVideoProcessor(VideoProcessor):
+    """Offline stand-in for Gemini with configurable latency, for load tests and benchmarks.
+
+    Waits ``upload_seconds`` and then ``generate_seconds`` (each scaled by a
+    random factor within ``jitter``) without holding a thread, and returns one
+    cue every ``cue_seconds`` across the video, stored like a real analysis.
+    """
+
+    def __init__(self, upload_seconds: Optional[float] = None, generate_seconds: Optional[float] = None,
+                 jitter: Optional[float] = None, cue_seconds: Optional[float] = None, seed: Optional[int] = None):
+        self.upload_seconds = upload_seconds if upload_seconds is not None else float(
+            os.environ.get("FAKE_GEMINI_UPLOAD_SECONDS", "1.0")
+        )
+        self.generate_seconds = generate_seconds if generate_seconds is not None else float(
+            os.environ.get("FAKE_GEMINI_GENERATE_SECONDS", "3.0")
+        )
+        self.jitter = jitter if jitter is not None else float(os.environ.get("FAKE_LATENCY_JITTER", "0.2"))
+        self.cue_seconds = cue_seconds or float(os.environ.get("FAKE_CUE_SECONDS", "5"))
+        self.model = "fake"
+        self.default_prompt = "Generate a professional voiceover text for this video"
+        self._rng = random.Random(seed)
+
+    def analysis_key(self, content_sha256: str, prompt: str) -> str:
+        return make_analysis_key(
+            content_sha256=content_sha256, prompt=prompt if prompt else self.default_prompt, model=self.model
+        )
+
+    def process(self, video_path: str, prompt: str,
+                on_stage: Optional[Callable[[str], None]] = None) -> ProcessedVideoResponse:
+        return asyncio.run(self.process_async(video_path, prompt, on_stage))
+
+    async def process_async(self, video_path: str, prompt: str,
+                            on_stage: Optional[Callable[[str], None]] = None,
+                            on_progress: Optional[Callable[[Dict], None]] = None) -> ProcessedVideoResponse:
+        on_stage = on_stage or (lambda stage: None)
+        on_stage("uploading")
+        await asyncio.sleep(jittered(self.upload_seconds, self.jitter, self._rng))
+        on_stage("analyzing")
+        await asyncio.sleep(jittered(self.generate_seconds, self.jitter, self._rng))
+
+        subtitles = self.make_subtitles(await asyncio.to_thread(self._duration, video_path), prompt)
+        video_id = f"fake-{uuid.uuid4().hex}"
+        await asyncio.to_thread(video_repository.upsert_transcripts, video_id, subtitles)
+        logger.info(f"Fake analysis of {video_path} as {video_id}: {len(subtitles)} cue(s)")
+        return ProcessedVideoResponse(video_id=f"files/{video_id}", subtitles=subtitles)
+
+    def make_subtitles(self, duration: float, prompt: str) -> List[Dict]:
+        """A cue filling the first 60% of every ``cue_seconds`` slot, so there are gaps to retime into"""
+        subtitles = []
+        start = 0.0
+        while start + 1 <= duration:
+            end = min(start + self.cue_seconds * 0.6, duration)
+            subtitles.append({
+                "start": format_timestamp(start),
+                "end": format_timestamp(end),
+                "text": f"Line {len(subtitles) + 1} about {prompt or 'the video'}",
+            })
+            start += self.cue_seconds
+        return subtitles
+
+    @staticmethod
+    def _duration(video_path: str) -> float:
+        try:
+            return probe_media(video_path)["duration"] or FALLBACK_DURATION_SECONDS
+        except Exception as e:
+            logger.warning(f"Could not probe {video_path}, assuming {FALLBACK_DURATION_SECONDS}s: {e}")
+            return FALLBACK_DURATION_SECONDS
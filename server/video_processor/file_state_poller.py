@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROCESSING_STATE = "PROCESSING"
+FAILED_STATE = "FAILED"
+
+
+class FileProcessingError(Exception):
+    pass
+
+
+class FileProcessingTimeout(FileProcessingError, TimeoutError):
+    pass
+
+
+@dataclass
+class _Waiter:
+    name: str
+    future: asyncio.Future
+    started: float
+    delay: float
+    next_check: float
+    on_progress: Optional[Callable[[Dict], None]] = None
+    checks: int = 0
+
+
+class FileStatePoller:
+    """Waits for uploaded Gemini files to leave the PROCESSING state.
+
+    One poller task serves every waiter on its event loop: each round it
+    checks all files that are due, concurrently and once per file name, and
+    then sleeps until the next one is due. A file is checked again after a
+    delay that doubles from ``initial_delay`` up to ``max_delay``, so quick
+    files finish fast and slow ones cost few requests. The task exits once
+    nobody is waiting.
+    """
+
+    def __init__(self, get_file: Callable[[str], Any], initial_delay: Optional[float] = None,
+                 max_delay: Optional[float] = None, max_batch: Optional[int] = None):
+        self.get_file = get_file
+        self.initial_delay = initial_delay if initial_delay is not None else float(
+            os.environ.get("GEMINI_POLL_INITIAL_SECONDS", "0.5")
+        )
+        self.max_delay = max_delay if max_delay is not None else float(os.environ.get("GEMINI_POLL_MAX_SECONDS", "4"))
+        self.max_batch = max_batch or int(os.environ.get("GEMINI_POLL_BATCH", "16"))
+        self.checks = 0
+        self.rounds = 0
+        self._waiters: List[_Waiter] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def wait_until_active(self, file, timeout: Optional[float] = None,
+                                on_progress: Optional[Callable[[Dict], None]] = None):
+        """Return the file once processed; raises FileProcessingError if it failed, FileProcessingTimeout
+        after ``timeout`` seconds. Cancelling the caller stops the wait."""
+        if file.state.name != PROCESSING_STATE:
+            return self._check_failed(file)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        waiter = _Waiter(name=file.name, future=loop.create_future(), started=now, delay=self.initial_delay,
+                         next_check=now + self.initial_delay, on_progress=on_progress)
+        self._waiters.append(waiter)
+        self._start()
+        try:
+            # On timeout or cancellation wait_for cancels the future, and the poller forgets the waiter
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            raise FileProcessingTimeout(f"{file.name} was still processing after {timeout:.0f}s") from None
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    @staticmethod
+    def _check_failed(file):
+        if file.state.name == FAILED_STATE:
+            raise FileProcessingError(f"Processing of {file.name} failed")
+        return file
+
+    def _start(self):
+        if self._wakeup is None:
+            # Created here, inside the running loop; asyncio primitives bind to a loop on Python 3.9
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        else:
+            self._wakeup.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                self._waiters = [waiter for waiter in self._waiters if not waiter.future.done()]
+                if not self._waiters:
+                    return
+                # A new waiter sets the event, so its first check is not stuck behind a long backoff
+                next_check = min(waiter.next_check for waiter in self._waiters)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, next_check - loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                await self._check_due(loop.time())
+        except Exception as e:
+            logger.error(f"File state poller failed: {e}")
+            for waiter in self._waiters:
+                if not waiter.future.done():
+                    waiter.future.set_exception(e)
+
+    async def _check_due(self, now: float):
+        due = [waiter for waiter in self._waiters if not waiter.future.done() and waiter.next_check <= now]
+        names = list(dict.fromkeys(waiter.name for waiter in due))[:self.max_batch]
+        if not names:
+            return
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.get_file, name) for name in names), return_exceptions=True
+        )
+        self.rounds += 1
+        self.checks += len(names)
+        by_name = dict(zip(names, results))
+        checked_at = asyncio.get_running_loop().time()
+
+        for waiter in due:
+            if waiter.name not in by_name or waiter.future.done():
+                continue
+            result = by_name[waiter.name]
+            waiter.checks += 1
+            state = "ERROR" if isinstance(result, Exception) else result.state.name
+            self._emit(waiter, state, checked_at)
+            if state == "ERROR":
+                # A failed status check says nothing about the file: keep backing off until the timeout
+                logger.warning(f"Could not check the state of {waiter.name}: {result}")
+            elif state != PROCESSING_STATE:
+                try:
+                    waiter.future.set_result(self._check_failed(result))
+                except FileProcessingError as e:
+                    waiter.future.set_exception(e)
+                continue
+            waiter.delay = min(waiter.delay * 2, self.max_delay)
+            waiter.next_check = checked_at + waiter.delay
+
+    @staticmethod
+    def _emit(waiter: _Waiter, state: str, now: float):
+        event = {
+            "event": "file_state",
+            "file": waiter.name,
+            "state": state,
+            "checks": waiter.checks,
+            "elapsed": round(now - waiter.started, 3),
+        }
+        logger.debug(f"File state: {event}")
+        if waiter.on_progress is not None:
+            waiter.on_progress(event)
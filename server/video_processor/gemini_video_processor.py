@@ -1,123 +1,213 @@
+import asyncio
+import hashlib
 import json
 import os
 import logging
+import tempfile
 import time
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
 
 from google import genai
 from google.genai.types import GenerateContentConfig
 
 from models.video_processor import ProcessedVideoResponse
+from repositories import video_repository
+from utils.metrics import timed, timed_stage
+from video_processor.analysis_cache import make_analysis_key
+from video_processor.chunking import split_video, stitch_subtitles
+from video_processor.file_state_poller import FileStatePoller
 from video_processor.video_processor import VideoProcessor
-from utils.db import get_db_cursor
 
 logger = logging.getLogger(__name__)
 
 
 class GeminiVideoProcessor(VideoProcessor):
-    def __init__(self):
-        self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    def __init__(self, client=None):
+        # Anything with the genai.Client files/models interface works, e.g. an offline fake in tests
+        self.client = client or genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
         self.system_prompt = """You're a professional content writer who creates high quality voiceover text for videos. This is a local demo for voicecanvas dot ai. We are helping users add professional quality voiceovers and effects to their videos. Create transcripts by describing what is going on in the video with user's prompt in mind to make it engaging and witty. DO NOT SIMPLY read what is present"""
+        self.model = "gemini-1.5-pro"
+        self.temperature = 0.5
+        self.default_prompt = "Generate a professional voiceover text for this video"
+        # 0 analyzes the whole video in one request; otherwise longer videos are analyzed in pieces this long
+        self.chunk_seconds = float(os.environ.get("GEMINI_CHUNK_MINUTES", "0")) * 60
+        self.max_concurrency = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "4"))
+        self.upload_timeout = float(os.environ.get("GEMINI_UPLOAD_TIMEOUT_SECONDS", "600"))
+        # One status poller per event loop, shared by every upload waiting on that loop
+        self._pollers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, FileStatePoller]" = (
+            weakref.WeakKeyDictionary()
+        )
 
-    def process(self, video_path: str, prompt: str) -> ProcessedVideoResponse:
+    @property
+    def system_prompt_version(self) -> str:
+        return hashlib.sha256(self.system_prompt.encode("utf-8")).hexdigest()[:12]
+
+    def analysis_key(self, content_sha256: str, prompt: str) -> str:
+        params = dict(
+            content_sha256=content_sha256,
+            prompt=prompt if prompt else self.default_prompt,
+            model=self.model,
+            system_prompt_version=self.system_prompt_version,
+            temperature=self.temperature
+        )
+        if self.chunk_seconds:
+            # Chunked analyses differ from whole-video ones; keys of the default mode stay as they were
+            params["chunk_seconds"] = self.chunk_seconds
+        return make_analysis_key(**params)
+
+    def process(self, video_path: str, prompt: str,
+                on_stage: Optional[Callable[[str], None]] = None) -> ProcessedVideoResponse:
+        return asyncio.run(self.process_async(video_path, prompt, on_stage))
+
+    async def process_async(self, video_path: str, prompt: str,
+                            on_stage: Optional[Callable[[str], None]] = None,
+                            on_progress: Optional[Callable[[Dict], None]] = None) -> ProcessedVideoResponse:
+        on_stage = on_stage or (lambda stage: None)
         try:
             logger.info(f"Processing video {video_path}")
-            video = self.__upload__video__(video_path)
-            logger.info(f"Uploaded video {video_path} as {video.name}")
-            response = self.client.models.generate_content(
-                model="gemini-1.5-pro",
-                config=GenerateContentConfig(
-                    system_instruction=self.system_prompt,
-                    temperature=0.5,
-                    response_schema=genai.types.Schema(
-                        type=genai.types.Type.OBJECT,
-                        enum=[],
-                        required=["subtitles"],
-                        properties={
-                            "subtitles": genai.types.Schema(
-                                type=genai.types.Type.ARRAY,
-                                items=genai.types.Schema(
-                                    type=genai.types.Type.OBJECT,
-                                    enum=[],
-                                    required=["start", "end", "text"],
-                                    properties={
-                                        "start": genai.types.Schema(
-                                            type=genai.types.Type.STRING,
-                                        ),
-                                        "end": genai.types.Schema(
-                                            type=genai.types.Type.STRING,
-                                        ),
-                                        "text": genai.types.Schema(
-                                            type=genai.types.Type.STRING,
-                                        ),
-                                    },
-                                ),
-                            ),
-                            "error": genai.types.Schema(
-                                type=genai.types.Type.STRING,
-                            ),
-                        },
-                    ),
-                    response_mime_type="application/json"
-                ),
-                contents=[video, prompt if prompt else "Generate a professional voiceover text for this video"],
-            )
+            analysis = None
+            if self.chunk_seconds:
+                analysis = await self._process_chunked(video_path, prompt, on_stage, on_progress)
+            if analysis is None:
+                on_stage("uploading")
+                video = await self.upload_video(video_path, on_progress)
+                on_stage("analyzing")
+                analysis = video.name, await asyncio.to_thread(self._generate_subtitles, video, prompt)
+            video_name, subtitles = analysis
             logger.info(f"Generated subtitles for video {video_path}")
-            
-            # Parse the response
-            subtitles = json.loads(response.text)['subtitles']
-            video_id = video.name.replace("files/", "")
+
+            video_id = video_name.replace("files/", "")
             logger.info(f"Processing video with ID: {video_id}")
             logger.info(f"Subtitles to be stored: {subtitles}")
             
             # Store transcripts in database
-            with get_db_cursor() as cursor:
-                # First check if video exists
-                cursor.execute(
-                    "SELECT video_id FROM videos WHERE video_id = %s",
-                    (video_id,)
-                )
-                exists = cursor.fetchone()
-                logger.info(f"Video exists in database: {exists is not None}")
-                
-                if not exists:
-                    logger.info("Video not found in database, inserting new record")
-                    cursor.execute(
-                        "INSERT INTO videos (video_id, transcripts) VALUES (%s, %s)",
-                        (video_id, json.dumps(subtitles))
-                    )
-                else:
-                    logger.info("Video found in database, updating transcripts")
-                    cursor.execute(
-                        "UPDATE videos SET transcripts = %s WHERE video_id = %s",
-                        (json.dumps(subtitles), video_id)
-                    )
-                logger.info(f"Updated transcripts for video_id: {video_id}")
+            await asyncio.to_thread(video_repository.upsert_transcripts, video_id, subtitles)
             
-            return ProcessedVideoResponse(video_id=video.name, subtitles=subtitles)
+            return ProcessedVideoResponse(video_id=video_name, subtitles=subtitles)
         except Exception as e:
             logger.error(f"Error processing video {video_path}: {e}")
             raise e
 
-    def __upload__video__(self, file_path) -> genai.types.File:
+    async def upload_video(self, file_path: str,
+                           on_progress: Optional[Callable[[Dict], None]] = None) -> genai.types.File:
+        """Upload a file and wait, without holding a thread, until Gemini has processed it.
+
+        Raises FileProcessingError if processing fails and FileProcessingTimeout
+        after GEMINI_UPLOAD_TIMEOUT_SECONDS.
+        """
         logger.info(f"Uploading video {file_path}")
-        uploaded_file = self.client.files.upload(file=file_path)
-        while uploaded_file.state.name == "PROCESSING":
-            print(".", end="", flush=True)
-            time.sleep(1)
-            uploaded_file = self.client.files.get(name=uploaded_file.name)
-
-        if uploaded_file.state.name == "FAILED":
-            raise Exception(f"Failed to upload video {file_path}")
-        
-        # Store video ID in database using the central connection
-        video_id = uploaded_file.name.replace("files/", "")
-        logger.info(f"Storing video_id in database: {video_id}")
-        with get_db_cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO videos (video_id) VALUES (%s) ON CONFLICT (video_id) DO NOTHING",
-                (video_id,)
-            )
-            logger.info(f"Stored video_id in database: {video_id}")
-            
-        logger.info(f"Uploaded video {file_path} as {uploaded_file.name}")
-        return uploaded_file
+        started = time.monotonic()
+        with timed_stage("gemini.upload"):
+            upload = asyncio.ensure_future(asyncio.to_thread(self.client.files.upload, file=file_path))
+            try:
+                uploaded_file = await asyncio.shield(upload)
+            except asyncio.CancelledError:
+                # The thread cannot be stopped; callers delete the file once cancelled, so let it finish reading
+                await asyncio.wait([upload])
+                raise
+        event = {"event": "uploaded", "file": uploaded_file.name, "path": file_path,
+                 "elapsed": round(time.monotonic() - started, 3)}
+        logger.debug(f"Upload progress: {event}")
+        if on_progress is not None:
+            on_progress(event)
+
+        with timed_stage("gemini.processing"):
+            video = await self._poller().wait_until_active(uploaded_file, self.upload_timeout, on_progress)
+        logger.info(f"Uploaded video {file_path} as {video.name} in {time.monotonic() - started:.1f}s")
+        return video
+
+    def _poller(self) -> FileStatePoller:
+        loop = asyncio.get_running_loop()
+        poller = self._pollers.get(loop)
+        if poller is None:
+            poller = FileStatePoller(lambda name: self.client.files.get(name=name))
+            self._pollers[loop] = poller
+        return poller
+
+    async def _process_chunked(self, video_path: str, prompt: str, on_stage: Callable[[str], None],
+                               on_progress: Optional[Callable[[Dict], None]]) -> Optional[Tuple[str, List[Dict]]]:
+        """Analyze the video in pieces, concurrently; None if it fits in a single piece.
+
+        The video is identified by the Gemini file of its first piece.
+        """
+        with tempfile.TemporaryDirectory(prefix="gemini_chunks_") as chunk_dir:
+            chunks = await asyncio.to_thread(split_video, video_path, chunk_dir, self.chunk_seconds)
+            if len(chunks) < 2:
+                return None
+            on_stage("uploading")
+            slots = asyncio.Semaphore(self.max_concurrency)
+            analyzing = []
+            failed = asyncio.Event()
+
+            async def analyze(chunk):
+                async with slots:
+                    # A slot freed by a failed piece must not start another upload
+                    if failed.is_set():
+                        raise asyncio.CancelledError()
+                    try:
+                        video = await self.upload_video(chunk.path, on_progress)
+                        if not analyzing:
+                            analyzing.append(True)
+                            on_stage("analyzing")
+                        return video.name, await asyncio.to_thread(self._generate_subtitles, video, prompt)
+                    except Exception:
+                        failed.set()
+                        raise
+
+            tasks = [asyncio.create_task(analyze(chunk)) for chunk in chunks]
+            try:
+                results = await asyncio.gather(*tasks)
+            except BaseException:
+                # Leaving the block deletes the chunks: cancel the pieces still to go and wait for all of them first
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+        chunk_subtitles = [subtitles for _, subtitles in results]
+        subtitles = stitch_subtitles(list(zip(chunks, chunk_subtitles)))
+        logger.info(f"Stitched {sum(map(len, chunk_subtitles))} cues from {len(chunks)} chunks into {len(subtitles)}")
+        return results[0][0], subtitles
+
+    @timed("gemini.generate")
+    def _generate_subtitles(self, video: genai.types.File, prompt: str) -> List[Dict]:
+        response = self.client.models.generate_content(
+            model=self.model,
+            config=GenerateContentConfig(
+                system_instruction=self.system_prompt,
+                temperature=self.temperature,
+                response_schema=genai.types.Schema(
+                    type=genai.types.Type.OBJECT,
+                    enum=[],
+                    required=["subtitles"],
+                    properties={
+                        "subtitles": genai.types.Schema(
+                            type=genai.types.Type.ARRAY,
+                            items=genai.types.Schema(
+                                type=genai.types.Type.OBJECT,
+                                enum=[],
+                                required=["start", "end", "text"],
+                                properties={
+                                    "start": genai.types.Schema(
+                                        type=genai.types.Type.STRING,
+                                    ),
+                                    "end": genai.types.Schema(
+                                        type=genai.types.Type.STRING,
+                                    ),
+                                    "text": genai.types.Schema(
+                                        type=genai.types.Type.STRING,
+                                    ),
+                                },
+                            ),
+                        ),
+                        "error": genai.types.Schema(
+                            type=genai.types.Type.STRING,
+                        ),
+                    },
+                ),
+                response_mime_type="application/json"
+            ),
+            contents=[video, prompt if prompt else self.default_prompt],
+        )
+        # Parse the response
+        return json.loads(response.text)['subtitles']
@@ -1,7 +1,26 @@
+import asyncio
+import os
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
 
 
 class VideoProcessor(ABC):
     @abstractmethod
-    def process(self, video_path: str, prompt: str) -> str:
+    def process(self, video_path: str, prompt: str, on_stage: Optional[Callable[[str], None]] = None) -> str:
         pass
+
+    async def process_async(self, video_path: str, prompt: str, on_stage: Optional[Callable[[str], None]] = None):
+        """Awaitable :meth:`process`; runs it on a worker thread unless a subclass has a native async path"""
+        return await asyncio.to_thread(self.process, video_path, prompt, on_stage)
+
+
+def create_video_processor() -> VideoProcessor:
+    """Video analysis backend selected by VIDEO_PROCESSOR_BACKEND ("gemini" or "fake")"""
+    backend = os.environ.get("VIDEO_PROCESSOR_BACKEND", "gemini")
+    if backend == "gemini":
+        from video_processor.gemini_video_processor import GeminiVideoProcessor
+        return GeminiVideoProcessor()
+    if backend == "fake":
+        from video_processor.fake_video_processor import FakeVideoProcessor
+        return FakeVideoProcessor()
+    raise ValueError(f"Unknown VIDEO_PROCESSOR_BACKEND '{backend}', expected 'gemini' or 'fake'")
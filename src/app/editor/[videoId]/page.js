@@ -99,12 +99,39 @@ const VideoEditor = () => {
       });
       
       const data = await response.json();
+      if (data.superseded) {
+        // A later save of this video replaced this one; its response updates the player
+        setSaveStatus('');
+        setIsLoading(false);
+        return;
+      }
       if (!data.success) throw new Error('Failed to save');
       
       setSaveStatus('success');
       setVideoKey(prev => prev + 1);
-      setProcessedVideoUrl(`http://localhost:8000/videos/${decodeURIComponent(videoId).replace("files/", "")}`);
-      setShowDownload(true);
+      const fullVideoUrl = `http://localhost:8000/videos/${decodeURIComponent(videoId).replace("files/", "")}`;
+      if (data.render_job_id) {
+        // Play the low-res preview now and swap in the full render once its job finishes
+        setVideo(prev => ({ ...prev, url: data.preview_url }));
+        const events = new EventSource(`http://localhost:8000/jobs/${data.render_job_id}/events`);
+        events.onmessage = (event) => {
+          const job = JSON.parse(event.data);
+          if (job.status === 'succeeded') {
+            setVideo(prev => ({ ...prev, url: `${fullVideoUrl}?v=${job.result.video_version}` }));
+            setVideoKey(prev => prev + 1);
+            setProcessedVideoUrl(fullVideoUrl);
+            setShowDownload(true);
+          } else if (job.status === 'failed') {
+            toast.error('Full-quality render failed');
+          }
+          if (['succeeded', 'failed', 'superseded'].includes(job.status)) events.close();
+        };
+        events.onerror = () => events.close();
+      } else {
+        setVideo(prev => ({ ...prev, url: data.video_url }));
+        setProcessedVideoUrl(fullVideoUrl);
+        setShowDownload(true);
+      }
       setTimeout(() => setSaveStatus(''), 2000);
     } catch (error) {
       console.error('Error saving:', error);